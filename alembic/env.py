@@ -14,7 +14,7 @@ sys.path.append(os.path.join(os.getcwd(), 'backend'))
 
 # Import Base to get metadata
 from src.db import Base
-from src.models import users, geo, business # Register models
+from src.models import users, geo, business, planning, tracking # Register models
 from src.config import settings
 
 config = context.config
@@ -0,0 +1,36 @@
+"""Add route_plan table
+
+Revision ID: 46efa697e984
+Revises: 8f6118fa7250
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '46efa697e984'
+down_revision: Union[str, None] = '8f6118fa7250'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_table('route_plan',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('chofer_id', sa.Integer(), nullable=False),
+    sa.Column('fecha', sa.Date(), nullable=False),
+    sa.Column('modo', sa.String(), nullable=False, server_default='cercania'),
+    sa.Column('secuencia', sa.JSON(), nullable=False),
+    sa.Column('distancia_km', sa.Float(), nullable=False, server_default='0'),
+    sa.Column('duracion_min', sa.Float(), nullable=False, server_default='0'),
+    sa.Column('creado_en', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['chofer_id'], ['choferes.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('chofer_id', 'fecha', 'modo', name='uq_route_plan_chofer_fecha_modo')
+    )
+    op.create_index(op.f('ix_route_plan_id'), 'route_plan', ['id'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_route_plan_id'), table_name='route_plan')
+    op.drop_table('route_plan')
@@ -0,0 +1,36 @@
+"""Add vehicle profiles for choferes
+
+Revision ID: 47efa697e984
+Revises: 46efa697e984
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '47efa697e984'
+down_revision: Union[str, None] = '46efa697e984'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_table('perfiles_vehiculo',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sa.String(), nullable=False),
+    sa.Column('tipos_permitidos', sa.JSON(), nullable=False, server_default='[]'),
+    sa.Column('capacidad', sa.JSON(), nullable=False, server_default='{}'),
+    sa.Column('activo', sa.Boolean(), nullable=False, server_default=sa.true()),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('nombre')
+    )
+    op.create_index(op.f('ix_perfiles_vehiculo_id'), 'perfiles_vehiculo', ['id'], unique=False)
+    op.add_column('choferes', sa.Column('perfil_vehiculo_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('fk_choferes_perfil_vehiculo', 'choferes', 'perfiles_vehiculo', ['perfil_vehiculo_id'], ['id'])
+
+def downgrade() -> None:
+    op.drop_constraint('fk_choferes_perfil_vehiculo', 'choferes', type_='foreignkey')
+    op.drop_column('choferes', 'perfil_vehiculo_id')
+    op.drop_index(op.f('ix_perfiles_vehiculo_id'), table_name='perfiles_vehiculo')
+    op.drop_table('perfiles_vehiculo')
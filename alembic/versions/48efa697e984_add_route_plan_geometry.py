@@ -0,0 +1,24 @@
+"""Add cached geometry to route_plan
+
+Revision ID: 48efa697e984
+Revises: 47efa697e984
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '48efa697e984'
+down_revision: Union[str, None] = '47efa697e984'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.add_column('route_plan', sa.Column('geometria', sa.JSON(), nullable=True))
+    op.add_column('route_plan', sa.Column('geometria_hash', sa.String(length=64), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('route_plan', 'geometria_hash')
+    op.drop_column('route_plan', 'geometria')
@@ -0,0 +1,53 @@
+"""Add weekday bit mask to servicios_frecuentes
+
+Revision ID: 49efa697e984
+Revises: 48efa697e984
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '49efa697e984'
+down_revision: Union[str, None] = '48efa697e984'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Accented and plain spellings, both seen in dias_semana
+DAY_NAMES = [
+    ("Lunes",),
+    ("Martes",),
+    ("Miércoles", "Miercoles"),
+    ("Jueves",),
+    ("Viernes",),
+    ("Sábado", "Sabado"),
+    ("Domingo",),
+]
+
+def upgrade() -> None:
+    op.add_column('servicios_frecuentes', sa.Column('dias_mask', sa.SmallInteger(), nullable=False, server_default='0'))
+
+    terms = []
+    for bit, names in enumerate(DAY_NAMES):
+        cond = " OR ".join(
+            f"""dias_semana::jsonb @> '["{name}"]' OR dias_semana::jsonb @> '["{name.lower()}"]'"""
+            for name in names
+        )
+        terms.append(f"(CASE WHEN {cond} THEN {1 << bit} ELSE 0 END)")
+    op.execute(
+        "UPDATE servicios_frecuentes SET dias_mask = " + " | ".join(terms) +
+        " WHERE dias_semana IS NOT NULL AND json_typeof(dias_semana) = 'array'"
+    )
+
+    for bit in range(7):
+        op.create_index(
+            f'ix_frecuentes_dia_{bit}', 'servicios_frecuentes', ['chofer_id', 'estado'], unique=False,
+            postgresql_where=sa.text(f'(dias_mask & {1 << bit}) <> 0')
+        )
+
+def downgrade() -> None:
+    for bit in range(7):
+        op.drop_index(f'ix_frecuentes_dia_{bit}', table_name='servicios_frecuentes')
+    op.drop_column('servicios_frecuentes', 'dias_mask')
@@ -0,0 +1,43 @@
+"""Add servicio_ocurrencia (materialized recurring visits)
+
+Revision ID: 50efa697e984
+Revises: 49efa697e984
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '50efa697e984'
+down_revision: Union[str, None] = '49efa697e984'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # Rows are generated by the app on startup (recurrence.extend_horizon)
+    op.create_table('servicio_ocurrencia',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('frecuente_id', sa.Integer(), nullable=False),
+        sa.Column('fecha', sa.Date(), nullable=False),
+        sa.Column('chofer_id', sa.Integer(), nullable=True),
+        sa.Column('estado', sa.String(length=14), nullable=False, server_default='PROGRAMADA'),
+        sa.Column('monto', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('pago_id', sa.Integer(), nullable=True),
+        sa.Column('actualizado_en', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['frecuente_id'], ['servicios_frecuentes.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['chofer_id'], ['choferes.id'], ),
+        sa.ForeignKeyConstraint(['pago_id'], ['pagos.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('frecuente_id', 'fecha', name='uq_ocurrencia_frecuente_fecha')
+    )
+    op.create_index(op.f('ix_servicio_ocurrencia_id'), 'servicio_ocurrencia', ['id'], unique=False)
+    op.create_index('ix_ocurrencia_chofer_fecha', 'servicio_ocurrencia', ['chofer_id', 'fecha'], unique=False)
+    op.create_index('ix_ocurrencia_fecha', 'servicio_ocurrencia', ['fecha'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('ix_ocurrencia_fecha', table_name='servicio_ocurrencia')
+    op.drop_index('ix_ocurrencia_chofer_fecha', table_name='servicio_ocurrencia')
+    op.drop_index(op.f('ix_servicio_ocurrencia_id'), table_name='servicio_ocurrencia')
+    op.drop_table('servicio_ocurrencia')
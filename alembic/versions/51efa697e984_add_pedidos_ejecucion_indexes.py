@@ -0,0 +1,24 @@
+"""Add execution date indexes to pedidos_individuales
+
+Revision ID: 51efa697e984
+Revises: 50efa697e984
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '51efa697e984'
+down_revision: Union[str, None] = '50efa697e984'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_index('ix_pedidos_chofer_ejecucion', 'pedidos_individuales', ['chofer_id', 'fecha_hora_ejecucion'], unique=False)
+    op.create_index('ix_pedidos_ejecucion', 'pedidos_individuales', ['fecha_hora_ejecucion'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('ix_pedidos_ejecucion', table_name='pedidos_individuales')
+    op.drop_index('ix_pedidos_chofer_ejecucion', table_name='pedidos_individuales')
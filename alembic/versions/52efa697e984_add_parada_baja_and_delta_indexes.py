@@ -0,0 +1,38 @@
+"""Add parada_baja tombstones and actualizado_en indexes for driver delta sync
+
+Revision ID: 52efa697e984
+Revises: 51efa697e984
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '52efa697e984'
+down_revision: Union[str, None] = '51efa697e984'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_table('parada_baja',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('chofer_id', sa.Integer(), nullable=False),
+        sa.Column('tipo', sa.String(length=1), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('creado_en', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['chofer_id'], ['choferes.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_parada_baja_chofer_creado', 'parada_baja', ['chofer_id', 'creado_en'], unique=False)
+    op.create_index(op.f('ix_parada_baja_creado_en'), 'parada_baja', ['creado_en'], unique=False)
+    op.create_index('ix_pedidos_chofer_actualizado', 'pedidos_individuales', ['chofer_id', 'actualizado_en'], unique=False)
+    op.create_index('ix_frecuentes_chofer_actualizado', 'servicios_frecuentes', ['chofer_id', 'actualizado_en'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('ix_frecuentes_chofer_actualizado', table_name='servicios_frecuentes')
+    op.drop_index('ix_pedidos_chofer_actualizado', table_name='pedidos_individuales')
+    op.drop_index(op.f('ix_parada_baja_creado_en'), table_name='parada_baja')
+    op.drop_index('ix_parada_baja_chofer_creado', table_name='parada_baja')
+    op.drop_table('parada_baja')
@@ -0,0 +1,33 @@
+"""Add sync_mutacion (idempotency log of offline driver changes)
+
+Revision ID: 53efa697e984
+Revises: 52efa697e984
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '53efa697e984'
+down_revision: Union[str, None] = '52efa697e984'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_table('sync_mutacion',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('chofer_id', sa.Integer(), nullable=False),
+        sa.Column('clave', sa.String(length=64), nullable=False),
+        sa.Column('tipo', sa.String(), nullable=False),
+        sa.Column('cliente_ts', sa.DateTime(), nullable=False),
+        sa.Column('resultado', sa.JSON(), nullable=False),
+        sa.Column('creado_en', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['chofer_id'], ['choferes.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('chofer_id', 'clave', name='uq_sync_mutacion_chofer_clave')
+    )
+
+def downgrade() -> None:
+    op.drop_table('sync_mutacion')
@@ -0,0 +1,39 @@
+"""Add posicion_chofer, range-partitioned by month
+
+Revision ID: 54efa697e984
+Revises: 53efa697e984
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '54efa697e984'
+down_revision: Union[str, None] = '53efa697e984'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # Monthly partitions are created ahead at runtime (utils.positions.ensure_partitions);
+    # the default one catches anything outside them
+    op.execute("""
+        CREATE TABLE posicion_chofer (
+            id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+            registrado_en TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            chofer_id INTEGER NOT NULL,
+            lat DOUBLE PRECISION NOT NULL,
+            lng DOUBLE PRECISION NOT NULL,
+            velocidad_kmh DOUBLE PRECISION,
+            rumbo DOUBLE PRECISION,
+            precision_m DOUBLE PRECISION,
+            recibido_en TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            PRIMARY KEY (id, registrado_en)
+        ) PARTITION BY RANGE (registrado_en)
+    """)
+    op.create_index('ix_posicion_chofer_chofer_registrado', 'posicion_chofer', ['chofer_id', 'registrado_en'], unique=False)
+    op.execute("CREATE TABLE posicion_chofer_default PARTITION OF posicion_chofer DEFAULT")
+
+def downgrade() -> None:
+    op.drop_table('posicion_chofer')
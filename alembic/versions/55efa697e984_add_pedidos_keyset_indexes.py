@@ -0,0 +1,33 @@
+"""Add keyset pagination indexes to pedidos_individuales
+
+Revision ID: 55efa697e984
+Revises: 54efa697e984
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '55efa697e984'
+down_revision: Union[str, None] = '54efa697e984'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # (fecha_hora_ejecucion, id) supersedes the single-column index
+    op.drop_index('ix_pedidos_ejecucion', table_name='pedidos_individuales')
+    op.create_index('ix_pedidos_ejecucion_id', 'pedidos_individuales', ['fecha_hora_ejecucion', 'id'], unique=False)
+    op.create_index('ix_pedidos_estado_ejecucion', 'pedidos_individuales', ['estado', 'fecha_hora_ejecucion', 'id'], unique=False)
+    op.create_index('ix_pedidos_zona_ejecucion', 'pedidos_individuales', ['zona_id', 'fecha_hora_ejecucion', 'id'], unique=False)
+    op.create_index('ix_pedidos_cliente_ejecucion', 'pedidos_individuales', ['cliente_id', 'fecha_hora_ejecucion', 'id'], unique=False)
+    op.create_index('ix_pedidos_tipo_ejecucion', 'pedidos_individuales', ['tipo_servicio', 'fecha_hora_ejecucion', 'id'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('ix_pedidos_tipo_ejecucion', table_name='pedidos_individuales')
+    op.drop_index('ix_pedidos_cliente_ejecucion', table_name='pedidos_individuales')
+    op.drop_index('ix_pedidos_zona_ejecucion', table_name='pedidos_individuales')
+    op.drop_index('ix_pedidos_estado_ejecucion', table_name='pedidos_individuales')
+    op.drop_index('ix_pedidos_ejecucion_id', table_name='pedidos_individuales')
+    op.create_index('ix_pedidos_ejecucion', 'pedidos_individuales', ['fecha_hora_ejecucion'], unique=False)
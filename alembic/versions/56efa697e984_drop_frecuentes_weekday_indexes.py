@@ -0,0 +1,29 @@
+"""Drop the per-weekday partial indexes of servicios_frecuentes
+
+Revision ID: 56efa697e984
+Revises: 55efa697e984
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '56efa697e984'
+down_revision: Union[str, None] = '55efa697e984'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # The day's recurring stops come from servicio_ocurrencia now; dias_mask is
+    # only read when generating visits, so these indexes just cost writes
+    for bit in range(7):
+        op.drop_index(f'ix_frecuentes_dia_{bit}', table_name='servicios_frecuentes')
+
+def downgrade() -> None:
+    for bit in range(7):
+        op.create_index(
+            f'ix_frecuentes_dia_{bit}', 'servicios_frecuentes', ['chofer_id', 'estado'], unique=False,
+            postgresql_where=sa.text(f'(dias_mask & {1 << bit}) <> 0')
+        )
@@ -1,17 +1,23 @@
 import os
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from src.config import settings
 from src.utils.security_extras import limiter, RateLimitExceeded, _rate_limit_exceeded_handler
 from src.db import engine, Base, AsyncSessionLocal
+from src.utils.compute_pool import shutdown_pool
+from src.utils.recurrence import occurrence_worker
+from src.utils.events import hub as event_hub
+from src.utils.positions import positions
+from src.utils.eta import eta_engine
 from src.models import users, geo, business
 from sqlalchemy import select
 from src.security import get_password_hash
 from src.models.users import Usuario
 from src.models.enums import Rol
 
-from src.routers import auth, zones, rutas, clientes, pedidos, frecuentes, driver, balances, dashboard, ai, public, audit
+from src.routers import auth, zones, rutas, clientes, pedidos, frecuentes, driver, balances, dashboard, ai, public, audit, dispatch, vehiculos, agenda, eventos, asignaciones
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -55,10 +61,24 @@ async def lifespan(app: FastAPI):
                 print("Startup: Admin already exists.", flush=True)
         except Exception as e:
             print(f"Startup Error during user check: {e}", flush=True)
+
+    # Keep the recurring-visit calendar filled ahead
+    occurrences_task = asyncio.create_task(occurrence_worker(AsyncSessionLocal))
+    # Live updates: LISTEN for events published by any worker
+    event_hub.start()
+    # GPS fixes: batched writes + latest position per driver
+    await positions.start()
+    # Live ETAs follow positions and stop changes
+    eta_engine.start()
             
     yield
+    occurrences_task.cancel()
+    eta_engine.stop()
+    event_hub.stop()
+    await positions.stop()
     # Shutdown
     print("Shutdown: Cleaning up resources...", flush=True)
+    shutdown_pool()
     await engine.dispose()
 
 def create_app() -> FastAPI:
@@ -93,6 +113,11 @@ def create_app() -> FastAPI:
     app.include_router(ai.router)
     app.include_router(public.router)
     app.include_router(audit.router)
+    app.include_router(dispatch.router)
+    app.include_router(vehiculos.router)
+    app.include_router(agenda.router)
+    app.include_router(eventos.router)
+    app.include_router(asignaciones.router)
 
     @app.get("/")
     async def root():
@@ -17,6 +17,40 @@ class Settings(BaseSettings):
     NOMINATIM_USER_AGENT: str = "volquetes-gestion-app"
     GEMINI_API_KEY: str | None = None
     GOOGLE_MAPS_API_KEY: str | None = None
+
+    # Routing
+    DEPOT_LAT: float | None = None # Yard / base where trucks start the day
+    DEPOT_LNG: float | None = None
+    ROUTE_DAY_START: str = "08:00"
+    ROUTE_AVG_SPEED_KMH: float = 40.0
+    DISPATCH_MAX_STOPS_PER_DRIVER: int = 25
+    DISPATCH_CLUSTER_MIN_STOPS: int = 40 # From this many new orders, split into per-driver clusters first
+    INSERTION_REOPT_THRESHOLD_KM: float = 8.0 # Above this detour the tour is re-optimized
+    ROUTE_POOL_WORKERS: int = 2 # Processes for CPU-bound route optimization
+    ROUTE_POOL_MAX_PENDING: int = 8 # Jobs queued or running before new ones wait
+    ROUTE_COMPUTE_TIMEOUT_S: float = 20.0
+    DISPATCH_COMPUTE_TIMEOUT_S: float = 60.0
+    ROUTE_PLAN_RETRY_S: float = 60.0 # After a timed-out plan, /chofer/hoy serves the cheap order this long
+    OCCURRENCE_HORIZON_DAYS: int = 28 # Recurring visits are materialized this far ahead
+    EVENTS_CHANNEL: str = "serrano_eventos" # Postgres LISTEN/NOTIFY channel for live updates
+    EVENTS_HEARTBEAT_S: float = 15.0
+    EVENTS_QUEUE_SIZE: int = 100 # Per connected client; a slow client gets RESYNC instead
+    SYNC_MAX_MUTATIONS: int = 200 # Per POST /chofer/sync batch
+    BATCH_MAX_ITEMS: int = 500 # Ids per office batch call (estado:batch, asignaciones:batch)
+    POSITION_FLUSH_INTERVAL_S: float = 2.0 # GPS fixes are written in batches this often
+    POSITION_FLUSH_BATCH: int = 500 # ...or as soon as this many are waiting
+    POSITION_BUFFER_MAX: int = 20000 # Oldest fixes are dropped beyond this if the DB is down
+    POSITION_RETENTION_MONTHS: int = 3
+    ETA_MOVE_THRESHOLD_M: float = 300.0 # ETAs are recomputed when the truck moved this far
+    ETA_MAX_FIX_AGE_S: int = 600 # Older positions are ignored; ETAs fall back to the plan
+    ETA_RELOAD_S: int = 300 # Remaining stops are re-read from the DB at least this often
+    PUBLIC_TRACK_MIN_DIGITS: int = 8 # /public/track matches the end of the customer's phone, at least this long
+    # Self-hosted OSRM for road geometry, e.g. "http://osrm:5000" (osrm-backend with the
+    # argentina extract). Empty = straight-line estimate. Don't point this at the
+    # public demo server: its policy forbids production use and it would receive
+    # customer coordinates.
+    OSRM_URL: str = ""
+    OSRM_TIMEOUT_S: float = 10.0
     
     @model_validator(mode='before')
     @classmethod
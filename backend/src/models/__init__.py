@@ -1,6 +1,8 @@
 from .enums import Rol, TipoServicio, EstadoPedido, EstadoFrecuente, MetodoPago
-from .users import Usuario, Chofer, SesionTrabajo
+from .users import Usuario, Chofer, SesionTrabajo, PerfilVehiculo
 from .geo import Zona, RutaDia, GeocodeCache
-from .business import Cliente, PedidoIndividual, ServicioFrecuente, Pago, Gasto
+from .business import Cliente, PedidoIndividual, ServicioFrecuente, Pago, Gasto, ServicioOcurrencia
 from .audit import AuditLog
 from .presupuestos import Presupuesto
+from .planning import RoutePlan, ParadaBaja, SyncMutacion
+from .tracking import PosicionChofer
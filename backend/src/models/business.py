@@ -1,10 +1,10 @@
-from datetime import datetime
+from datetime import datetime, date
 from typing import Optional, List
-from sqlalchemy import String, Float, DateTime, ForeignKey, Enum, Integer, JSON
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, Float, Date, DateTime, ForeignKey, Enum, Integer, SmallInteger, JSON, Index, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
 from src.db import Base
-from src.models.enums import TipoServicio, EstadoPedido, EstadoFrecuente, MetodoPago
-from src.utils.time_utils import get_now_arg
+from src.models.enums import TipoServicio, EstadoPedido, EstadoFrecuente, EstadoOcurrencia, MetodoPago
+from src.utils.time_utils import get_now_arg, dias_to_mask
 
 class Cliente(Base):
     __tablename__ = "clientes"
@@ -23,6 +23,16 @@ class Cliente(Base):
 
 class PedidoIndividual(Base):
     __tablename__ = "pedidos_individuales"
+    __table_args__ = (
+        Index("ix_pedidos_chofer_ejecucion", "chofer_id", "fecha_hora_ejecucion"),
+        # GET /pedidos: keyset on (fecha_hora_ejecucion, id), alone or after an equality filter
+        Index("ix_pedidos_ejecucion_id", "fecha_hora_ejecucion", "id"),
+        Index("ix_pedidos_estado_ejecucion", "estado", "fecha_hora_ejecucion", "id"),
+        Index("ix_pedidos_zona_ejecucion", "zona_id", "fecha_hora_ejecucion", "id"),
+        Index("ix_pedidos_cliente_ejecucion", "cliente_id", "fecha_hora_ejecucion", "id"),
+        Index("ix_pedidos_tipo_ejecucion", "tipo_servicio", "fecha_hora_ejecucion", "id"),
+        Index("ix_pedidos_chofer_actualizado", "chofer_id", "actualizado_en"), # /chofer/hoy/changes
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     cliente_id: Mapped[int] = mapped_column(ForeignKey("clientes.id"))
@@ -63,6 +73,9 @@ class PedidoIndividual(Base):
 
 class ServicioFrecuente(Base):
     __tablename__ = "servicios_frecuentes"
+    __table_args__ = (
+        Index("ix_frecuentes_chofer_actualizado", "chofer_id", "actualizado_en"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     cliente_id: Mapped[int] = mapped_column(ForeignKey("clientes.id"))
@@ -80,6 +93,8 @@ class ServicioFrecuente(Base):
     fecha_fin: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     
     dias_semana: Mapped[list] = mapped_column(JSON) # List of strings ["Lunes", ...]
+    # Same days as a bit mask (bit 0 = Monday), kept in sync with dias_semana; read by recurrence.occurrence_dates
+    dias_mask: Mapped[int] = mapped_column(SmallInteger, default=0, server_default="0")
     dia_saliente: Mapped[Optional[str]] = mapped_column(String, nullable=True) # Specific exit day
     
     chofer_id: Mapped[Optional[int]] = mapped_column(ForeignKey("choferes.id"), nullable=True)
@@ -103,6 +118,11 @@ class ServicioFrecuente(Base):
     chofer: Mapped[Optional["src.models.users.Chofer"]] = relationship("src.models.users.Chofer")
     pagos: Mapped[List["Pago"]] = relationship("Pago", back_populates="frecuente")
 
+    @validates("dias_semana")
+    def _sync_dias_mask(self, key, value):
+        self.dias_mask = dias_to_mask(value)
+        return value
+
 
 class Pago(Base):
     __tablename__ = "pagos"
@@ -121,6 +141,29 @@ class Pago(Base):
     registrador: Mapped[Optional["src.models.users.Usuario"]] = relationship("src.models.users.Usuario")
 
 
+# One scheduled visit of a ServicioFrecuente, expanded over a rolling horizon
+# by utils/recurrence.py. Past rows are kept as the visit history.
+class ServicioOcurrencia(Base):
+    __tablename__ = "servicio_ocurrencia"
+    __table_args__ = (
+        UniqueConstraint("frecuente_id", "fecha", name="uq_ocurrencia_frecuente_fecha"),
+        Index("ix_ocurrencia_chofer_fecha", "chofer_id", "fecha"),
+        Index("ix_ocurrencia_fecha", "fecha"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    frecuente_id: Mapped[int] = mapped_column(ForeignKey("servicios_frecuentes.id", ondelete="CASCADE"))
+    fecha: Mapped[date] = mapped_column(Date)
+    chofer_id: Mapped[Optional[int]] = mapped_column(ForeignKey("choferes.id"), nullable=True) # Copied from the contract
+    estado: Mapped[EstadoOcurrencia] = mapped_column(Enum(EstadoOcurrencia, native_enum=False), default=EstadoOcurrencia.PROGRAMADA)
+    monto: Mapped[float] = mapped_column(Float, default=0.0) # Expected charge for the visit
+    pago_id: Mapped[Optional[int]] = mapped_column(ForeignKey("pagos.id", ondelete="SET NULL"), nullable=True)
+    actualizado_en: Mapped[datetime] = mapped_column(DateTime, default=get_now_arg, onupdate=get_now_arg)
+
+    frecuente: Mapped["ServicioFrecuente"] = relationship("ServicioFrecuente")
+    pago: Mapped[Optional["Pago"]] = relationship("Pago")
+
+
 class Gasto(Base):
     __tablename__ = "gastos"
 
@@ -33,6 +33,23 @@ class EstadoFrecuente(str, Enum):
     FINALIZADO = "FINALIZADO"
     PAGO_PENDIENTE = "PAGO_PENDIENTE"
 
+class EstadoOcurrencia(str, Enum):
+    PROGRAMADA = "PROGRAMADA"
+    EN_CAMINO = "EN_CAMINO"
+    COMPLETADA = "COMPLETADA"
+    PAGO_PENDIENTE = "PAGO_PENDIENTE"
+    CANCELADA = "CANCELADA"
+
+class TipoEvento(str, Enum):
+    ASIGNACION = "ASIGNACION"
+    ESTADO = "ESTADO"
+    PAGO_REPORTADO = "PAGO_REPORTADO"
+    PAGO_REGISTRADO = "PAGO_REGISTRADO" # Payment recorded by the office; the stop is completed
+    PARADA_EDITADA = "PARADA_EDITADA" # Address, time window or schedule of a stop changed
+    RUTA_REORDENADA = "RUTA_REORDENADA"
+    POSICION = "POSICION" # Latest GPS fix of one or more drivers
+    RESYNC = "RESYNC" # Events may have been lost: refetch everything
+
 class MetodoPago(str, Enum):
     EFECTIVO = "EFECTIVO"
     TRANSFERENCIA = "TRANSFERENCIA"
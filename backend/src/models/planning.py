@@ -0,0 +1,60 @@
+from datetime import datetime, date
+from typing import Optional
+from sqlalchemy import String, Float, Date, DateTime, ForeignKey, JSON, UniqueConstraint, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from src.db import Base
+from src.utils.time_utils import get_now_arg
+
+# Computed stop sequence of a driver for one day. Rows are deleted whenever
+# the inputs change (assignment, state, reorder, address); see route_planner.
+class RoutePlan(Base):
+    __tablename__ = "route_plan"
+    __table_args__ = (
+        UniqueConstraint("chofer_id", "fecha", "modo", name="uq_route_plan_chofer_fecha_modo"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    chofer_id: Mapped[int] = mapped_column(ForeignKey("choferes.id", ondelete="CASCADE"))
+    fecha: Mapped[date] = mapped_column(Date)
+    modo: Mapped[str] = mapped_column(String, default="cercania") # "cercania" | "ventanas"
+    # [{"tipo": "P"|"F", "id": int, "llegada": "HH:MM"|None, "ventana": str|None, "minutos_tarde": int}, ...]
+    secuencia: Mapped[list] = mapped_column(JSON)
+    distancia_km: Mapped[float] = mapped_column(Float, default=0.0)
+    duracion_min: Mapped[float] = mapped_column(Float, default=0.0)
+    creado_en: Mapped[datetime] = mapped_column(DateTime, default=get_now_arg)
+    # Road geometry of the sequence (encoded polyline + legs), computed on first request.
+    # geometria_hash identifies the stops/coordinates it was built from.
+    geometria: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    geometria_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+
+
+# Stop that left a driver's list (reassigned or deleted). Lets /chofer/hoy/changes
+# tell the app what to drop; rows only matter for a day or two.
+class ParadaBaja(Base):
+    __tablename__ = "parada_baja"
+    __table_args__ = (
+        Index("ix_parada_baja_chofer_creado", "chofer_id", "creado_en"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    chofer_id: Mapped[int] = mapped_column(ForeignKey("choferes.id", ondelete="CASCADE"))
+    tipo: Mapped[str] = mapped_column(String(1)) # "P" | "F"
+    item_id: Mapped[int]
+    creado_en: Mapped[datetime] = mapped_column(DateTime, default=get_now_arg, index=True)
+
+
+# Mutation replayed through POST /chofer/sync, keyed by the app's idempotency
+# key so a retried batch never applies the same change twice.
+class SyncMutacion(Base):
+    __tablename__ = "sync_mutacion"
+    __table_args__ = (
+        UniqueConstraint("chofer_id", "clave", name="uq_sync_mutacion_chofer_clave"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    chofer_id: Mapped[int] = mapped_column(ForeignKey("choferes.id", ondelete="CASCADE"))
+    clave: Mapped[str] = mapped_column(String(64))
+    tipo: Mapped[str] = mapped_column(String)
+    cliente_ts: Mapped[datetime] = mapped_column(DateTime) # When it happened on the device
+    resultado: Mapped[dict] = mapped_column(JSON) # Returned again on retries
+    creado_en: Mapped[datetime] = mapped_column(DateTime, default=get_now_arg)
@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import BigInteger, Float, DateTime, Index, Identity
+from sqlalchemy.orm import Mapped, mapped_column
+from src.db import Base
+from src.utils.time_utils import get_now_arg
+
+# GPS fixes from the driver app. Range-partitioned by month on registrado_en
+# (partitions are created ahead and dropped after retention by utils.positions);
+# written in batches, never row by row. No FK to choferes to keep inserts cheap.
+class PosicionChofer(Base):
+    __tablename__ = "posicion_chofer"
+    __table_args__ = (
+        Index("ix_posicion_chofer_chofer_registrado", "chofer_id", "registrado_en"),
+        {"postgresql_partition_by": "RANGE (registrado_en)"},
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    registrado_en: Mapped[datetime] = mapped_column(DateTime, primary_key=True) # Device time (ARG, naive)
+    chofer_id: Mapped[int]
+    lat: Mapped[float] = mapped_column(Float)
+    lng: Mapped[float] = mapped_column(Float)
+    velocidad_kmh: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    rumbo: Mapped[Optional[float]] = mapped_column(Float, nullable=True) # Degrees from north
+    precision_m: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    recibido_en: Mapped[datetime] = mapped_column(DateTime, default=get_now_arg)
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional, List
-from sqlalchemy import String, Boolean, DateTime, ForeignKey, Enum, Float
+from sqlalchemy import String, Boolean, DateTime, ForeignKey, Enum, Float, JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from src.db import Base
 from src.models.enums import Rol
@@ -37,6 +37,16 @@ class SesionTrabajo(Base):
     chofer: Mapped["Chofer"] = relationship("Chofer", back_populates="sesiones")
 
 
+class PerfilVehiculo(Base):
+    __tablename__ = "perfiles_vehiculo"
+
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    nombre: Mapped[str] = mapped_column(String, unique=True) # E.g. "Camión volquetero"
+    tipos_permitidos: Mapped[list] = mapped_column(JSON, default=list) # TipoServicio values; empty = all
+    capacidad: Mapped[dict] = mapped_column(JSON, default=dict) # {TipoServicio value: units per trip}; missing = unlimited
+    activo: Mapped[bool] = mapped_column(Boolean, default=True)
+
+
 class Chofer(Base):
     __tablename__ = "choferes"
 
@@ -45,10 +55,12 @@ class Chofer(Base):
     telefono: Mapped[str] = mapped_column(String)
     patente: Mapped[str] = mapped_column(String)
     zona_gastos: Mapped[Optional[str]] = mapped_column(String, nullable=True) # E.g. "Zona de viáticos"
+    perfil_vehiculo_id: Mapped[Optional[int]] = mapped_column(ForeignKey("perfiles_vehiculo.id"), nullable=True)
 
     # Relationships
     usuario: Mapped["Usuario"] = relationship("Usuario", back_populates="chofer_perfil")
     sesiones: Mapped[List["SesionTrabajo"]] = relationship("SesionTrabajo", back_populates="chofer")
+    perfil_vehiculo: Mapped[Optional["PerfilVehiculo"]] = relationship("PerfilVehiculo")
     # rutas: Mapped[List["RutaDia"]] = relationship("RutaDia", back_populates="chofer")
     # pedidos: Mapped[List["PedidoIndividual"]] = relationship("PedidoIndividual", back_populates="chofer")
     # frecuentes: Mapped[List["ServicioFrecuente"]] = relationship("ServicioFrecuente", back_populates="chofer")
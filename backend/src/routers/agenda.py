@@ -0,0 +1,105 @@
+from datetime import date
+from typing import Annotated, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, union_all, cast, func, literal_column, String, DateTime
+from src.db import get_db
+from src.models.business import PedidoIndividual, ServicioFrecuente, ServicioOcurrencia, Cliente
+from src.models.enums import Rol
+from src.models.users import Usuario
+from src.schemas.all import AgendaPage
+from src.deps import get_current_active_user
+from src.utils.time_utils import day_bounds
+
+router = APIRouter(prefix="/agenda", tags=["Agenda"])
+
+# Keeps a single request from scanning months of history
+MAX_RANGE_DAYS = 92
+
+def _pedidos_stmt(desde: date, hasta: date):
+    start, end = day_bounds(desde, hasta)
+    return select(
+        literal_column("'P'", String).label("tipo"),
+        PedidoIndividual.id.label("id"),
+        PedidoIndividual.id.label("referencia_id"),
+        PedidoIndividual.fecha_hora_ejecucion.label("momento"),
+        PedidoIndividual.chofer_id.label("chofer_id"),
+        PedidoIndividual.zona_id.label("zona_id"),
+        PedidoIndividual.cliente_id.label("cliente_id"),
+        Cliente.nombre.label("cliente_nombre"),
+        PedidoIndividual.direccion.label("direccion"),
+        PedidoIndividual.tipo_servicio.label("tipo_servicio"),
+        cast(PedidoIndividual.estado, String).label("estado"),
+        PedidoIndividual.costo.label("monto"),
+        PedidoIndividual.rango_horario.label("rango_horario"),
+        PedidoIndividual.orden_en_ruta.label("orden_en_ruta"),
+    ).join(Cliente, PedidoIndividual.cliente_id == Cliente.id).where(
+        PedidoIndividual.fecha_hora_ejecucion >= start,
+        PedidoIndividual.fecha_hora_ejecucion < end
+    )
+
+def _visitas_stmt(desde: date, hasta: date):
+    return select(
+        literal_column("'F'", String).label("tipo"),
+        ServicioOcurrencia.id.label("id"),
+        ServicioOcurrencia.frecuente_id.label("referencia_id"),
+        cast(ServicioOcurrencia.fecha, DateTime).label("momento"),
+        ServicioOcurrencia.chofer_id.label("chofer_id"),
+        ServicioFrecuente.zona_id.label("zona_id"),
+        ServicioFrecuente.cliente_id.label("cliente_id"),
+        Cliente.nombre.label("cliente_nombre"),
+        ServicioFrecuente.direccion.label("direccion"),
+        ServicioFrecuente.tipo_servicio.label("tipo_servicio"),
+        cast(ServicioOcurrencia.estado, String).label("estado"),
+        ServicioOcurrencia.monto.label("monto"),
+        ServicioFrecuente.rango_horario.label("rango_horario"),
+        ServicioFrecuente.orden_en_ruta.label("orden_en_ruta"),
+    ).join(ServicioFrecuente, ServicioOcurrencia.frecuente_id == ServicioFrecuente.id)\
+     .join(Cliente, ServicioFrecuente.cliente_id == Cliente.id)\
+     .where(ServicioOcurrencia.fecha >= desde, ServicioOcurrencia.fecha <= hasta)
+
+@router.get("/", response_model=AgendaPage)
+async def get_agenda(
+    desde: date,
+    hasta: date,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[Usuario, Depends(get_current_active_user)],
+    chofer_id: Optional[int] = None,
+    zona_id: Optional[int] = None,
+    limit: Annotated[int, Query(ge=1, le=500)] = 200,
+    offset: Annotated[int, Query(ge=0)] = 0
+):
+    """
+    Individual orders (by fecha_hora_ejecucion) and recurring visits (from the
+    occurrence calendar) between `desde` and `hasta`, inclusive, in one list
+    sorted by date/time. Orders without an execution date aren't scheduled and
+    don't show up. Drivers only see their own stops.
+    """
+    if hasta < desde:
+        raise HTTPException(status_code=400, detail="'hasta' es anterior a 'desde'")
+    if (hasta - desde).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"El rango no puede superar {MAX_RANGE_DAYS} días")
+    if current_user.rol == Rol.CHOFER:
+        chofer_id = current_user.chofer_perfil.id if current_user.chofer_perfil else -1
+    elif current_user.rol not in [Rol.ADMIN, Rol.RECEPCIONISTA]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    stmt_ped = _pedidos_stmt(desde, hasta)
+    stmt_vis = _visitas_stmt(desde, hasta)
+    if chofer_id is not None:
+        stmt_ped = stmt_ped.where(PedidoIndividual.chofer_id == chofer_id)
+        stmt_vis = stmt_vis.where(ServicioOcurrencia.chofer_id == chofer_id)
+    if zona_id is not None:
+        stmt_ped = stmt_ped.where(PedidoIndividual.zona_id == zona_id)
+        stmt_vis = stmt_vis.where(ServicioFrecuente.zona_id == zona_id)
+
+    agenda = union_all(stmt_ped, stmt_vis).subquery()
+    total = (await db.execute(select(func.count()).select_from(agenda))).scalar_one()
+    page = select(agenda).order_by(
+        agenda.c.momento,
+        agenda.c.orden_en_ruta.asc().nulls_last(),
+        agenda.c.tipo,
+        agenda.c.id
+    ).limit(limit).offset(offset)
+    items = (await db.execute(page)).mappings().all()
+    return {"desde": desde, "hasta": hasta, "total": total, "limit": limit, "offset": offset, "items": items}
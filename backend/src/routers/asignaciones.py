@@ -0,0 +1,88 @@
+from typing import Annotated, List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.config import settings
+from src.db import get_db
+from src.models.business import PedidoIndividual, ServicioFrecuente
+from src.models.enums import Rol, TipoEvento
+from src.models.users import Usuario
+from src.deps import get_current_active_user
+from src.utils.batch_ops import apply_assignment_batch
+from src.utils.delta_sync import record_removed_stops
+from src.utils.events import publish_many
+from src.utils.recurrence import reassign_upcoming
+from src.utils.route_planner import invalidate_route_plans, load_vehicle_profiles
+from src.utils.security_extras import log_actions
+
+router = APIRouter(tags=["Asignaciones"])
+
+class AsignacionLote(BaseModel):
+    tipo: Literal["P", "F"]
+    id: int
+    chofer_id: Optional[int] = None # None: unassign
+
+class ResultadoAsignacion(BaseModel):
+    tipo: str
+    id: int
+    resultado: str # "aplicado" | "sin_cambio" | "rechazado"
+    estado: Optional[str] = None
+    chofer_id: Optional[int] = None
+    detalle: Optional[str] = None
+
+def check_staff(user: Usuario):
+    if user.rol not in [Rol.ADMIN, Rol.RECEPCIONISTA]:
+         raise HTTPException(status_code=403, detail="Not authorized")
+
+@router.post("/asignaciones:batch", response_model=List[ResultadoAsignacion])
+async def assign_drivers_batch(
+    request: Request,
+    data: List[AsignacionLote],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[Usuario, Depends(get_current_active_user)]
+):
+    """
+    Assigns (or unassigns, chofer_id null) many orders / recurring services at
+    once, e.g. a whole zone from the dispatch board. Orders still CREADA become
+    ASIGNADA. Stops that don't exist or the driver's vehicle can't serve are
+    reported as "rechazado" and the rest is applied. One result per item, in the
+    order given.
+    """
+    check_staff(current_user)
+    if not data:
+        raise HTTPException(status_code=400, detail="No hay asignaciones")
+    if len(data) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Máximo {settings.BATCH_MAX_ITEMS} ids por lote")
+    keys = [(a.tipo, a.id) for a in data]
+    if len(set(keys)) != len(keys):
+        raise HTTPException(status_code=400, detail="Paradas repetidas en el pedido")
+
+    perfiles = await load_vehicle_profiles(db, {a.chofer_id for a in data if a.chofer_id is not None})
+    resultados = {}
+    afectados = set()
+    for tipo, model, recurso in (("P", PedidoIndividual, "pedidos"), ("F", ServicioFrecuente, "frecuentes")):
+        asignaciones = {a.id: a.chofer_id for a in data if a.tipo == tipo}
+        if not asignaciones:
+            continue
+        por_id, cambios = await apply_assignment_batch(db, model, asignaciones, perfiles)
+        resultados.update({(tipo, item_id): r for item_id, r in por_id.items()})
+        if not cambios:
+            continue
+        if tipo == "F":
+            await reassign_upcoming(db, {item_id: nuevo for item_id, _, nuevo in cambios})
+        bajas = {}
+        for item_id, anterior, nuevo in cambios:
+            afectados.update((anterior, nuevo))
+            bajas.setdefault(anterior, []).append(item_id)
+        for anterior, ids in bajas.items():
+            await record_removed_stops(db, anterior, tipo, ids)
+        await publish_many(db, TipoEvento.ASIGNACION, recurso, [
+            (item_id, [anterior, nuevo], {"chofer_id": nuevo}) for item_id, anterior, nuevo in cambios
+        ])
+        await log_actions(db, current_user.id, "ASSIGN_DRIVER", recurso, [
+            (item_id, {"anterior": anterior, "chofer_id": nuevo, "lote": True}) for item_id, anterior, nuevo in cambios
+        ], request=request)
+
+    await invalidate_route_plans(db, afectados)
+    await db.commit()
+    return [{"tipo": tipo, "id": item_id, **resultados[(tipo, item_id)]} for tipo, item_id in keys]
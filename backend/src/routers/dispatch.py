@@ -0,0 +1,449 @@
+import asyncio
+import hashlib
+import json
+from datetime import date, datetime
+from typing import Annotated, List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from src.db import get_db
+from src.config import settings
+from src.models.business import PedidoIndividual
+from src.models.enums import Rol, EstadoPedido, TipoEvento
+from src.models.users import Usuario, Chofer
+from src.models.planning import RoutePlan
+from src.deps import get_current_active_user
+from src.utils.compute_pool import run_in_pool, ComputeTimeout
+from src.utils.driver_day import zones_for_day, load_pending_stops
+from src.utils.optimization import stop_load
+from src.utils.route_jobs import partition_dispatch, solve_dispatch
+from src.utils.route_planner import (
+    suggest_drivers, insert_into_tour, invalidate_route_plans, check_vehicle_allows,
+    vehicle_allows, vehicle_capacity, load_vehicle_profiles
+)
+from src.utils.time_utils import get_now_arg, day_bounds
+from src.utils.time_windows import window_for_stop, estimate_service_minutes, parse_clock, format_clock
+from src.utils.security_extras import log_action
+from src.utils.events import publish
+from src.utils.delta_sync import record_removed_stops
+from src.utils.simulation import simulate_changes
+from src.utils.positions import positions
+from src.utils.eta import eta_engine
+
+router = APIRouter(prefix="/dispatch", tags=["Dispatch"])
+
+def check_staff(user: Usuario):
+    if user.rol not in [Rol.ADMIN, Rol.RECEPCIONISTA]:
+         raise HTTPException(status_code=403, detail="Not authorized")
+
+class ParadaPropuesta(BaseModel):
+    tipo: str # "P" | "F"
+    id: int
+    orden: int
+    nueva: bool # False for stops the driver already had
+    llegada: Optional[str] = None
+    minutos_tarde: int = 0
+    regreso_base_antes: bool = False # Truck goes back to the yard before this stop
+
+class RutaPropuesta(BaseModel):
+    chofer_id: int
+    chofer_nombre: str
+    paradas: List[ParadaPropuesta]
+    distancia_km: float
+    duracion_min: float
+
+class DispatchPropuesta(BaseModel):
+    fecha: date
+    rutas: List[RutaPropuesta]
+    sin_asignar: List[int] # pedido ids nobody could take (no coordinates, no compatible truck, no room)
+
+class ParadaCommit(BaseModel):
+    id: int # pedido id
+    orden: int
+
+class AsignacionCommit(BaseModel):
+    chofer_id: int
+    paradas: List[ParadaCommit] # Only the new orders ("nueva" in the preview)
+
+class DispatchCommit(BaseModel):
+    fecha: date
+    asignaciones: List[AsignacionCommit]
+
+class CambioSimulado(BaseModel):
+    tipo: Literal["P", "F"] = "P"
+    id: int
+    chofer_id: Optional[int] = None # None: the stop leaves every route
+    orden: Optional[int] = None # 1-based position; None: cheapest position
+
+class SimulacionRequest(BaseModel):
+    fecha: date
+    cambios: List[CambioSimulado]
+
+class MetricasRuta(BaseModel):
+    paradas: int
+    distancia_km: float
+    duracion_min: float
+    fin: Optional[str] = None
+    minutos_tarde: int
+    paradas_tarde: int
+    regresos_base: int
+
+class ParadaSimulada(BaseModel):
+    tipo: str
+    id: int
+
+class SimulacionChofer(BaseModel):
+    chofer_id: int
+    antes: MetricasRuta
+    despues: MetricasRuta
+    delta_distancia_km: float
+    delta_duracion_min: float
+    delta_minutos_tarde: int
+    secuencia: List[ParadaSimulada]
+
+class PosicionActual(BaseModel):
+    chofer_id: int
+    lat: float
+    lng: float
+    velocidad_kmh: Optional[float] = None
+    rumbo: Optional[float] = None
+    precision_m: Optional[float] = None
+    registrado_en: datetime
+    antiguedad_s: int # Seconds since the fix
+
+class EtaParada(BaseModel):
+    tipo: str
+    id: int
+    llegada: str # "HH:MM"
+    minutos: int # From now
+
+class EtaChofer(BaseModel):
+    chofer_id: int
+    origen: Literal["gps", "plan"] # "plan": no recent position, first stop at its planned time
+    calculado_en: Optional[datetime] = None
+    posicion_en: Optional[datetime] = None
+    paradas: List[EtaParada]
+
+class SimulacionResponse(BaseModel):
+    fecha: date
+    choferes: List[SimulacionChofer]
+    avisos: List[str] = []
+
+async def _solve_clustered(key: tuple, payload: dict) -> dict:
+    """Big day: one territory per driver, each routed as its own pool job, in parallel."""
+    timeout = settings.DISPATCH_COMPUTE_TIMEOUT_S
+    parts, unplaced = await run_in_pool(key + ("clusters",), partition_dispatch, payload, timeout=timeout)
+    results = await asyncio.gather(*(
+        run_in_pool(key + (v,), solve_dispatch, sub, timeout=timeout)
+        for v, (sub, _) in enumerate(parts)
+    ))
+    rutas = []
+    sin_asignar = list(unplaced)
+    for (_, indices), result in zip(parts, results):
+        ruta = result["rutas"][0]
+        rutas.append({**ruta, "orden": [indices[i] for i in ruta["orden"]]})
+        sin_asignar.extend(indices[i] for i in result["sin_asignar"])
+    return {"rutas": rutas, "sin_asignar": sin_asignar}
+
+def _stop_kind(item) -> str:
+    return "P" if isinstance(item, PedidoIndividual) else "F"
+
+@router.post("/optimize", response_model=DispatchPropuesta)
+async def optimize_dispatch(
+    fecha: date,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[Usuario, Depends(get_current_active_user)]
+):
+    """
+    Preview: proposes which driver takes each unassigned order of `fecha` and
+    in which order, without writing anything. Apply it with POST /dispatch/commit.
+    """
+    check_staff(current_user)
+
+    start, end = day_bounds(fecha)
+    stmt = select(PedidoIndividual).where(
+        PedidoIndividual.chofer_id == None,
+        PedidoIndividual.estado == EstadoPedido.CREADA,
+        PedidoIndividual.fecha_hora_ejecucion >= start,
+        PedidoIndividual.fecha_hora_ejecucion < end
+    )
+    pendientes = (await db.execute(stmt)).scalars().all()
+
+    stmt_ch = select(Chofer).join(Usuario, Chofer.usuario_id == Usuario.id)\
+        .where(Usuario.activo == True)\
+        .options(selectinload(Chofer.usuario), selectinload(Chofer.perfil_vehiculo))
+    choferes = (await db.execute(stmt_ch)).scalars().all()
+    if not choferes:
+        raise HTTPException(status_code=400, detail="No hay choferes activos")
+
+    zonas_chofer, zonas_generales = await zones_for_day(db, fecha.weekday())
+    existentes = await load_pending_stops(db, fecha, [c.id for c in choferes])
+
+    # Matrix layout: [depot?] + existing stops of every driver + new orders
+    items = []
+    points = []
+    origin = None
+    if settings.DEPOT_LAT is not None and settings.DEPOT_LNG is not None:
+        points.append((settings.DEPOT_LAT, settings.DEPOT_LNG))
+        items.append(None)
+        origin = 0
+
+    vehicles = []
+    for chofer in choferes:
+        fixed = []
+        for stop in existentes.get(chofer.id, []):
+            if stop.lat is None or stop.lng is None:
+                continue
+            fixed.append(len(points))
+            points.append((stop.lat, stop.lng))
+            items.append(stop)
+        vehicles.append({
+            "origin": origin,
+            "max_paradas": settings.DISPATCH_MAX_STOPS_PER_DRIVER,
+            "capacidad": vehicle_capacity(chofer.perfil_vehiculo),
+            "fixed": fixed,
+        })
+
+    stops = []
+    descartados = []
+    for pedido in pendientes:
+        if pedido.lat is None or pedido.lng is None:
+            descartados.append(pedido.id)
+            continue
+        # Drivers whose zones for the day cover this order; general rules apply to everyone.
+        if pedido.zona_id is not None and pedido.zona_id in zonas_generales:
+            allowed = list(range(len(choferes)))
+        else:
+            allowed = [v for v, c in enumerate(choferes) if pedido.zona_id in zonas_chofer.get(c.id, set())]
+        if not allowed:
+            # Zone not planned for anybody today: any driver may absorb it
+            allowed = list(range(len(choferes)))
+        # A truck can only take service types its vehicle profile allows
+        allowed = [v for v in allowed if vehicle_allows(choferes[v].perfil_vehiculo, pedido.tipo_servicio)]
+        if not allowed:
+            descartados.append(pedido.id)
+            continue
+        stops.append((len(points), allowed))
+        points.append((pedido.lat, pedido.lng))
+        items.append(pedido)
+
+    windows = [window_for_stop(i) if i is not None else None for i in items]
+    service = [estimate_service_minutes(i.tipo_servicio, getattr(i, "cantidad", 1)) if i is not None else 0 for i in items]
+    loads = [stop_load(i) if i is not None else None for i in items]
+    start_minute = parse_clock(settings.ROUTE_DAY_START)
+
+    payload = {
+        "points": points, "windows": windows, "service": service, "loads": loads,
+        "vehicles": vehicles, "stops": stops, "start_minute": start_minute,
+        "speed_kmh": settings.ROUTE_AVG_SPEED_KMH, "origin": origin,
+    }
+    try:
+        fingerprint = hashlib.sha1(json.dumps(payload, separators=(",", ":")).encode("utf-8")).hexdigest()
+        key = ("dispatch", fecha, fingerprint)
+        if len(stops) >= settings.DISPATCH_CLUSTER_MIN_STOPS:
+            result = await _solve_clustered(key, payload)
+        else:
+            result = await run_in_pool(key, solve_dispatch, payload, timeout=settings.DISPATCH_COMPUTE_TIMEOUT_S)
+    except ComputeTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    rutas = []
+    for chofer, vehicle, ruta in zip(choferes, vehicles, result["rutas"]):
+        route = ruta["orden"]
+        fixed = set(vehicle["fixed"])
+        if not route or fixed.issuperset(route):
+            continue
+        regresos = set(ruta["regresos"])
+        paradas = [
+            ParadaPropuesta(
+                tipo=_stop_kind(items[idx]),
+                id=items[idx].id,
+                orden=pos + 1,
+                nueva=idx not in fixed,
+                llegada=format_clock(ruta["llegadas"][pos]),
+                minutos_tarde=int(round(ruta["tardanzas"][pos])),
+                regreso_base_antes=pos in regresos
+            )
+            for pos, idx in enumerate(route)
+        ]
+        rutas.append(RutaPropuesta(
+            chofer_id=chofer.id,
+            chofer_nombre=chofer.usuario.nombre if chofer.usuario else str(chofer.id),
+            paradas=paradas,
+            distancia_km=round(ruta["distancia_km"], 2),
+            duracion_min=round(ruta["duracion_min"], 1)
+        ))
+
+    return DispatchPropuesta(
+        fecha=fecha,
+        rutas=rutas,
+        sin_asignar=[items[idx].id for idx in result["sin_asignar"]] + descartados
+    )
+
+@router.get("/posiciones", response_model=List[PosicionActual])
+async def latest_positions(
+    current_user: Annotated[Usuario, Depends(get_current_active_user)]
+):
+    """Last known position of every driver, served from memory (kept current through POSICION events)."""
+    check_staff(current_user)
+    now = get_now_arg()
+    return [
+        PosicionActual(**fix, antiguedad_s=max(int((now - fix["registrado_en"]).total_seconds()), 0))
+        for fix in positions.latest()
+    ]
+
+@router.get("/eta", response_model=List[EtaChofer])
+async def live_etas(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[Usuario, Depends(get_current_active_user)],
+    chofer_id: Optional[int] = None
+):
+    """
+    Estimated arrival at each remaining stop, from the driver's last position
+    along their stored route. Every driver with a plan today unless `chofer_id`.
+    """
+    check_staff(current_user)
+    if chofer_id is not None:
+        ids = [chofer_id]
+    else:
+        stmt = select(RoutePlan.chofer_id).where(RoutePlan.fecha == datetime.now().date()).distinct()
+        ids = sorted((await db.execute(stmt)).scalars().all())
+    return [await eta_engine.for_driver(db, cid) for cid in ids]
+
+@router.post("/simular", response_model=SimulacionResponse)
+async def simulate_dispatch_changes(
+    data: SimulacionRequest,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[Usuario, Depends(get_current_active_user)]
+):
+    """
+    What-if for reassignments / reorders before applying them with
+    PATCH /pedidos/{id}/chofer or /rutas/reordenar: km, duration, finish time and
+    lateness per affected driver, before and after. Writes nothing.
+    """
+    check_staff(current_user)
+    if not data.cambios:
+        raise HTTPException(status_code=400, detail="No hay cambios para simular")
+    return await simulate_changes(db, data.fecha, data.cambios)
+
+@router.post("/commit")
+async def commit_dispatch(
+    request: Request,
+    data: DispatchCommit,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[Usuario, Depends(get_current_active_user)]
+):
+    """
+    Applies a (possibly edited) proposal from /dispatch/optimize. Orders that
+    were assigned by someone else, changed state or date in the meantime, or
+    that the driver's vehicle can't carry, are skipped and reported in "omitidos".
+    """
+    check_staff(current_user)
+
+    ids = [p.id for a in data.asignaciones for p in a.paradas]
+    if len(ids) != len(set(ids)):
+        raise HTTPException(status_code=400, detail="Un pedido aparece en más de una ruta")
+
+    # Locked until commit: the proposal may be minutes old, so each order is re-checked here
+    stmt = select(PedidoIndividual).where(PedidoIndividual.id.in_(ids)).with_for_update()
+    pedidos = {p.id: p for p in (await db.execute(stmt)).scalars().all()}
+    perfiles = await load_vehicle_profiles(db, [a.chofer_id for a in data.asignaciones])
+    start, end = day_bounds(data.fecha)
+
+    aplicados = []
+    omitidos = []
+    for asignacion in data.asignaciones:
+        for parada in asignacion.paradas:
+            pid = parada.id
+            pedido = pedidos.get(pid)
+            if not pedido:
+                omitidos.append({"id": pid, "motivo": "No encontrado"})
+                continue
+            if asignacion.chofer_id not in perfiles:
+                omitidos.append({"id": pid, "motivo": f"Chofer {asignacion.chofer_id} no encontrado"})
+                continue
+            if pedido.chofer_id is not None and pedido.chofer_id != asignacion.chofer_id:
+                omitidos.append({"id": pid, "motivo": "Ya asignado a otro chofer"})
+                continue
+            # CREADA, or ASIGNADA to this same driver when the commit is retried
+            pendiente = pedido.estado == EstadoPedido.CREADA or \
+                (pedido.estado == EstadoPedido.ASIGNADA and pedido.chofer_id == asignacion.chofer_id)
+            if not pendiente:
+                omitidos.append({"id": pid, "motivo": f"Ya no está pendiente ({pedido.estado.value})"})
+                continue
+            if pedido.fecha_hora_ejecucion is None or not (start <= pedido.fecha_hora_ejecucion < end):
+                omitidos.append({"id": pid, "motivo": f"Ya no es del {data.fecha.isoformat()}"})
+                continue
+            if not vehicle_allows(perfiles[asignacion.chofer_id], pedido.tipo_servicio):
+                omitidos.append({"id": pid, "motivo": f"El vehículo del chofer no admite el servicio '{pedido.tipo_servicio}'"})
+                continue
+            pedido.chofer_id = asignacion.chofer_id
+            pedido.orden_en_ruta = parada.orden
+            if pedido.estado == EstadoPedido.CREADA:
+                pedido.estado = EstadoPedido.ASIGNADA
+            aplicados.append(pid)
+
+    await invalidate_route_plans(db, [a.chofer_id for a in data.asignaciones])
+    for asignacion in data.asignaciones:
+        propios = [p.id for p in asignacion.paradas if p.id in aplicados]
+        if propios:
+            await publish(db, TipoEvento.ASIGNACION, "pedidos", None, [asignacion.chofer_id], pedidos=propios)
+    await db.commit()
+    await log_action(current_user.id, "DISPATCH_COMMIT", "pedidos", None,
+                     {"fecha": data.fecha.isoformat(), "pedidos": aplicados}, request=request)
+    return {"aplicados": aplicados, "omitidos": omitidos}
+
+@router.get("/sugerencia/{pedido_id}")
+async def suggest_driver_for_pedido(
+    pedido_id: int,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[Usuario, Depends(get_current_active_user)]
+):
+    """Drivers ranked by the extra km their current tour needs to absorb the order."""
+    check_staff(current_user)
+    pedido = (await db.execute(select(PedidoIndividual).where(PedidoIndividual.id == pedido_id))).scalar_one_or_none()
+    if not pedido:
+        raise HTTPException(status_code=404, detail="Pedido not found")
+    if pedido.lat is None or pedido.lng is None:
+        raise HTTPException(status_code=400, detail="El pedido no tiene coordenadas")
+
+    stmt_ch = select(Chofer.id).join(Usuario, Chofer.usuario_id == Usuario.id).where(Usuario.activo == True)
+    chofer_ids = list((await db.execute(stmt_ch)).scalars().all())
+    fecha = pedido.fecha_hora_ejecucion.date() if pedido.fecha_hora_ejecucion else get_now_arg().date()
+    return {"pedido_id": pedido.id, "fecha": fecha, "ranking": await suggest_drivers(db, pedido, fecha, chofer_ids)}
+
+@router.post("/insertar/{pedido_id}")
+async def insert_pedido_into_route(
+    request: Request,
+    pedido_id: int,
+    chofer_id: int,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[Usuario, Depends(get_current_active_user)]
+):
+    """Assigns the order and slots it into the driver's current tour without recomputing it."""
+    check_staff(current_user)
+    pedido = (await db.execute(select(PedidoIndividual).where(PedidoIndividual.id == pedido_id))).scalar_one_or_none()
+    if not pedido:
+        raise HTTPException(status_code=404, detail="Pedido not found")
+    if not await db.get(Chofer, chofer_id):
+        raise HTTPException(status_code=404, detail="Chofer no encontrado")
+    if pedido.estado not in (EstadoPedido.CREADA, EstadoPedido.ASIGNADA):
+        raise HTTPException(status_code=409, detail=f"El pedido ya no está pendiente ({pedido.estado.value})")
+
+    await check_vehicle_allows(db, chofer_id, pedido.tipo_servicio)
+    fecha = pedido.fecha_hora_ejecucion.date() if pedido.fecha_hora_ejecucion else get_now_arg().date()
+    previous_chofer_id = pedido.chofer_id
+    pedido.chofer_id = chofer_id
+    if pedido.estado == EstadoPedido.CREADA:
+        pedido.estado = EstadoPedido.ASIGNADA
+    await invalidate_route_plans(db, [previous_chofer_id, chofer_id])
+    resultado = await insert_into_tour(db, pedido, chofer_id, fecha)
+    if previous_chofer_id != chofer_id:
+        await record_removed_stops(db, previous_chofer_id, "P", [pedido.id])
+    await publish(db, TipoEvento.ASIGNACION, "pedidos", pedido.id, [previous_chofer_id, chofer_id], chofer_id=chofer_id)
+    await db.commit()
+
+    await log_action(current_user.id, "INSERT_IN_ROUTE", "pedidos", pedido.id, {"chofer_id": chofer_id, **resultado}, request=request)
+    return {"pedido_id": pedido.id, "chofer_id": chofer_id, **resultado}
@@ -1,23 +1,45 @@
-from datetime import datetime
-from typing import Annotated, List, Optional, Any
-from fastapi import APIRouter, Depends, HTTPException
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Annotated, Dict, List, Optional, Any, Literal
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, and_, cast, Date
-from sqlalchemy.orm import selectinload
-from pydantic import BaseModel
+from sqlalchemy import select, or_, and_, cast, Date, inspect, func, exists
+from sqlalchemy.orm import selectinload, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+from pydantic import BaseModel, Field, ValidationError
 from src.db import get_db
 from src.models.geo import RutaDia, Zona
-from src.models.business import PedidoIndividual, ServicioFrecuente
+from src.models.business import PedidoIndividual, ServicioFrecuente, ServicioOcurrencia
 from src.models.enums import Rol, EstadoPedido, EstadoFrecuente
 from src.models.users import Usuario, Chofer
 from src.schemas.all import PedidoRead, FrecuenteRead, ZonaRead, ChoferRead
 from src.deps import get_current_active_user, get_admin_user
-from src.utils.optimization import sort_by_nearest_neighbor
-from src.utils.time_utils import get_now_arg
+from src.utils.route_planner import (
+    get_route_plan, save_route_plan, compute_day_sequence, compute_day_sequence_pooled, apply_plan_order,
+    invalidate_route_plans, load_vehicle_profiles, get_plan_geometry
+)
+from src.models.planning import RoutePlan, ParadaBaja, SyncMutacion
+from src.utils.compute_pool import ComputeTimeout
+from src.utils.driver_day import frecuente_visits_on
+from src.utils.delta_sync import make_cursor, parse_cursor, CURSOR_OVERLAP, content_revision, sign_bundle, verify_bundle, prune_sync_keys
+from src.utils.positions import positions
+from src.utils.driver_actions import report_stop_payment, add_expense, set_pedido_estado, set_frecuente_estado
+from src.config import settings
+from src.utils.time_utils import get_now_arg, ARG_TZ
 from src.utils.security_extras import log_action
 from fastapi import Request
 
 router = APIRouter(prefix="/chofer", tags=["Chofer"])
+logger = logging.getLogger(__name__)
+
+class ParadaRuta(BaseModel):
+    tipo: str # "P" (individual) | "F" (frecuente) | "B" (vuelta a base para descargar/cargar)
+    id: int
+    llegada: Optional[str] = None # "HH:MM"
+    ventana: Optional[str] = None # "HH:MM-HH:MM"
+    tarde: bool = False
+    minutos_tarde: int = 0
 
 class DriverTodayResponse(BaseModel):
     fecha: str
@@ -25,6 +47,96 @@ class DriverTodayResponse(BaseModel):
     zona_de_hoy: Optional[ZonaRead]
     pedidos: List[PedidoRead]
     frecuentes: List[FrecuenteRead]
+    # Combined stop order with ETAs, from the persisted route plan
+    secuencia: List[ParadaRuta] = []
+    paradas_tarde: List[ParadaRuta] = []
+    cursor: Optional[str] = None # Pass to /chofer/hoy/changes
+
+class ParadaCompacta(BaseModel):
+    # Flat stop for delta sync; None fields are left out of the payload
+    id: int
+    estado: str
+    direccion: str
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    cliente: Optional[str] = None
+    telefono: Optional[str] = None
+    tipo_servicio: Optional[str] = None
+    monto: Optional[float] = None
+    cantidad: Optional[int] = None
+    rango_horario: Optional[str] = None
+    descripcion: Optional[str] = None
+    orden_en_ruta: Optional[int] = None
+
+class ParadaRef(BaseModel):
+    tipo: str # "P" | "F"
+    id: int
+
+class DriverBundle(BaseModel):
+    # Everything the app needs to work the day offline
+    formato: int # Bundle layout version
+    chofer_id: int
+    fecha: str
+    generado_en: datetime
+    revision: str # Content hash, also sent as ETag
+    firma: str # HMAC over chofer_id / fecha / generado_en / revision
+    cursor: str # For /chofer/hoy/changes once back online
+    zona_de_hoy: Optional[str] = None
+    pedidos: List[ParadaCompacta]
+    frecuentes: List[ParadaCompacta]
+    secuencia: List[ParadaRuta]
+
+class BundleRef(BaseModel):
+    fecha: str
+    generado_en: datetime
+    revision: str
+    firma: str
+
+class MutacionSync(BaseModel):
+    clave: str = Field(min_length=1, max_length=64) # Idempotency key generated by the app
+    tipo: Literal["estado_pedido", "estado_frecuente", "reportar_pago", "gasto"]
+    cliente_ts: datetime # When it was done on the device
+    datos: dict
+
+class SyncRequest(BaseModel):
+    bundle: Optional[BundleRef] = None # The bundle the driver was working from
+    mutaciones: List[MutacionSync]
+
+class ResultadoMutacion(BaseModel):
+    clave: str
+    estado: str # "aplicado" | "duplicado" (already applied by an earlier sync) | "rechazado"
+    codigo: int = 200
+    detalle: Optional[str] = None
+
+class SyncResponse(BaseModel):
+    resultados: List[ResultadoMutacion]
+    cursor: str
+    # False when the office changed this driver's stops after the bundle was made: fetch a new one
+    bundle_vigente: Optional[bool] = None
+
+class DriverChangesResponse(BaseModel):
+    cursor: str
+    reset: bool = False # Cursor from another day or unreadable: reload /chofer/hoy
+    pedidos: List[ParadaCompacta] = [] # Added or modified
+    frecuentes: List[ParadaCompacta] = []
+    eliminados: List[ParadaRef] = []
+    secuencia: Optional[List[ParadaRuta]] = None # Only when something changed
+
+class TramoRuta(BaseModel):
+    tipo: str # Stop reached at the end of the leg: "P" | "F" | "B"
+    id: int
+    distancia_m: int
+    duracion_s: int
+    llegada: str # Cumulative ETA "HH:MM"
+
+class RutaGeometria(BaseModel):
+    hash: str # Stop sequence the geometry was built from
+    fuente: str # "osrm" | "estimada" (straight segments when OSRM is unset or unreachable)
+    salida: str
+    polyline: str
+    distancia_km: float
+    duracion_min: float
+    tramos: List[TramoRuta]
 
 @router.get("/choferes", response_model=List[ChoferRead])
 async def list_choferes(
@@ -36,11 +148,7 @@ async def list_choferes(
     result = await db.execute(stmt)
     return result.scalars().all()
 
-@router.get("/hoy", response_model=DriverTodayResponse)
-async def get_driver_today(
-    db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: Annotated[Usuario, Depends(get_current_active_user)]
-):
+async def _current_chofer(db: AsyncSession, current_user: Usuario) -> Chofer:
     if current_user.rol != Rol.CHOFER:
          raise HTTPException(status_code=403, detail="Only drivers access this")
          
@@ -52,113 +160,305 @@ async def get_driver_today(
         if not chofer:
             raise HTTPException(status_code=404, detail="Chofer profile not found")
         current_user.chofer_perfil = chofer
-         
-    today = datetime.now()
-    dia_semana = today.weekday() # 0=Monday
-    
-    # 1. Determine Zone
-    # Check specific rule
-    stmt = select(RutaDia).where(
-        RutaDia.dia_semana == dia_semana, 
-        RutaDia.chofer_id == current_user.chofer_perfil.id,
-        RutaDia.activo == True
-    ).options(selectinload(RutaDia.zona))
-    
-    result = await db.execute(stmt)
-    ruta = result.scalar_one_or_none()
-    
-    # If not, general rule
-    if not ruta:
-        stmt = select(RutaDia).where(
-            RutaDia.dia_semana == dia_semana, 
-            RutaDia.chofer_id == None,
-            RutaDia.activo == True
-        ).options(selectinload(RutaDia.zona))
-        result = await db.execute(stmt)
-        # Take first one?
-        ruta = result.scalars().first()
-        
-    zona_hoy = ruta.zona if ruta else None
-    zona_id_val = zona_hoy.id if zona_hoy else -1
-    
-    print(f"DEBUG HOY: User {current_user.nombre}, Profile ID {current_user.chofer_perfil.id}")
-    
+    if "usuario" in inspect(current_user.chofer_perfil).unloaded:
+        set_committed_value(current_user.chofer_perfil, "usuario", current_user)
+    return current_user.chofer_perfil
+
+def _attach_chofer(items, chofer: Chofer):
+    # Every stop belongs to the same driver: reuse the already loaded Chofer/Usuario
+    # instead of joining them once per row
+    for item in items:
+        set_committed_value(item, "chofer", chofer)
+
+def _pedidos_hoy_filter(today: datetime):
     # Individuales: Asignados, relevant states (including completed for today's view)
+    return and_(
+        or_(
+            cast(PedidoIndividual.fecha_hora_ejecucion, Date) == today.date(),
+            PedidoIndividual.fecha_hora_ejecucion == None,
+            and_(
+                cast(PedidoIndividual.fecha_hora_ejecucion, Date) < today.date(),
+                PedidoIndividual.estado.not_in([EstadoPedido.COMPLETADA, EstadoPedido.FINALIZADO])
+            )
+        ),
+        PedidoIndividual.estado.in_([
+            EstadoPedido.CREADA, 
+            EstadoPedido.ASIGNADA, 
+            EstadoPedido.EN_CAMINO, 
+            EstadoPedido.COMPLETADA,
+            EstadoPedido.FINALIZADO
+        ])
+    )
+
+def _frecuentes_hoy_filter(today: datetime):
+    # Activo, assigned, with a visit today in the calendar (not cancelled)
+    return and_(
+        ServicioFrecuente.estado.in_([EstadoFrecuente.ACTIVO, EstadoFrecuente.COMPLETADA, EstadoFrecuente.EN_CAMINO]),
+        frecuente_visits_on(today.date())
+    )
+
+async def _load_day_stops(db: AsyncSession, chofer: Chofer, today: datetime):
+    """(pedidos, frecuentes) shown to the driver today, including completed ones. One statement each."""
+    chofer_id = chofer.id
     stmt_ped = select(PedidoIndividual)\
-        .where(
-            PedidoIndividual.chofer_id == current_user.chofer_perfil.id,
-            or_(
-                cast(PedidoIndividual.fecha_hora_ejecucion, Date) == today.date(),
-                PedidoIndividual.fecha_hora_ejecucion == None,
-                and_(
-                    cast(PedidoIndividual.fecha_hora_ejecucion, Date) < today.date(),
-                    PedidoIndividual.estado.not_in([EstadoPedido.COMPLETADA, EstadoPedido.FINALIZADO])
-                )
-            ),
-            PedidoIndividual.estado.in_([
-                EstadoPedido.CREADA, 
-                EstadoPedido.ASIGNADA, 
-                EstadoPedido.EN_CAMINO, 
-                EstadoPedido.COMPLETADA,
-                EstadoPedido.FINALIZADO
-            ])
-        )\
+        .where(PedidoIndividual.chofer_id == chofer_id, _pedidos_hoy_filter(today))\
         .options(
-            selectinload(PedidoIndividual.cliente), 
-            selectinload(PedidoIndividual.zona), 
-            selectinload(PedidoIndividual.chofer).selectinload(Chofer.usuario),
-            selectinload(PedidoIndividual.pagos)
-        )
+            joinedload(PedidoIndividual.cliente), 
+            joinedload(PedidoIndividual.zona), 
+            joinedload(PedidoIndividual.pagos)
+        )\
+        .order_by(PedidoIndividual.id)
         
-    pedidos = (await db.execute(stmt_ped)).scalars().all()
-    print(f"DEBUG HOY: Found {len(pedidos)} individual pedidos for chofer {current_user.chofer_perfil.id}")
+    pedidos = (await db.execute(stmt_ped)).unique().scalars().all()
+    _attach_chofer(pedidos, chofer)
     
     # 3. Get Frecuentes
-    # Activo, assigned, day matches
     stmt_freq = select(ServicioFrecuente)\
-        .where(
-            ServicioFrecuente.chofer_id == current_user.chofer_perfil.id,
-            ServicioFrecuente.estado.in_([EstadoFrecuente.ACTIVO, EstadoFrecuente.COMPLETADA, EstadoFrecuente.EN_CAMINO])
-        )\
+        .where(ServicioFrecuente.chofer_id == chofer_id, _frecuentes_hoy_filter(today))\
         .options(
-            selectinload(ServicioFrecuente.cliente), 
-            selectinload(ServicioFrecuente.zona), 
-            selectinload(ServicioFrecuente.chofer).selectinload(Chofer.usuario)
-        )
+            joinedload(ServicioFrecuente.cliente), 
+            joinedload(ServicioFrecuente.zona)
+        )\
+        .order_by(ServicioFrecuente.id)
         
-    all_frec = (await db.execute(stmt_freq)).scalars().all()
-    print(f"DEBUG HOY: Found {len(all_frec)} frequent services for chofer {current_user.chofer_perfil.id}")
+    frecuentes_hoy = (await db.execute(stmt_freq)).scalars().all()
+    _attach_chofer(frecuentes_hoy, chofer)
+    logger.debug("Chofer %s today: %d pedidos, %d frecuentes", chofer_id, len(pedidos), len(frecuentes_hoy))
+    return pedidos, frecuentes_hoy
+
+async def _zona_de_hoy(db: AsyncSession, chofer: Chofer, dia_semana: int) -> Optional[Zona]:
+    # The driver's own rule wins over the general one (chofer_id NULL)
+    stmt = select(RutaDia).where(
+        RutaDia.dia_semana == dia_semana, 
+        or_(RutaDia.chofer_id == chofer.id, RutaDia.chofer_id == None),
+        RutaDia.activo == True
+    ).options(joinedload(RutaDia.zona))\
+        .order_by(RutaDia.chofer_id.is_(None), RutaDia.id)\
+        .limit(1)
+    ruta = (await db.execute(stmt)).scalar_one_or_none()
+    return ruta.zona if ruta else None
+
+# (chofer_id, fecha, modo) -> monotonic time after which a plan that timed out in
+# the pool is submitted again; until then polls get the cheap ordering
+_plan_retry_at: Dict[tuple, float] = {}
+
+async def _day_plan(db: AsyncSession, chofer: Chofer, today: datetime, modo: str, pedidos, frecuentes):
+    """Stored plan for today, computing and saving it first if there is none."""
+    # modo=cercania: manual order ('orden_en_ruta') first, then nearest neighbor.
+    # modo=ventanas: one combined tour respecting rango_horario (manual order ignored).
+    # See route_planner.compute_day_sequence.
     
-    # Filter by day overlap in Python
-    # now we use strings "Lunes", etc. but dia_semana is 0-6
-    dias_map = {0: "Lunes", 1: "Martes", 2: "Miércoles", 3: "Jueves", 4: "Viernes", 5: "Sábado", 6: "Domingo"}
-    hoy_str = dias_map.get(dia_semana)
-    frecuentes_hoy = [f for f in all_frec if hoy_str in f.dias_semana]
+    # The plan is computed once and reused until something changes its inputs
+    plan = await get_route_plan(db, chofer.id, today.date(), modo)
+    if plan is None:
+        perfil = None
+        if chofer.perfil_vehiculo_id:
+            perfil = (await load_vehicle_profiles(db, [chofer.id])).get(chofer.id)
+        key = (chofer.id, today.date(), modo)
+        now = time.monotonic()
+        resultado = None
+        if _plan_retry_at.get(key, 0.0) <= now:
+            try:
+                resultado = await compute_day_sequence_pooled(chofer.id, today.date(), pedidos, frecuentes, modo, perfil)
+            except ComputeTimeout as e:
+                logger.warning("Route plan for chofer %s (%s): %s, falling back to cercania", chofer.id, modo, e)
+                for stale in [k for k, at in _plan_retry_at.items() if at <= now]:
+                    del _plan_retry_at[stale]
+                _plan_retry_at[key] = now + settings.ROUTE_PLAN_RETRY_S
+        if resultado is None:
+            # Serve the cheap ordering, unsaved; the pool is tried again after the backoff
+            secuencia_raw, distancia_km, duracion_min = compute_day_sequence(pedidos, frecuentes, "cercania", perfil)
+            return RoutePlan(chofer_id=chofer.id, fecha=today.date(), modo=modo, secuencia=secuencia_raw,
+                             distancia_km=distancia_km, duracion_min=duracion_min)
+        secuencia_raw, distancia_km, duracion_min = resultado
+        _plan_retry_at.pop(key, None)
+        await save_route_plan(db, chofer.id, today.date(), modo, secuencia_raw, distancia_km, duracion_min)
+        plan = await get_route_plan(db, chofer.id, today.date(), modo)
+    return plan
+
+@router.get("/hoy", response_model=DriverTodayResponse)
+async def get_driver_today(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[Usuario, Depends(get_current_active_user)],
+    modo: Literal["cercania", "ventanas"] = "cercania"
+):
+    chofer = await _current_chofer(db, current_user)
+         
+    today = datetime.now()
+    dia_semana = today.weekday() # 0=Monday
+    # Taken before reading so nothing written meanwhile is missed by the next delta
+    cursor = make_cursor(today.date(), get_now_arg())
     
-    # 4. Sort
-    # We prioritize manual order if 'orden_en_ruta' is not None. 
-    # If not set, we use the optimizer.
+    # 1. Determine Zone
+    zona_hoy = await _zona_de_hoy(db, chofer, dia_semana)
     
-    def intelligent_sort(items):
-        manual = [i for i in items if i.orden_en_ruta is not None]
-        automatic = [i for i in items if i.orden_en_ruta is None]
-        manual.sort(key=lambda x: x.orden_en_ruta)
-        # We assume manual route starts at 1. If there's automatic stuff, we append it via nearest neighbor starting from last manual or depot.
-        # For simplicity, just concat manual + optimized automatic.
-        return manual + sort_by_nearest_neighbor(automatic)
-
-    sorted_pedidos = intelligent_sort(list(pedidos))
-    sorted_frecuentes = intelligent_sort(list(frecuentes_hoy))
+    pedidos, frecuentes_hoy = await _load_day_stops(db, chofer, today)
     
-    print(f"DEBUG: Chofer {current_user.nombre} (ID {current_user.chofer_perfil.id}) -> Pedidos: {len(pedidos)}, Frecuentes: {len(frecuentes_hoy)}")
+    # 4. Sort
+    plan = await _day_plan(db, chofer, today, modo, pedidos, frecuentes_hoy)
+    secuencia_raw = plan.secuencia
+
+    sorted_pedidos = apply_plan_order(pedidos, "P", secuencia_raw)
+    sorted_frecuentes = apply_plan_order(frecuentes_hoy, "F", secuencia_raw)
+    secuencia = [ParadaRuta(**p, tarde=p["minutos_tarde"] > 0) for p in secuencia_raw]
+    paradas_tarde = [p for p in secuencia if p.tarde]
     
     return DriverTodayResponse(
         fecha=today.strftime("%Y-%m-%d"),
         dia_semana=dia_semana,
         zona_de_hoy=zona_hoy,
         pedidos=sorted_pedidos,
-        frecuentes=sorted_frecuentes
+        frecuentes=sorted_frecuentes,
+        secuencia=secuencia,
+        paradas_tarde=paradas_tarde,
+        cursor=cursor
+    )
+
+@router.get("/hoy/ruta", response_model=RutaGeometria)
+async def get_driver_today_geometry(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[Usuario, Depends(get_current_active_user)],
+    modo: Literal["cercania", "ventanas"] = "cercania"
+):
+    """
+    Road geometry of today's pending stops in plan order: encoded polyline
+    (precision 5, as OSRM / Google), per-leg distance and duration and cumulative
+    ETAs. Computed once per route plan and served from cache afterwards.
+    """
+    chofer = await _current_chofer(db, current_user)
+    today = datetime.now()
+    pedidos, frecuentes_hoy = await _load_day_stops(db, chofer, today)
+    plan = await _day_plan(db, chofer, today, modo, pedidos, frecuentes_hoy)
+    return await get_plan_geometry(db, plan, list(pedidos) + list(frecuentes_hoy))
+
+def _compact_pedido(p: PedidoIndividual) -> ParadaCompacta:
+    return ParadaCompacta(
+        id=p.id, estado=p.estado.value, direccion=p.direccion, lat=p.lat, lng=p.lng,
+        cliente=p.cliente.nombre, telefono=p.cliente.telefono, tipo_servicio=p.tipo_servicio,
+        monto=p.costo, rango_horario=p.rango_horario, descripcion=p.descripcion, orden_en_ruta=p.orden_en_ruta
+    )
+
+def _compact_frecuente(f: ServicioFrecuente) -> ParadaCompacta:
+    return ParadaCompacta(
+        id=f.id, estado=f.estado.value, direccion=f.direccion, lat=f.lat, lng=f.lng,
+        cliente=f.cliente.nombre, telefono=f.telefono, tipo_servicio=f.tipo_servicio,
+        monto=f.total, cantidad=f.cantidad, rango_horario=f.rango_horario, orden_en_ruta=f.orden_en_ruta
+    )
+
+@router.get("/hoy/changes", response_model=DriverChangesResponse, response_model_exclude_none=True)
+async def get_driver_today_changes(
+    since: str,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[Usuario, Depends(get_current_active_user)],
+    modo: Literal["cercania", "ventanas"] = "cercania"
+):
+    """
+    Delta of /chofer/hoy since `since` (the cursor of a previous /hoy or
+    /hoy/changes response): stops added or modified (by actualizado_en), stops
+    that left the list (tombstones) and, only if anything changed, the new
+    sequence. Nothing changed -> just a new cursor.
+    """
+    chofer = await _current_chofer(db, current_user)
+    today = datetime.now()
+    cursor = make_cursor(today.date(), get_now_arg())
+
+    parsed = parse_cursor(since)
+    if parsed is None or parsed[0] != today.date():
+        return DriverChangesResponse(cursor=cursor, reset=True)
+    desde = parsed[1] - CURSOR_OVERLAP
+
+    # Rows of this driver touched since the cursor, flagged with whether they still belong in today's list
+    stmt_ped = select(PedidoIndividual, _pedidos_hoy_filter(today).label("visible"))\
+        .where(PedidoIndividual.chofer_id == chofer.id, PedidoIndividual.actualizado_en >= desde)\
+        .options(joinedload(PedidoIndividual.cliente))
+    # A visit cancelled / restored today changes the calendar row, not the contract
+    visita_tocada = exists().where(
+        ServicioOcurrencia.frecuente_id == ServicioFrecuente.id,
+        ServicioOcurrencia.fecha == today.date(),
+        ServicioOcurrencia.actualizado_en >= desde
     )
+    stmt_freq = select(ServicioFrecuente, _frecuentes_hoy_filter(today).label("visible"))\
+        .where(ServicioFrecuente.chofer_id == chofer.id,
+               or_(ServicioFrecuente.actualizado_en >= desde, visita_tocada))\
+        .options(joinedload(ServicioFrecuente.cliente))
+    stmt_bajas = select(ParadaBaja.tipo, ParadaBaja.item_id)\
+        .where(ParadaBaja.chofer_id == chofer.id, ParadaBaja.creado_en >= desde)
+
+    respuesta = DriverChangesResponse(cursor=cursor)
+    for p, visible in (await db.execute(stmt_ped)).all():
+        if visible:
+            respuesta.pedidos.append(_compact_pedido(p))
+        else:
+            respuesta.eliminados.append(ParadaRef(tipo="P", id=p.id))
+    for f, visible in (await db.execute(stmt_freq)).all():
+        if visible:
+            respuesta.frecuentes.append(_compact_frecuente(f))
+        else:
+            respuesta.eliminados.append(ParadaRef(tipo="F", id=f.id))
+    vistos = {(r.tipo, r.id) for r in respuesta.eliminados} \
+        | {("P", p.id) for p in respuesta.pedidos} | {("F", f.id) for f in respuesta.frecuentes}
+    for tipo, item_id in (await db.execute(stmt_bajas)).all():
+        if (tipo, item_id) not in vistos:
+            respuesta.eliminados.append(ParadaRef(tipo=tipo, id=item_id))
+            vistos.add((tipo, item_id))
+
+    if respuesta.pedidos or respuesta.frecuentes or respuesta.eliminados:
+        pedidos, frecuentes_hoy = await _load_day_stops(db, chofer, today)
+        plan = await _day_plan(db, chofer, today, modo, pedidos, frecuentes_hoy)
+        respuesta.secuencia = [ParadaRuta(**p, tarde=p["minutos_tarde"] > 0) for p in plan.secuencia]
+    return respuesta
+
+BUNDLE_FORMAT = 1
+
+@router.get("/hoy/bundle", response_model=DriverBundle, response_model_exclude_none=True)
+async def get_driver_bundle(
+    request: Request,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[Usuario, Depends(get_current_active_user)],
+    modo: Literal["cercania", "ventanas"] = "cercania"
+):
+    """
+    Signed snapshot of the driver's day for offline use. Send the ETag back in
+    If-None-Match to get a 304 when nothing changed; changes made offline are
+    replayed later with POST /chofer/sync.
+    """
+    chofer = await _current_chofer(db, current_user)
+    today = datetime.now()
+    generado_en = get_now_arg()
+    cursor = make_cursor(today.date(), generado_en)
+
+    zona_hoy = await _zona_de_hoy(db, chofer, today.weekday())
+    pedidos, frecuentes_hoy = await _load_day_stops(db, chofer, today)
+    plan = await _day_plan(db, chofer, today, modo, pedidos, frecuentes_hoy)
+
+    contenido = {
+        "formato": BUNDLE_FORMAT,
+        "chofer_id": chofer.id,
+        "fecha": today.strftime("%Y-%m-%d"),
+        "zona_de_hoy": zona_hoy.nombre if zona_hoy else None,
+        "pedidos": [_compact_pedido(p).model_dump(exclude_none=True) for p in apply_plan_order(pedidos, "P", plan.secuencia)],
+        "frecuentes": [_compact_frecuente(f).model_dump(exclude_none=True) for f in apply_plan_order(frecuentes_hoy, "F", plan.secuencia)],
+        "secuencia": [ParadaRuta(**p, tarde=p["minutos_tarde"] > 0).model_dump() for p in plan.secuencia],
+    }
+    revision = content_revision(contenido)
+    etag = f'"{revision}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    bundle = DriverBundle(
+        **contenido,
+        generado_en=generado_en,
+        revision=revision,
+        firma=sign_bundle(chofer.id, contenido["fecha"], generado_en, revision),
+        cursor=cursor
+    )
+    return Response(
+        content=bundle.model_dump_json(exclude_none=True),
+        media_type="application/json",
+        headers=headers
+    )
+
 @router.post("/shift/start")
 async def start_shift(
     request: Request,
@@ -250,15 +550,14 @@ async def register_expense(
     db: Annotated[AsyncSession, Depends(get_db)],
     current_user: Annotated[Usuario, Depends(get_current_active_user)]
 ):
-    from src.models.business import Gasto
-    new_gasto = Gasto(
-        monto=expense_in.monto,
-        categoria=expense_in.categoria,
-        descripcion=expense_in.descripcion,
-        chofer_id=current_user.chofer_perfil.id if current_user.rol == Rol.CHOFER else expense_in.chofer_id,
-        registrado_por=current_user.id
+    add_expense(
+        db,
+        current_user.chofer_perfil.id if current_user.rol == Rol.CHOFER else expense_in.chofer_id,
+        current_user.id,
+        expense_in.monto,
+        expense_in.categoria,
+        expense_in.descripcion
     )
-    db.add(new_gasto)
     await db.commit()
     return {"status": "Gasto registrado"}
 
@@ -278,31 +577,171 @@ async def report_payment(
     if current_user.rol != Rol.CHOFER or not current_user.chofer_perfil:
         raise HTTPException(status_code=403, detail="Only drivers can report payments")
     
-    if report.tipo == "Individual":
-        stmt = select(PedidoIndividual).where(PedidoIndividual.id == report.id)
-        res = await db.execute(stmt)
-        item = res.scalar_one_or_none()
-        if not item: raise HTTPException(404, "Pedido not found")
-        if item.chofer_id != current_user.chofer_perfil.id: raise HTTPException(403, "Not your pedido")
-        
-        item.estado = EstadoPedido.PAGO_PENDIENTE
-        item.monto_reportado = report.monto
-        item.metodo_reportado = report.metodo
-        item.observaciones_chofer = report.observaciones
+    await report_stop_payment(db, current_user.chofer_perfil.id, report.id, report.tipo,
+                              report.monto, report.metodo, report.observaciones)
+    await db.commit()
+    return {"status": "Pago reportado correctamente"}
+
+class EstadoPedidoSync(BaseModel):
+    id: int
+    estado: EstadoPedido
+
+class EstadoFrecuenteSync(BaseModel):
+    id: int
+    estado: EstadoFrecuente
+
+class GastoSync(BaseModel):
+    monto: float
+    categoria: str
+    descripcion: Optional[str] = None
+
+# pg_advisory_xact_lock namespace: one sync per driver at a time
+SYNC_LOCK_NAMESPACE = 4201
+
+def _device_time(ts: datetime, now: datetime) -> datetime:
+    # Naive ARG like the rest of the DB; clocks ahead of the server are clamped
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(ARG_TZ).replace(tzinfo=None)
+    return min(ts, now)
+
+async def _apply_mutation(db: AsyncSession, chofer: Chofer, usuario_id: int, mut: MutacionSync, cliente_ts: datetime):
+    if mut.tipo == "estado_pedido":
+        datos = EstadoPedidoSync(**mut.datos)
+        await set_pedido_estado(db, chofer.id, datos.id, datos.estado)
+    elif mut.tipo == "estado_frecuente":
+        datos = EstadoFrecuenteSync(**mut.datos)
+        await set_frecuente_estado(db, chofer.id, datos.id, datos.estado)
+    elif mut.tipo == "reportar_pago":
+        datos = PaymentReport(**mut.datos)
+        await report_stop_payment(db, chofer.id, datos.id, datos.tipo, datos.monto, datos.metodo, datos.observaciones)
     else:
-        stmt = select(ServicioFrecuente).where(ServicioFrecuente.id == report.id)
-        res = await db.execute(stmt)
-        item = res.scalar_one_or_none()
-        if not item: raise HTTPException(404, "Frecuente not found")
-        if item.chofer_id != current_user.chofer_perfil.id: raise HTTPException(403, "Not your service")
-        
-        item.estado = EstadoFrecuente.PAGO_PENDIENTE
-        item.monto_reportado = report.monto
-        item.metodo_reportado = report.metodo
-        item.observaciones_chofer = report.observaciones
+        datos = GastoSync(**mut.datos)
+        add_expense(db, chofer.id, usuario_id, datos.monto, datos.categoria, datos.descripcion, fecha=cliente_ts)
+
+async def _office_changed_since(db: AsyncSession, chofer_id: int, since: datetime) -> bool:
+    stmt = select(
+        exists().where(PedidoIndividual.chofer_id == chofer_id, PedidoIndividual.actualizado_en > since)
+        | exists().where(ServicioFrecuente.chofer_id == chofer_id, ServicioFrecuente.actualizado_en > since)
+        | exists().where(ServicioOcurrencia.chofer_id == chofer_id, ServicioOcurrencia.actualizado_en > since)
+        | exists().where(ParadaBaja.chofer_id == chofer_id, ParadaBaja.creado_en > since)
+    )
+    return (await db.execute(stmt)).scalar()
 
+@router.post("/sync", response_model=SyncResponse, response_model_exclude_none=True)
+async def sync_offline_changes(
+    data: SyncRequest,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[Usuario, Depends(get_current_active_user)]
+):
+    """
+    Replays changes queued while offline, oldest first (by cliente_ts), in one
+    transaction. Each mutation runs in its own savepoint, so a rejected one
+    doesn't undo the rest. Keys already seen return their original result as
+    "duplicado", so the app can resend the whole queue after a failure.
+    Stops closed or paused by the office are rejected with 409.
+    """
+    chofer = await _current_chofer(db, current_user)
+    if len(data.mutaciones) > settings.SYNC_MAX_MUTATIONS:
+        raise HTTPException(status_code=413, detail=f"Máximo {settings.SYNC_MAX_MUTATIONS} cambios por envío")
+    if data.bundle and not verify_bundle(chofer.id, data.bundle.fecha, data.bundle.generado_en,
+                                         data.bundle.revision, data.bundle.firma):
+        raise HTTPException(status_code=400, detail="Bundle con firma inválida")
+
+    now = get_now_arg()
+    cursor = make_cursor(datetime.now().date(), now)
+    # A retry arriving while the first attempt is still running waits here instead of applying twice
+    await db.execute(select(func.pg_advisory_xact_lock(SYNC_LOCK_NAMESPACE, chofer.id)))
+    await prune_sync_keys(db, chofer.id)
+
+    bundle_vigente = None
+    if data.bundle:
+        bundle_vigente = data.bundle.fecha == datetime.now().strftime("%Y-%m-%d") \
+            and not await _office_changed_since(db, chofer.id, data.bundle.generado_en)
+
+    claves = [m.clave for m in data.mutaciones]
+    stmt = select(SyncMutacion).where(SyncMutacion.chofer_id == chofer.id, SyncMutacion.clave.in_(claves))
+    previas = {m.clave: m.resultado for m in (await db.execute(stmt)).scalars().all()}
+
+    resultados = [None] * len(data.mutaciones)
+    aplicadas = {}
+    orden = sorted(range(len(data.mutaciones)), key=lambda i: _device_time(data.mutaciones[i].cliente_ts, now))
+    for i in orden:
+        mut = data.mutaciones[i]
+        previa = previas.get(mut.clave) or aplicadas.get(mut.clave)
+        if previa is not None:
+            resultados[i] = ResultadoMutacion(clave=mut.clave, **{**previa, "estado": "duplicado"})
+            continue
+        cliente_ts = _device_time(mut.cliente_ts, now)
+        try:
+            async with db.begin_nested():
+                await _apply_mutation(db, chofer, current_user.id, mut, cliente_ts)
+            resultado = {"estado": "aplicado", "codigo": 200}
+        except HTTPException as e:
+            resultado = {"estado": "rechazado", "codigo": e.status_code, "detalle": str(e.detail)}
+        except ValidationError as e:
+            resultado = {"estado": "rechazado", "codigo": 422, "detalle": str(e.errors()[0]["msg"])}
+        aplicadas[mut.clave] = resultado
+        resultados[i] = ResultadoMutacion(clave=mut.clave, **resultado)
+        db.add(SyncMutacion(chofer_id=chofer.id, clave=mut.clave, tipo=mut.tipo,
+                            cliente_ts=cliente_ts, resultado=resultado))
     await db.commit()
-    return {"status": "Pago reportado correctamente"}
+
+    return SyncResponse(resultados=resultados, cursor=cursor, bundle_vigente=bundle_vigente)
+
+class FixGPS(BaseModel):
+    lat: float = Field(ge=-90, le=90)
+    lng: float = Field(ge=-180, le=180)
+    registrado_en: datetime # Device time of the fix
+    velocidad_kmh: Optional[float] = Field(default=None, ge=0)
+    rumbo: Optional[float] = None
+    precision_m: Optional[float] = Field(default=None, ge=0)
+
+class LotePosiciones(BaseModel):
+    fixes: List[FixGPS] = Field(max_length=500)
+
+# Fixes older than this (a phone that was off for days) aren't worth storing
+MAX_FIX_AGE = timedelta(hours=24)
+
+@router.post("/posiciones", status_code=202)
+async def ingest_positions(
+    lote: LotePosiciones,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[Usuario, Depends(get_current_active_user)]
+):
+    """
+    Batched GPS fixes from the app. Only buffered here; they're written in bulk
+    a couple of seconds later and pushed to the dispatch map as POSICION events.
+    """
+    chofer = await _current_chofer(db, current_user)
+    now = get_now_arg()
+    fixes = []
+    for fix in lote.fixes:
+        registrado_en = _device_time(fix.registrado_en, now)
+        if now - registrado_en > MAX_FIX_AGE:
+            continue
+        fixes.append({**fix.model_dump(), "registrado_en": registrado_en})
+    positions.add(chofer.id, fixes)
+    return {"aceptadas": len(fixes), "descartadas": len(lote.fixes) - len(fixes)}
+
+@router.patch("/{chofer_id}/vehiculo", response_model=ChoferRead)
+async def set_vehiculo_chofer(
+    chofer_id: int,
+    perfil_id: Optional[int],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    admin=Depends(get_admin_user)
+):
+    from src.models.users import PerfilVehiculo
+    stmt = select(Chofer).where(Chofer.id == chofer_id).options(selectinload(Chofer.usuario))
+    chofer = (await db.execute(stmt)).scalar_one_or_none()
+    if not chofer:
+        raise HTTPException(status_code=404, detail="Chofer no encontrado")
+    if perfil_id is not None and not await db.get(PerfilVehiculo, perfil_id):
+        raise HTTPException(status_code=404, detail="Perfil de vehículo no encontrado")
+
+    chofer.perfil_vehiculo_id = perfil_id
+    await invalidate_route_plans(db, [chofer.id])
+    await db.commit()
+    return chofer
 
 @router.delete("/{chofer_id}")
 async def delete_chofer(
@@ -0,0 +1,67 @@
+import asyncio
+import itertools
+import json
+from typing import Annotated, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from fastapi.security import OAuth2PasswordBearer
+from src.config import settings
+from src.db import AsyncSessionLocal
+from src.deps import get_current_user
+from src.models.enums import Rol
+from src.utils.events import hub
+
+router = APIRouter(prefix="/eventos", tags=["Eventos"])
+
+oauth2_optional = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    bearer: Annotated[Optional[str], Depends(oauth2_optional)],
+    token: Optional[str] = None
+):
+    """
+    Server-sent events: ASIGNACION, ESTADO, PAGO_REPORTADO, PAGO_REGISTRADO,
+    PARADA_EDITADA, RUTA_REORDENADA and RESYNC (refetch everything). Drivers
+    only get events about their own stops.
+    EventSource can't send headers, so the JWT may also come as ?token=.
+    """
+    token = bearer or token
+    if not token:
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
+    # Own short-lived session: the stream stays open for hours
+    async with AsyncSessionLocal() as db:
+        user = await get_current_user(token, db)
+    if not user.activo:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    if user.rol == Rol.CHOFER:
+        if not user.chofer_perfil:
+            raise HTTPException(status_code=404, detail="Driver profile not found")
+        chofer_id = user.chofer_perfil.id
+    else:
+        chofer_id = None
+
+    sub = hub.subscribe(chofer_id)
+
+    async def event_source():
+        ids = itertools.count(1)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), settings.EVENTS_HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                yield f"id: {next(ids)}\nevent: {event['tipo']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,29 +1,39 @@
+from datetime import date
 from typing import Annotated, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from src.utils.security_extras import log_action
+from fastapi.responses import JSONResponse
+from src.utils.security_extras import log_action, log_actions
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 from src.db import get_db
-from src.models.business import ServicioFrecuente, Pago
-from src.models.enums import Rol, EstadoFrecuente
+from src.models.business import ServicioFrecuente, Pago, ServicioOcurrencia
+from src.models.enums import Rol, EstadoFrecuente, EstadoOcurrencia, TipoEvento
 from src.models.users import Usuario, Chofer
 from src.utils.time_utils import get_now_arg
-from src.schemas.all import FrecuenteRead, FrecuenteCreate, PagoCreate, PagoRead
+from src.schemas.all import (
+    FrecuenteRead, FrecuenteCreate, PagoCreate, PagoRead, OcurrenciaRead, EstadoFrecuenteLote, ResultadoLote,
+    FrecuenteFila
+)
 from src.deps import get_current_active_user
 from src.utils.geo import get_lat_lng, find_zone_for_point
+from src.utils.route_planner import invalidate_route_plans, check_vehicle_allows
+from src.utils.driver_day import frecuente_visits_on
+from src.utils.recurrence import sync_occurrences, mark_today, extend_horizon, VISIT_STATE, STOPPED_FRECUENTE
+from src.utils.events import publish, publish_many
+from src.utils.batch_ops import apply_estado_batch, TERMINAL_FRECUENTE
+from src.utils.fieldsets import parse_fieldset, sparse_select, sparse_rows
+from src.utils.delta_sync import record_removed_stops
+from src.utils.related import attach_related
+from src.utils.driver_actions import check_frecuente_unlocked
 
 router = APIRouter(prefix="/frecuentes", tags=["Servicios Frecuentes"])
 
-DAYS_MAP = {
-    0: "Lunes",
-    1: "Martes",
-    2: "Miércoles",
-    3: "Jueves",
-    4: "Viernes",
-    5: "Sábado",
-    6: "Domingo"
-}
+# Row for ?include= without ?fields=: what a list / table needs
+FRECUENTE_FILA_DEFAULT = [
+    "cliente_id", "tipo_servicio", "direccion", "estado", "cantidad", "dias_semana",
+    "chofer_id", "zona_id", "total", "orden_en_ruta", "rango_horario"
+]
 
 @router.get("/agenda/hoy", response_model=List[FrecuenteRead])
 async def get_agenda_hoy(
@@ -31,11 +41,11 @@ async def get_agenda_hoy(
     current_user: Annotated[Usuario, Depends(get_current_active_user)]
 ):
     now = get_now_arg()
-    today_name = DAYS_MAP[now.weekday()]
     
-    # Select all active frequent services
+    # Active frequent services with a visit today in the calendar (not cancelled)
     stmt = select(ServicioFrecuente).where(
-        ServicioFrecuente.estado == EstadoFrecuente.ACTIVO
+        ServicioFrecuente.estado == EstadoFrecuente.ACTIVO,
+        frecuente_visits_on(now.date())
     ).options(
         selectinload(ServicioFrecuente.cliente),
         selectinload(ServicioFrecuente.zona),
@@ -43,19 +53,72 @@ async def get_agenda_hoy(
     )
     
     result = await db.execute(stmt)
-    all_active = result.scalars().all()
-    
-    # Filter by today's day in dias_semana JSON
-    # Since it's a small number of services usually, we can filter in python or use JSON_CONTAINS if specialized
-    today_agenda = [f for f in all_active if today_name in f.dias_semana]
-    
-    return today_agenda
+    return result.scalars().all()
 
 
 def check_staff(user: Usuario):
     if user.rol not in [Rol.ADMIN, Rol.RECEPCIONISTA]:
          raise HTTPException(status_code=403, detail="Not authorized")
 
+@router.get("/ocurrencias", response_model=List[OcurrenciaRead])
+async def list_ocurrencias(
+    desde: date,
+    hasta: date,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[Usuario, Depends(get_current_active_user)],
+    chofer_id: Optional[int] = None,
+    frecuente_id: Optional[int] = None
+):
+    """Scheduled visits of recurring services between two dates (inclusive)."""
+    if hasta < desde:
+        raise HTTPException(status_code=400, detail="'hasta' es anterior a 'desde'")
+    if current_user.rol == Rol.CHOFER:
+        chofer_id = current_user.chofer_perfil.id if current_user.chofer_perfil else -1
+    stmt = select(ServicioOcurrencia).where(
+        ServicioOcurrencia.fecha >= desde,
+        ServicioOcurrencia.fecha <= hasta
+    )
+    if chofer_id is not None:
+        stmt = stmt.where(ServicioOcurrencia.chofer_id == chofer_id)
+    if frecuente_id is not None:
+        stmt = stmt.where(ServicioOcurrencia.frecuente_id == frecuente_id)
+    stmt = stmt.order_by(ServicioOcurrencia.fecha, ServicioOcurrencia.id)
+    return (await db.execute(stmt)).scalars().all()
+
+@router.patch("/ocurrencias/{ocurrencia_id}/estado", response_model=OcurrenciaRead)
+async def update_estado_ocurrencia(
+    ocurrencia_id: int,
+    estado: EstadoOcurrencia,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[Usuario, Depends(get_current_active_user)]
+):
+    """State of a single visit, e.g. cancel next Tuesday without touching the contract."""
+    ocurrencia = await db.get(ServicioOcurrencia, ocurrencia_id)
+    if not ocurrencia:
+        raise HTTPException(status_code=404, detail="Visita no encontrada")
+    if current_user.rol == Rol.CHOFER:
+        if not current_user.chofer_perfil or ocurrencia.chofer_id != current_user.chofer_perfil.id:
+            raise HTTPException(status_code=403, detail="Not authorized")
+    elif current_user.rol not in [Rol.ADMIN, Rol.RECEPCIONISTA]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    ocurrencia.estado = estado
+    await invalidate_route_plans(db, [ocurrencia.chofer_id])
+    await publish(db, TipoEvento.ESTADO, "ocurrencias", ocurrencia.id, [ocurrencia.chofer_id],
+                  estado=estado.value, frecuente_id=ocurrencia.frecuente_id)
+    await db.commit()
+    return ocurrencia
+
+@router.post("/ocurrencias/regenerar")
+async def regenerate_ocurrencias(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[Usuario, Depends(get_current_active_user)]
+):
+    """Fills the calendar up to the horizon now instead of waiting for the background job."""
+    check_staff(current_user)
+    scanned = await extend_horizon(db)
+    return {"ok": True, "contratos": scanned}
+
 @router.post("/", response_model=FrecuenteRead)
 async def create_frecuente(
     frecuente: FrecuenteCreate,
@@ -103,27 +166,36 @@ async def create_frecuente(
     )
     db.add(new_freq)
     try:
+        await db.flush()
+        await sync_occurrences(db, new_freq)
+        await attach_related(db, new_freq)
         await db.commit()
     except Exception as e:
         print(f"!!! DB COMMIT FAILED: {e}")
         # Force re-raise to show in logs
         raise HTTPException(status_code=500, detail=str(e))
-        
-    await db.refresh(new_freq)
-    
-    stmt = select(ServicioFrecuente).where(ServicioFrecuente.id == new_freq.id).options(
-        selectinload(ServicioFrecuente.cliente), 
-        selectinload(ServicioFrecuente.zona), 
-        selectinload(ServicioFrecuente.chofer).selectinload(Chofer.usuario)
-    )
-    result = await db.execute(stmt)
-    return result.scalar_one()
+    return new_freq
 
 @router.get("/", response_model=List[FrecuenteRead])
 async def read_frecuentes(
     db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: Annotated[Usuario, Depends(get_current_active_user)]
+    current_user: Annotated[Usuario, Depends(get_current_active_user)],
+    fields: Optional[str] = None,
+    include: Optional[str] = None
 ):
+    """
+    With `fields` (comma separated FrecuenteFila columns) and/or `include`
+    (cliente, zona, chofer, pagos) rows come as slim FrecuenteFila objects
+    holding only what was asked for; otherwise as full FrecuenteRead.
+    """
+    if fields is not None or include is not None:
+        campos, includes = parse_fieldset(fields, include, FrecuenteFila, FRECUENTE_FILA_DEFAULT)
+        stmt = sparse_select(ServicioFrecuente, campos, includes).order_by(ServicioFrecuente.id)
+        if current_user.rol == Rol.CHOFER:
+            stmt = stmt.where(ServicioFrecuente.chofer_id == current_user.chofer_perfil.id)
+        rows = (await db.execute(stmt)).mappings().all()
+        return JSONResponse(await sparse_rows(db, rows, includes, Pago.frecuente_id, FrecuenteFila))
+
     stmt = select(ServicioFrecuente).options(
         selectinload(ServicioFrecuente.cliente), 
         selectinload(ServicioFrecuente.zona), 
@@ -179,16 +251,12 @@ async def update_frecuente(
     db_freq.rango_horario = frec_upd.rango_horario
     db_freq.rango_precio = frec_upd.rango_precio
     
+    await sync_occurrences(db, db_freq)
+    await invalidate_route_plans(db, [db_freq.chofer_id])
+    await publish(db, TipoEvento.PARADA_EDITADA, "frecuentes", db_freq.id, [db_freq.chofer_id])
+    await attach_related(db, db_freq)
     await db.commit()
-    await db.refresh(db_freq)
-    
-    stmt = select(ServicioFrecuente).where(ServicioFrecuente.id == id).options(
-        selectinload(ServicioFrecuente.cliente), 
-        selectinload(ServicioFrecuente.zona), 
-        selectinload(ServicioFrecuente.chofer).selectinload(Chofer.usuario)
-    )
-    result = await db.execute(stmt)
-    return result.scalar_one()
+    return db_freq
 
 @router.patch("/{id}/estado", response_model=FrecuenteRead)
 async def update_estado_frecuente(
@@ -197,11 +265,7 @@ async def update_estado_frecuente(
     db: Annotated[AsyncSession, Depends(get_db)],
     current_user: Annotated[Usuario, Depends(get_current_active_user)]
 ):
-    stmt = select(ServicioFrecuente).where(ServicioFrecuente.id == id).options(
-        selectinload(ServicioFrecuente.cliente), 
-        selectinload(ServicioFrecuente.zona), 
-        selectinload(ServicioFrecuente.chofer).selectinload(Chofer.usuario)
-    )
+    stmt = select(ServicioFrecuente).where(ServicioFrecuente.id == id)
     result = await db.execute(stmt)
     freq = result.scalar_one_or_none()
     if not freq:
@@ -211,12 +275,52 @@ async def update_estado_frecuente(
          # Chofer can change state? Seems implied ("cambio de estado").
          if freq.chofer_id != current_user.chofer_perfil.id:
               raise HTTPException(status_code=403, detail="Not authorized")
+         check_frecuente_unlocked(freq, estado) # Same rule as /chofer/sync
     
     freq.estado = estado
+    if estado in VISIT_STATE:
+        await mark_today(db, [freq.id], VISIT_STATE[estado])
+    await sync_occurrences(db, freq)
+    await invalidate_route_plans(db, [freq.chofer_id])
+    await publish(db, TipoEvento.ESTADO, "frecuentes", freq.id, [freq.chofer_id], estado=estado.value)
+    await attach_related(db, freq)
     await db.commit()
-    await db.refresh(freq)
     return freq
 
+@router.post("/estado:batch", response_model=List[ResultadoLote])
+async def update_estado_frecuentes_batch(
+    request: Request,
+    data: EstadoFrecuenteLote,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[Usuario, Depends(get_current_active_user)]
+):
+    """
+    Moves several recurring services to one state. Finished contracts are left
+    alone and reported as "rechazado". One result per id, in the order given.
+    """
+    check_staff(current_user)
+    resultados, aplicados = await apply_estado_batch(db, ServicioFrecuente, data.ids, data.estado, TERMINAL_FRECUENTE)
+    if aplicados:
+        ids = [freq_id for freq_id, _, _ in aplicados]
+        if data.estado in VISIT_STATE:
+            await mark_today(db, ids, VISIT_STATE[data.estado])
+        # Only pausing / resuming changes the upcoming visits
+        stopped = data.estado in STOPPED_FRECUENTE
+        resync = [freq_id for freq_id, _, anterior in aplicados
+                  if (EstadoFrecuente(anterior) in STOPPED_FRECUENTE) != stopped]
+        if resync:
+            for freq in (await db.execute(select(ServicioFrecuente).where(ServicioFrecuente.id.in_(resync)))).scalars():
+                await sync_occurrences(db, freq)
+        await invalidate_route_plans(db, [chofer_id for _, chofer_id, _ in aplicados])
+        await publish_many(db, TipoEvento.ESTADO, "frecuentes", [
+            (freq_id, [chofer_id], {"estado": data.estado.value}) for freq_id, chofer_id, _ in aplicados
+        ])
+        await log_actions(db, current_user.id, f"UPDATE_STATUS_{data.estado.value}", "frecuentes", [
+            (freq_id, {"anterior": anterior, "lote": True}) for freq_id, _, anterior in aplicados
+        ], request=request)
+    await db.commit()
+    return resultados
+
 @router.patch("/{id}/toggle", response_model=FrecuenteRead)
 async def toggle_frecuente(
     id: int,
@@ -224,19 +328,18 @@ async def toggle_frecuente(
     current_user: Annotated[Usuario, Depends(get_current_active_user)]
 ):
     check_staff(current_user)
-    stmt = select(ServicioFrecuente).where(ServicioFrecuente.id == id).options(
-        selectinload(ServicioFrecuente.cliente), 
-        selectinload(ServicioFrecuente.zona), 
-        selectinload(ServicioFrecuente.chofer).selectinload(Chofer.usuario)
-    )
+    stmt = select(ServicioFrecuente).where(ServicioFrecuente.id == id)
     result = await db.execute(stmt)
     freq = result.scalar_one_or_none()
     if not freq:
         raise HTTPException(status_code=404, detail="Service not found")
         
     freq.estado = EstadoFrecuente.PAUSADO if freq.estado == EstadoFrecuente.ACTIVO else EstadoFrecuente.ACTIVO
+    await sync_occurrences(db, freq)
+    await invalidate_route_plans(db, [freq.chofer_id])
+    await publish(db, TipoEvento.ESTADO, "frecuentes", freq.id, [freq.chofer_id], estado=freq.estado.value)
+    await attach_related(db, freq)
     await db.commit()
-    await db.refresh(freq)
     return freq
 
 @router.post("/{id}/pagos", response_model=PagoRead)
@@ -265,6 +368,11 @@ async def create_pago_frecuente(
         registrado_por=current_user.id
     )
     db.add(new_pago)
+    await db.flush()
+    await mark_today(db, [id], EstadoOcurrencia.COMPLETADA, pago_id=new_pago.id)
+    await invalidate_route_plans(db, [db_item.chofer_id])
+    await publish(db, TipoEvento.PAGO_REGISTRADO, "frecuentes", id, [db_item.chofer_id],
+                  estado=db_item.estado.value, monto=pago.monto, metodo=pago.metodo_pago.value)
     await db.commit()
     await db.refresh(new_pago)
     
@@ -286,6 +394,8 @@ async def delete_frecuente(
     if not freq:
         raise HTTPException(status_code=404, detail="Service not found")
     
+    await invalidate_route_plans(db, [freq.chofer_id])
+    await record_removed_stops(db, freq.chofer_id, "F", [freq.id])
     await db.delete(freq)
     await db.commit()
     return {"ok": True}
@@ -299,17 +409,19 @@ async def assign_driver_frecuente(
 ):
     check_staff(current_user)
     
-    stmt = select(ServicioFrecuente).where(ServicioFrecuente.id == id).options(
-        selectinload(ServicioFrecuente.cliente), 
-        selectinload(ServicioFrecuente.zona), 
-        selectinload(ServicioFrecuente.chofer).selectinload(Chofer.usuario)
-    )
+    stmt = select(ServicioFrecuente).where(ServicioFrecuente.id == id)
     result = await db.execute(stmt)
     freq = result.scalar_one_or_none()
     if not freq:
         raise HTTPException(status_code=404, detail="Service not found")
         
+    await check_vehicle_allows(db, chofer_id, freq.tipo_servicio)
+    await invalidate_route_plans(db, [freq.chofer_id, chofer_id])
+    await publish(db, TipoEvento.ASIGNACION, "frecuentes", freq.id, [freq.chofer_id, chofer_id], chofer_id=chofer_id)
+    if freq.chofer_id != chofer_id:
+        await record_removed_stops(db, freq.chofer_id, "F", [freq.id])
     freq.chofer_id = chofer_id
+    await sync_occurrences(db, freq)
+    await attach_related(db, freq)
     await db.commit()
-    await db.refresh(freq)
     return freq
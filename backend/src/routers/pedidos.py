@@ -1,20 +1,38 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Annotated, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from src.utils.security_extras import log_action
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse
+from src.utils.security_extras import log_action, log_actions
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.orm import selectinload
 from src.db import get_db
 from src.models.business import PedidoIndividual, Pago
-from src.models.enums import Rol, EstadoPedido, MetodoPago
+from src.models.enums import Rol, EstadoPedido, MetodoPago, TipoEvento
 from src.models.users import Usuario, Chofer
-from src.schemas.all import PedidoRead, PedidoCreate, PagoCreate, PagoRead
+from src.schemas.all import (
+    PedidoRead, PedidoCreate, PagoCreate, PagoRead, EstadoPedidoLote, ResultadoLote, PedidoFila
+)
 from src.deps import get_current_active_user
 from src.utils.geo import get_lat_lng, find_zone_for_point
+from src.utils.route_planner import insert_into_tour, invalidate_route_plans, check_vehicle_allows
+from src.utils.events import publish, publish_many
+from src.utils.batch_ops import apply_estado_batch, TERMINAL_PEDIDO
+from src.utils.delta_sync import record_removed_stops
+from src.utils.pagination import after_keyset, keyset_order, make_keyset
+from src.utils.fieldsets import parse_fieldset, sparse_select, sparse_rows
+from src.utils.time_utils import day_bounds
+from src.utils.related import attach_related
+from src.utils.driver_actions import check_pedido_unlocked, LOCKED_PEDIDO
 
 router = APIRouter(prefix="/pedidos", tags=["Pedidos"])
 
+# Row for ?include= without ?fields=: what a list / table needs
+PEDIDO_FILA_DEFAULT = [
+    "cliente_id", "tipo_servicio", "direccion", "estado", "fecha_hora_ejecucion",
+    "chofer_id", "zona_id", "costo", "orden_en_ruta", "rango_horario"
+]
+
 def check_staff_or_admin(user: Usuario):
     if user.rol not in [Rol.ADMIN, Rol.RECEPCIONISTA]:
          raise HTTPException(status_code=403, detail="Not authorized")
@@ -66,66 +84,115 @@ async def create_pedido(
         rango_horario=pedido.rango_horario,
         rango_precio=pedido.rango_precio
     )
-    
-    db.add(new_pedido)
-    await db.commit()
-    await db.refresh(new_pedido)
-
-    # Audit
-    await log_action(current_user.id, "CREATE_PEDIDO", "pedidos", new_pedido.id, request=request)
-    
-    # Auto-charge for Late Entry
+    # Auto-charge for Late Entry, inserted in the same commit as the order
+    new_pedido.pagos = []
     if create_payment:
         # Use provided method or default to EFECTIVO
-        method = pedido.metodo_pago or MetodoPago.EFECTIVO
-        new_pago = Pago(
-            pedido_id=new_pedido.id,
+        new_pedido.pagos.append(Pago(
             monto=new_pedido.costo,
-            metodo_pago=method,
+            metodo_pago=pedido.metodo_pago or MetodoPago.EFECTIVO,
             registrado_por=current_user.id,
             fecha=datetime.now()
-        )
-        db.add(new_pago)
-        await db.commit()
+        ))
 
-    # Reload for response
-    stmt = select(PedidoIndividual)\
-        .where(PedidoIndividual.id == new_pedido.id)\
-        .options(
-            selectinload(PedidoIndividual.cliente), 
-            selectinload(PedidoIndividual.zona), 
-            selectinload(PedidoIndividual.chofer).selectinload(Chofer.usuario),
-            selectinload(PedidoIndividual.pagos)
-        )
-    result = await db.execute(stmt)
-    return result.scalar_one()
+    db.add(new_pedido)
+    await attach_related(db, new_pedido)
+    await db.commit() # INSERT ... RETURNING fills id and defaults, no refresh needed
+
+    # Audit
+    await log_action(current_user.id, "CREATE_PEDIDO", "pedidos", new_pedido.id, request=request)
+    return new_pedido
 
 @router.get("/", response_model=List[PedidoRead])
 async def read_pedidos(
+    response: Response,
     db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: Annotated[Usuario, Depends(get_current_active_user)]
+    current_user: Annotated[Usuario, Depends(get_current_active_user)],
+    estado: Annotated[Optional[List[EstadoPedido]], Query()] = None,
+    chofer_id: Optional[int] = None,
+    zona_id: Optional[int] = None,
+    cliente_id: Optional[int] = None,
+    tipo_servicio: Optional[str] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: Annotated[Optional[int], Query(ge=1, le=500)] = None,
+    fields: Optional[str] = None,
+    include: Optional[str] = None
 ):
+    """
+    Orders newest first by fecha_hora_ejecucion (unscheduled ones first), then id.
+    Filters are combined with AND; `desde` / `hasta` (inclusive) apply to the
+    execution date. Pages of `limit` rows (100 if only `cursor` is given); when
+    there are more rows the X-Next-Cursor header carries the `cursor` for the
+    next page. Without `cursor` nor `limit` every matching order is returned,
+    as older clients expect. Drivers only see their own orders.
+
+    With `fields` (comma separated PedidoFila columns) and/or `include`
+    (cliente, zona, chofer, pagos) rows come as slim PedidoFila objects holding
+    only what was asked for; otherwise as full PedidoRead.
+    """
     # Staff sees all, Driver sees assigned
-    stmt = select(PedidoIndividual).options(
-        selectinload(PedidoIndividual.cliente), 
-        selectinload(PedidoIndividual.zona), 
-        selectinload(PedidoIndividual.chofer).selectinload(Chofer.usuario),
-        selectinload(PedidoIndividual.pagos)
-    )
-    
     if current_user.rol == Rol.CHOFER:
         # Get chofer profile
-        chofer_stmt = select(Chofer).where(Chofer.usuario_id == current_user.id)
-        chofer_result = await db.execute(chofer_stmt)
-        chofer = chofer_result.scalar_one_or_none()
-        if chofer:
-            stmt = stmt.where(PedidoIndividual.chofer_id == chofer.id)
-        else:
+        chofer_stmt = select(Chofer.id).where(Chofer.usuario_id == current_user.id)
+        chofer_id = (await db.execute(chofer_stmt)).scalar_one_or_none()
+        if chofer_id is None:
             # If no chofer profile, return empty list
             return []
+    elif current_user.rol not in [Rol.ADMIN, Rol.RECEPCIONISTA]:
+        raise HTTPException(status_code=403, detail="Not authorized")
 
-    result = await db.execute(stmt)
-    return result.scalars().all()
+    sparse = fields is not None or include is not None
+    if sparse:
+        campos, includes = parse_fieldset(fields, include, PedidoFila, PEDIDO_FILA_DEFAULT)
+        # The cursor needs the execution date even when it isn't requested
+        stmt = sparse_select(PedidoIndividual, campos, includes,
+                             extra=[PedidoIndividual.fecha_hora_ejecucion.label("_fecha")])
+    else:
+        stmt = select(PedidoIndividual).options(
+            selectinload(PedidoIndividual.cliente), 
+            selectinload(PedidoIndividual.zona), 
+            selectinload(PedidoIndividual.chofer).selectinload(Chofer.usuario),
+            selectinload(PedidoIndividual.pagos)
+        )
+    if estado:
+        stmt = stmt.where(PedidoIndividual.estado.in_(estado))
+    if chofer_id is not None:
+        stmt = stmt.where(PedidoIndividual.chofer_id == chofer_id)
+    if zona_id is not None:
+        stmt = stmt.where(PedidoIndividual.zona_id == zona_id)
+    if cliente_id is not None:
+        stmt = stmt.where(PedidoIndividual.cliente_id == cliente_id)
+    if tipo_servicio:
+        stmt = stmt.where(PedidoIndividual.tipo_servicio == tipo_servicio)
+    if desde is not None:
+        stmt = stmt.where(PedidoIndividual.fecha_hora_ejecucion >= day_bounds(desde)[0])
+    if hasta is not None:
+        stmt = stmt.where(PedidoIndividual.fecha_hora_ejecucion < day_bounds(hasta)[1])
+    if cursor:
+        stmt = stmt.where(after_keyset(PedidoIndividual.fecha_hora_ejecucion, PedidoIndividual.id, cursor))
+
+    stmt = stmt.order_by(*keyset_order(PedidoIndividual.fecha_hora_ejecucion, PedidoIndividual.id))
+    paged = cursor is not None or limit is not None
+    if paged:
+        limit = limit or 100
+        # One extra row tells whether there is a next page
+        stmt = stmt.limit(limit + 1)
+    if sparse:
+        rows = (await db.execute(stmt)).mappings().all()
+        headers = {}
+        if paged and len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = make_keyset(rows[-1]["_fecha"], rows[-1]["id"])
+        filas = await sparse_rows(db, rows, includes, Pago.pedido_id, PedidoFila)
+        return JSONResponse(filas, headers=headers)
+
+    pedidos = (await db.execute(stmt)).scalars().all()
+    if paged and len(pedidos) > limit:
+        pedidos = pedidos[:limit]
+        response.headers["X-Next-Cursor"] = make_keyset(pedidos[-1].fecha_hora_ejecucion, pedidos[-1].id)
+    return pedidos
 
 @router.get("/{pedido_id}", response_model=PedidoRead)
 async def read_pedido(
@@ -194,21 +261,14 @@ async def update_pedido(
     db_pedido.rango_horario = pedido_upd.rango_horario
     db_pedido.rango_precio = pedido_upd.rango_precio
     
+    await invalidate_route_plans(db, [db_pedido.chofer_id])
+    await publish(db, TipoEvento.PARADA_EDITADA, "pedidos", db_pedido.id, [db_pedido.chofer_id])
+    await attach_related(db, db_pedido)
     await db.commit()
-    await db.refresh(db_pedido)
     
     # Audit
     await log_action(current_user.id, "UPDATE_PEDIDO", "pedidos", db_pedido.id, request=request)
-    
-    # Reload relationships for PedidoRead
-    stmt = select(PedidoIndividual).where(PedidoIndividual.id == pedido_id).options(
-        selectinload(PedidoIndividual.cliente), 
-        selectinload(PedidoIndividual.zona), 
-        selectinload(PedidoIndividual.chofer).selectinload(Chofer.usuario),
-        selectinload(PedidoIndividual.pagos)
-    )
-    result = await db.execute(stmt)
-    return result.scalar_one()
+    return db_pedido
 
 @router.patch("/{pedido_id}/estado", response_model=PedidoRead)
 async def update_estado_pedido(
@@ -218,39 +278,65 @@ async def update_estado_pedido(
     db: Annotated[AsyncSession, Depends(get_db)],
     current_user: Annotated[Usuario, Depends(get_current_active_user)]
 ):
-    stmt = select(PedidoIndividual).where(PedidoIndividual.id == pedido_id).options(
-        selectinload(PedidoIndividual.cliente), 
-        selectinload(PedidoIndividual.zona), 
-        selectinload(PedidoIndividual.chofer).selectinload(Chofer.usuario),
-        selectinload(PedidoIndividual.pagos)
-    )
-    result = await db.execute(stmt)
-    pedido = result.scalar_one_or_none()
+    es_chofer = current_user.rol == Rol.CHOFER
+    stmt = update(PedidoIndividual).where(PedidoIndividual.id == pedido_id)
+    if es_chofer:
+        # Ownership and the closed-order lock (same rule as /chofer/sync) are checked by the UPDATE itself
+        stmt = stmt.where(
+            PedidoIndividual.chofer_id == current_user.chofer_perfil.id,
+            PedidoIndividual.estado.not_in(LOCKED_PEDIDO) | (PedidoIndividual.estado == estado)
+        )
+    stmt = stmt.values(estado=estado).returning(PedidoIndividual)\
+        .execution_options(populate_existing=True)
+    pedido = (await db.execute(stmt)).scalar_one_or_none()
     if not pedido:
-        raise HTTPException(status_code=404, detail="Pedido not found")
-        
-    if current_user.rol == Rol.CHOFER:
-        # Check ownership
-        if pedido.chofer_id != current_user.chofer_perfil.id:
-            raise HTTPException(status_code=403, detail="Not authorized")
-            
-    pedido.estado = estado
+        # Nothing was written; only now find out why
+        actual = (await db.execute(
+            select(PedidoIndividual).where(PedidoIndividual.id == pedido_id)
+        )).scalar_one_or_none()
+        if not actual:
+            raise HTTPException(status_code=404, detail="Pedido not found")
+        if es_chofer:
+            if actual.chofer_id != current_user.chofer_perfil.id:
+                raise HTTPException(status_code=403, detail="Not authorized")
+            check_pedido_unlocked(actual, estado)
+        # Changed between the UPDATE and this read (e.g. reassigned back, or reopened)
+        raise HTTPException(status_code=409, detail="El pedido cambió mientras se actualizaba, reintentá")
+
+    await attach_related(db, pedido)
+    await invalidate_route_plans(db, [pedido.chofer_id])
+    await publish(db, TipoEvento.ESTADO, "pedidos", pedido.id, [pedido.chofer_id], estado=estado.value)
     await db.commit()
     
     # Audit
     await log_action(current_user.id, f"UPDATE_STATUS_{estado.value}", "pedidos", pedido.id, request=request)
-    
-    # Re-load with relationships because refresh() expires them
-    stmt = select(PedidoIndividual).where(PedidoIndividual.id == pedido_id).options(
-        selectinload(PedidoIndividual.cliente), 
-        selectinload(PedidoIndividual.zona), 
-        selectinload(PedidoIndividual.chofer).selectinload(Chofer.usuario),
-        selectinload(PedidoIndividual.pagos)
-    )
-    result = await db.execute(stmt)
-    pedido = result.scalar_one()
     return pedido
 
+@router.post("/estado:batch", response_model=List[ResultadoLote])
+async def update_estado_pedidos_batch(
+    request: Request,
+    data: EstadoPedidoLote,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[Usuario, Depends(get_current_active_user)]
+):
+    """
+    Moves several orders to one state (e.g. FINALIZADO at the end of the day).
+    Finalized / cancelled orders are left alone and reported as "rechazado".
+    One result per id, in the order given.
+    """
+    check_staff_or_admin(current_user)
+    resultados, aplicados = await apply_estado_batch(db, PedidoIndividual, data.ids, data.estado, TERMINAL_PEDIDO)
+    if aplicados:
+        await invalidate_route_plans(db, [chofer_id for _, chofer_id, _ in aplicados])
+        await publish_many(db, TipoEvento.ESTADO, "pedidos", [
+            (pedido_id, [chofer_id], {"estado": data.estado.value}) for pedido_id, chofer_id, _ in aplicados
+        ])
+        await log_actions(db, current_user.id, f"UPDATE_STATUS_{data.estado.value}", "pedidos", [
+            (pedido_id, {"anterior": anterior, "lote": True}) for pedido_id, _, anterior in aplicados
+        ], request=request)
+    await db.commit()
+    return resultados
+
 @router.patch("/{pedido_id}/chofer", response_model=PedidoRead)
 async def assign_driver_pedido(
     pedido_id: int,
@@ -260,32 +346,29 @@ async def assign_driver_pedido(
 ):
     check_staff_or_admin(current_user)
     
-    stmt = select(PedidoIndividual).where(PedidoIndividual.id == pedido_id).options(
-        selectinload(PedidoIndividual.cliente), 
-        selectinload(PedidoIndividual.zona), 
-        selectinload(PedidoIndividual.chofer).selectinload(Chofer.usuario),
-        selectinload(PedidoIndividual.pagos)
-    )
+    stmt = select(PedidoIndividual).where(PedidoIndividual.id == pedido_id)
     result = await db.execute(stmt)
     pedido = result.scalar_one_or_none()
     if not pedido:
         raise HTTPException(status_code=404, detail="Pedido not found")
         
+    await check_vehicle_allows(db, chofer_id, pedido.tipo_servicio)
+
+    previous_chofer_id = pedido.chofer_id
     pedido.chofer_id = chofer_id
     if chofer_id and pedido.estado == EstadoPedido.CREADA:
         pedido.estado = EstadoPedido.ASIGNADA
-        
+
+    await invalidate_route_plans(db, [previous_chofer_id, chofer_id])
+    # Slot it into the driver's current tour for that day (cheapest insertion)
+    if chofer_id and pedido.fecha_hora_ejecucion:
+        await insert_into_tour(db, pedido, chofer_id, pedido.fecha_hora_ejecucion.date())
+
+    if previous_chofer_id != chofer_id:
+        await record_removed_stops(db, previous_chofer_id, "P", [pedido.id])
+    await publish(db, TipoEvento.ASIGNACION, "pedidos", pedido.id, [previous_chofer_id, chofer_id], chofer_id=chofer_id)
+    await attach_related(db, pedido)
     await db.commit()
-    
-    # Re-load with relationships
-    stmt = select(PedidoIndividual).where(PedidoIndividual.id == pedido_id).options(
-        selectinload(PedidoIndividual.cliente), 
-        selectinload(PedidoIndividual.zona), 
-        selectinload(PedidoIndividual.chofer).selectinload(Chofer.usuario),
-        selectinload(PedidoIndividual.pagos)
-    )
-    result = await db.execute(stmt)
-    pedido = result.scalar_one()
     return pedido
 
 @router.post("/{pedido_id}/pagos", response_model=PagoRead)
@@ -316,6 +399,9 @@ async def create_pago(
     db_pedido.observaciones_chofer = None
     
     db.add(new_pago)
+    await invalidate_route_plans(db, [db_pedido.chofer_id])
+    await publish(db, TipoEvento.PAGO_REGISTRADO, "pedidos", db_pedido.id, [db_pedido.chofer_id],
+                  estado=db_pedido.estado.value, monto=pago.monto, metodo=pago.metodo_pago.value)
     await db.commit()
     await db.refresh(new_pago)
 
@@ -338,6 +424,8 @@ async def delete_pedido(
     if not pedido:
         raise HTTPException(status_code=404, detail="Pedido not found")
     
+    await invalidate_route_plans(db, [pedido.chofer_id])
+    await record_removed_stops(db, pedido.chofer_id, "P", [pedido.id])
     await db.delete(pedido)
     await db.commit()
 
@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from src.db import get_db
+from src.config import settings
+from src.utils.security_extras import limiter
 from src.models.presupuestos import Presupuesto
 from src.models.business import PedidoIndividual
+from src.models.enums import EstadoPedido
+from src.utils.eta import eta_engine, customer_window
 from pydantic import BaseModel
 from typing import List
 from datetime import datetime
@@ -25,19 +29,32 @@ async def create_quote(item: QuoteCreate, db: AsyncSession = Depends(get_db)):
     return {"ok": True, "msg": "Presupuesto enviado correctamente"}
 
 @router.get("/track/{telefono}")
-async def track_orders(telefono: str, db: AsyncSession = Depends(get_db)):
+@limiter.limit("10/minute")
+async def track_orders(request: Request, telefono: str, db: AsyncSession = Depends(get_db)):
     # Search for active/recent orders by phone
     # We join with clientes to find by phone
     from src.models.business import Cliente
     # Strip non-numeric characters for comparison
     clean_phone = "".join(filter(str.isdigit, telefono))
+    # Anything shorter would match other customers' numbers (and "x" used to match all of them)
+    if len(clean_phone) < settings.PUBLIC_TRACK_MIN_DIGITS:
+        raise HTTPException(status_code=400, detail="Número de teléfono incompleto")
     
     from sqlalchemy import func
-    # Note: This assumes stored phone numbers are also numeric-only or we use a more complex fuzzy match
-    # For now, let's keep it simple but handle the input sanitization
-    stmt = select(PedidoIndividual).join(Cliente).where(func.replace(func.replace(func.replace(Cliente.telefono, ' ', ''), '-', ''), '(', '').like(f"%{clean_phone}%")).order_by(PedidoIndividual.creado_en.desc()).limit(5)
+    # Digits-only, matching the end of the stored number: prefixes like +54 9 / 0
+    # differ between how customers type it and how it was loaded (10 = area code + number)
+    stored_digits = func.regexp_replace(Cliente.telefono, '[^0-9]', '', 'g')
+    stmt = select(PedidoIndividual).join(Cliente).where(stored_digits.like(f"%{clean_phone[-10:]}")).order_by(PedidoIndividual.creado_en.desc()).limit(5)
     result = await db.execute(stmt)
     pedidos = result.scalars().all()
+
+    # Live arrival range for orders on today's route (None otherwise)
+    llegadas = {}
+    for p in pedidos:
+        if p.chofer_id is not None and p.estado in (EstadoPedido.ASIGNADA, EstadoPedido.EN_CAMINO):
+            parada = await eta_engine.for_stop(db, p.chofer_id, "P", p.id)
+            if parada is not None:
+                llegadas[p.id] = customer_window(parada["llegada"])
     
     return [
         {
@@ -45,6 +62,7 @@ async def track_orders(telefono: str, db: AsyncSession = Depends(get_db)):
             "estado": p.estado,
             "servicio": p.tipo_servicio,
             "fecha": p.creado_en,
-            "direccion": (p.direccion[:15] + "...") if p.direccion else "N/A"
+            "direccion": (p.direccion[:15] + "...") if p.direccion else "N/A",
+            "llegada_estimada": llegadas.get(p.id)
         } for p in pedidos
     ]
@@ -1,13 +1,19 @@
-from typing import Annotated, List
+from typing import Annotated, List, Literal, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, values, column, Integer
 from sqlalchemy.orm import selectinload
 from src.db import get_db
 from src.models.geo import RutaDia
 from src.schemas.all import RutaDiaRead, RutaDiaCreate
 from src.deps import get_admin_user, get_current_active_user
-from src.models.users import Chofer
+from src.models.business import PedidoIndividual, ServicioFrecuente
+from src.models.enums import Rol, TipoEvento
+from src.models.users import Chofer, Usuario
+from src.utils.events import publish
+from src.utils.route_planner import invalidate_route_plans
+from src.utils.time_utils import get_now_arg
 
 router = APIRouter(prefix="/rutas", tags=["Rutas"])
 
@@ -94,27 +100,70 @@ async def delete_ruta(
     await db.delete(db_ruta)
     await db.commit()
     return {"ok": True}
+
+
+class ParadaOrden(BaseModel):
+    tipo: Literal["P", "F"]
+    id: int
+    orden: int
+
+
+async def _reorder_table(db: AsyncSession, model, items: List[ParadaOrden], chofer_id: Optional[int]):
+    """
+    One UPDATE ... FROM (VALUES ...) for all the stops of a table. With `chofer_id`
+    only that driver's stops match. Returns {id: chofer_id} of the rows updated.
+    """
+    if not items:
+        return {}
+    nuevos = values(column("id", Integer), column("orden", Integer), name="nuevo_orden")\
+        .data([(item.id, item.orden) for item in items])
+    stmt = update(model).where(model.id == nuevos.c.id)
+    if chofer_id is not None:
+        stmt = stmt.where(model.chofer_id == chofer_id)
+    stmt = stmt.values(orden_en_ruta=nuevos.c.orden, actualizado_en=get_now_arg())\
+        .returning(model.id, model.chofer_id)\
+        .execution_options(synchronize_session=False)
+    return {row.id: row.chofer_id for row in await db.execute(stmt)}
+
+
 @router.post("/reordenar")
 async def reorder_route(
-    data: List[dict], # List of { "id": int, "tipo": "P"|"F", "orden": int }
+    data: List[ParadaOrden],
     db: Annotated[AsyncSession, Depends(get_db)],
-    admin=Depends(get_current_active_user)
+    current_user: Annotated[Usuario, Depends(get_current_active_user)]
 ):
-    from src.models.business import PedidoIndividual, ServicioFrecuente
-    
-    for item in data:
-        if item["tipo"] == "P":
-            stmt = select(PedidoIndividual).where(PedidoIndividual.id == item["id"])
-            res = await db.execute(stmt)
-            obj = res.scalar_one_or_none()
-            if obj:
-                obj.orden_en_ruta = item["orden"]
-        elif item["tipo"] == "F":
-            stmt = select(ServicioFrecuente).where(ServicioFrecuente.id == item["id"])
-            res = await db.execute(stmt)
-            obj = res.scalar_one_or_none()
-            if obj:
-                obj.orden_en_ruta = item["orden"]
-    
+    """
+    Sets orden_en_ruta of several stops at once (one UPDATE per table). Staff may
+    reorder any route, a driver only their own stops. All or nothing: if any
+    stop doesn't exist or is out of scope nothing is changed.
+    """
+    if current_user.rol in [Rol.ADMIN, Rol.RECEPCIONISTA]:
+        scope = None
+    elif current_user.rol == Rol.CHOFER:
+        scope = (await db.execute(select(Chofer.id).where(Chofer.usuario_id == current_user.id))).scalar_one_or_none()
+        if scope is None:
+            raise HTTPException(status_code=404, detail="Chofer profile not found")
+    else:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    keys = [(item.tipo, item.id) for item in data]
+    if len(set(keys)) != len(keys):
+        raise HTTPException(status_code=400, detail="Paradas repetidas en el pedido")
+
+    choferes_afectados = set()
+    rechazadas = []
+    for tipo, model in (("P", PedidoIndividual), ("F", ServicioFrecuente)):
+        items = [item for item in data if item.tipo == tipo]
+        updated = await _reorder_table(db, model, items, scope)
+        choferes_afectados.update(updated.values())
+        rechazadas += [f"{tipo}{item.id}" for item in items if item.id not in updated]
+    if rechazadas:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail=f"Paradas inexistentes o fuera de su ruta: {rechazadas}")
+
+    await invalidate_route_plans(db, choferes_afectados)
+    for chofer_id in choferes_afectados:
+        if chofer_id is not None:
+            await publish(db, TipoEvento.RUTA_REORDENADA, "rutas", chofer_id, [chofer_id])
     await db.commit()
     return {"ok": True}
@@ -0,0 +1,71 @@
+from typing import Annotated, List
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+from src.db import get_db
+from src.models.users import PerfilVehiculo, Chofer
+from src.schemas.all import PerfilVehiculoRead, PerfilVehiculoCreate
+from src.deps import get_admin_user, get_current_active_user
+from src.utils.route_planner import invalidate_route_plans
+
+router = APIRouter(prefix="/vehiculos", tags=["Vehículos"])
+
+@router.get("/", response_model=List[PerfilVehiculoRead])
+async def read_perfiles(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user=Depends(get_current_active_user)
+):
+    result = await db.execute(select(PerfilVehiculo).order_by(PerfilVehiculo.nombre))
+    return result.scalars().all()
+
+@router.post("/", response_model=PerfilVehiculoRead)
+async def create_perfil(
+    perfil: PerfilVehiculoCreate,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    admin=Depends(get_admin_user)
+):
+    new_perfil = PerfilVehiculo(**perfil.model_dump())
+    db.add(new_perfil)
+    await db.commit()
+    await db.refresh(new_perfil)
+    return new_perfil
+
+@router.put("/{perfil_id}", response_model=PerfilVehiculoRead)
+async def update_perfil(
+    perfil_id: int,
+    perfil: PerfilVehiculoCreate,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    admin=Depends(get_admin_user)
+):
+    db_perfil = await db.get(PerfilVehiculo, perfil_id)
+    if not db_perfil:
+        raise HTTPException(status_code=404, detail="Perfil de vehículo no encontrado")
+
+    db_perfil.nombre = perfil.nombre
+    db_perfil.tipos_permitidos = perfil.tipos_permitidos
+    db_perfil.capacidad = perfil.capacidad
+    db_perfil.activo = perfil.activo
+
+    # Capacity / allowed types feed every plan of the drivers using this vehicle
+    chofer_ids = (await db.execute(select(Chofer.id).where(Chofer.perfil_vehiculo_id == perfil_id))).scalars().all()
+    await invalidate_route_plans(db, chofer_ids)
+    await db.commit()
+    await db.refresh(db_perfil)
+    return db_perfil
+
+@router.delete("/{perfil_id}")
+async def delete_perfil(
+    perfil_id: int,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    admin=Depends(get_admin_user)
+):
+    db_perfil = await db.get(PerfilVehiculo, perfil_id)
+    if not db_perfil:
+        raise HTTPException(status_code=404, detail="Perfil de vehículo no encontrado")
+
+    chofer_ids = (await db.execute(select(Chofer.id).where(Chofer.perfil_vehiculo_id == perfil_id))).scalars().all()
+    await db.execute(update(Chofer).where(Chofer.perfil_vehiculo_id == perfil_id).values(perfil_vehiculo_id=None))
+    await invalidate_route_plans(db, chofer_ids)
+    await db.delete(db_perfil)
+    await db.commit()
+    return {"ok": True}
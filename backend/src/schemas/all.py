@@ -1,7 +1,7 @@
-from datetime import datetime
+from datetime import datetime, date
 from typing import Optional, List, Dict, Any
 from pydantic import BaseModel, EmailStr, Field, field_validator, ConfigDict
-from src.models.enums import Rol, TipoServicio, EstadoPedido, EstadoFrecuente, MetodoPago
+from src.models.enums import Rol, TipoServicio, EstadoPedido, EstadoFrecuente, EstadoOcurrencia, MetodoPago
 
 # --- Auth & Users ---
 class UserBase(BaseModel):
@@ -41,6 +41,20 @@ class LoginRequest(BaseModel):
 class PasswordChange(BaseModel):
     new_password: str
 
+# --- Vehículos ---
+class PerfilVehiculoBase(BaseModel):
+    model_config = ConfigDict(from_attributes=True, kw_only=True)
+    nombre: str
+    tipos_permitidos: List[str] = Field(default_factory=list) # Empty = every service type
+    capacidad: Dict[str, int] = Field(default_factory=dict) # Units per trip by tipo_servicio
+    activo: bool = True
+
+class PerfilVehiculoCreate(PerfilVehiculoBase):
+    pass
+
+class PerfilVehiculoRead(PerfilVehiculoBase):
+    id: int
+
 # --- Chofer ---
 class ChoferBase(BaseModel):
     telefono: str
@@ -52,6 +66,7 @@ class ChoferCreate(ChoferBase):
 class ChoferRead(ChoferBase):
     id: int
     usuario: UserRead
+    perfil_vehiculo_id: Optional[int] = None
     
     class Config:
         from_attributes = True
@@ -74,6 +89,14 @@ class ZonaRead(ZonaBase):
     class Config:
         from_attributes = True
 
+class ZonaResumen(BaseModel):
+    """Zone as embedded in orders / services: never the polygon."""
+    id: int
+    nombre: str
+
+    class Config:
+        from_attributes = True
+
 class RutaDiaBase(BaseModel):
     model_config = ConfigDict(from_attributes=True, kw_only=True)
     dia_semana: int # 0-6
@@ -165,7 +188,7 @@ class PedidoRead(PedidoBase):
     zona_id: Optional[int] = None
     chofer_id: Optional[int] = None
     fecha_hora_ejecucion: Optional[datetime] = None
-    zona: Optional[ZonaRead] = None
+    zona: Optional[ZonaResumen] = None
     chofer: Optional[ChoferRead] = None
     pagos: List[PagoRead] = []
     monto_reportado: Optional[float] = None
@@ -213,7 +236,7 @@ class FrecuenteRead(FrecuenteBase):
     lng: Optional[float] = None
     zona_id: Optional[int] = None
     chofer_id: Optional[int] = None
-    zona: Optional[ZonaRead] = None
+    zona: Optional[ZonaResumen] = None
     chofer: Optional[ChoferRead] = None
     monto_reportado: Optional[float] = None
     metodo_reportado: Optional[str] = None
@@ -222,6 +245,126 @@ class FrecuenteRead(FrecuenteBase):
     class Config:
         from_attributes = True
 
+# --- Slim list rows (?fields= / ?include=) ---
+# Only what was asked for is serialized; nested objects come from joins, not relationship loads
+class ClienteResumen(BaseModel):
+    id: int
+    nombre: str
+    telefono: Optional[str] = None
+    direccion: Optional[str] = None
+
+class ChoferResumen(BaseModel):
+    id: int
+    nombre: Optional[str] = None
+    patente: Optional[str] = None
+
+class PedidoFila(BaseModel):
+    id: int
+    cliente_id: Optional[int] = None
+    tipo_servicio: Optional[str] = None
+    direccion: Optional[str] = None
+    costo: Optional[float] = None
+    descripcion: Optional[str] = None
+    estado: Optional[EstadoPedido] = None
+    fecha_hora_recepcion: Optional[datetime] = None
+    fecha_hora_ejecucion: Optional[datetime] = None
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    zona_id: Optional[int] = None
+    chofer_id: Optional[int] = None
+    orden_en_ruta: Optional[int] = None
+    rango_horario: Optional[str] = None
+    rango_precio: Optional[str] = None
+    monto_reportado: Optional[float] = None
+    metodo_reportado: Optional[str] = None
+    observaciones_chofer: Optional[str] = None
+    cliente: Optional[ClienteResumen] = None
+    zona: Optional[ZonaResumen] = None
+    chofer: Optional[ChoferResumen] = None
+    pagos: Optional[List[PagoRead]] = None
+
+class FrecuenteFila(BaseModel):
+    id: int
+    cliente_id: Optional[int] = None
+    tipo_servicio: Optional[str] = None
+    direccion: Optional[str] = None
+    telefono: Optional[str] = None
+    cantidad: Optional[int] = None
+    costo_individual: Optional[float] = None
+    total: Optional[float] = None
+    estado: Optional[EstadoFrecuente] = None
+    fecha_inicio: Optional[datetime] = None
+    fecha_fin: Optional[datetime] = None
+    dias_semana: Optional[List[str]] = None
+    dia_saliente: Optional[str] = None
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    zona_id: Optional[int] = None
+    chofer_id: Optional[int] = None
+    orden_en_ruta: Optional[int] = None
+    rango_horario: Optional[str] = None
+    rango_precio: Optional[str] = None
+    monto_reportado: Optional[float] = None
+    metodo_reportado: Optional[str] = None
+    observaciones_chofer: Optional[str] = None
+    cliente: Optional[ClienteResumen] = None
+    zona: Optional[ZonaResumen] = None
+    chofer: Optional[ChoferResumen] = None
+    pagos: Optional[List[PagoRead]] = None
+
+class EstadoPedidoLote(BaseModel):
+    ids: List[int] = Field(min_length=1)
+    estado: EstadoPedido
+
+class EstadoFrecuenteLote(BaseModel):
+    ids: List[int] = Field(min_length=1)
+    estado: EstadoFrecuente
+
+class ResultadoLote(BaseModel):
+    id: int
+    resultado: str # "aplicado" | "sin_cambio" | "rechazado"
+    estado: Optional[str] = None # State after the batch
+    detalle: Optional[str] = None
+
+class OcurrenciaRead(BaseModel):
+    id: int
+    frecuente_id: int
+    fecha: date
+    chofer_id: Optional[int] = None
+    estado: EstadoOcurrencia
+    monto: float
+    pago_id: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+class AgendaItem(BaseModel):
+    tipo: str # "P" = individual order, "F" = visit of a recurring service
+    id: int # PedidoIndividual.id / ServicioOcurrencia.id
+    referencia_id: int # PedidoIndividual.id / ServicioFrecuente.id
+    momento: datetime # Recurring visits have no fixed time: midnight of their day
+    chofer_id: Optional[int] = None
+    zona_id: Optional[int] = None
+    cliente_id: int
+    cliente_nombre: str
+    direccion: str
+    tipo_servicio: str
+    estado: str
+    monto: float
+    rango_horario: Optional[str] = None
+    orden_en_ruta: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+class AgendaPage(BaseModel):
+    desde: date
+    hasta: date
+    total: int
+    limit: int
+    offset: int
+    items: List[AgendaItem]
+
 class SesionTrabajoBase(BaseModel):
     model_config = ConfigDict(from_attributes=True, kw_only=True)
     chofer_id: int
@@ -0,0 +1,112 @@
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import select, update, values, column, case, cast, literal, and_, Integer
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.config import settings
+from src.models.business import PedidoIndividual
+from src.models.enums import EstadoPedido, EstadoFrecuente
+from src.utils.route_planner import vehicle_allows
+from src.utils.time_utils import get_now_arg
+
+# Bulk changes from the office (e.g. closing the day). Every id gets its own
+# result; the valid ones are applied together with one UPDATE. None of these
+# commit.
+
+# Closed stops are never reopened in bulk; that stays a deliberate single edit
+TERMINAL_PEDIDO = [EstadoPedido.FINALIZADO, EstadoPedido.CANCELADA]
+TERMINAL_FRECUENTE = [EstadoFrecuente.FINALIZADO]
+
+
+def unique_ids(ids: List[int]) -> List[int]:
+    """Input order without repeats; 400 when over BATCH_MAX_ITEMS."""
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Máximo {settings.BATCH_MAX_ITEMS} ids por lote")
+    return ids
+
+
+async def apply_estado_batch(db: AsyncSession, model, ids: List[int], estado, terminal) -> Tuple[List[dict], List[Tuple[int, Optional[int], str]]]:
+    """
+    Checks every id with one SELECT ... FOR UPDATE and moves the valid ones to
+    `estado` with a single UPDATE. Returns (results in input order,
+    [(id, chofer_id, estado_anterior)] of the rows changed).
+    """
+    ids = unique_ids(ids)
+    rows = (await db.execute(
+        select(model.id, model.estado, model.chofer_id).where(model.id.in_(ids)).with_for_update()
+    )).all()
+    current = {row.id: row for row in rows}
+
+    resultados, aplicados = [], []
+    for item_id in ids:
+        row = current.get(item_id)
+        if row is None:
+            resultados.append({"id": item_id, "resultado": "rechazado", "detalle": "No encontrado"})
+        elif row.estado == estado:
+            resultados.append({"id": item_id, "resultado": "sin_cambio", "estado": row.estado.value})
+        elif row.estado in terminal:
+            resultados.append({"id": item_id, "resultado": "rechazado", "estado": row.estado.value,
+                               "detalle": f"Ya está {row.estado.value}"})
+        else:
+            resultados.append({"id": item_id, "resultado": "aplicado", "estado": estado.value})
+            aplicados.append((item_id, row.chofer_id, row.estado.value))
+
+    if aplicados:
+        await db.execute(
+            update(model).where(model.id.in_([a[0] for a in aplicados]))
+            .values(estado=estado, actualizado_en=get_now_arg())
+            .execution_options(synchronize_session=False)
+        )
+    return resultados, aplicados
+
+
+async def apply_assignment_batch(db: AsyncSession, model, asignaciones: Dict[int, Optional[int]],
+                                 perfiles: dict) -> Tuple[Dict[int, dict], List[Tuple[int, Optional[int], Optional[int]]]]:
+    """
+    asignaciones: {id: chofer_id (None = unassign)}; perfiles: load_vehicle_profiles
+    of the target drivers. Checks every id with one SELECT ... FOR UPDATE and
+    applies the valid ones with one UPDATE ... FROM (VALUES ...); orders still
+    CREADA become ASIGNADA in that same statement. The manual route position is
+    cleared, the new driver's tour places them by proximity.
+    Returns ({id: result}, [(id, chofer_anterior, chofer_nuevo)] of the rows changed).
+    """
+    rows = (await db.execute(
+        select(model.id, model.chofer_id, model.estado, model.tipo_servicio)
+        .where(model.id.in_(list(asignaciones))).with_for_update()
+    )).all()
+    current = {row.id: row for row in rows}
+
+    resultados, pendientes = {}, []
+    for item_id, chofer_id in asignaciones.items():
+        row = current.get(item_id)
+        if row is None:
+            resultados[item_id] = {"resultado": "rechazado", "detalle": "No encontrado"}
+        elif chofer_id is not None and chofer_id not in perfiles:
+            resultados[item_id] = {"resultado": "rechazado", "detalle": f"Chofer {chofer_id} no encontrado"}
+        elif chofer_id is not None and not vehicle_allows(perfiles[chofer_id], row.tipo_servicio):
+            resultados[item_id] = {"resultado": "rechazado", "estado": row.estado.value, "chofer_id": row.chofer_id,
+                                   "detalle": f"El vehículo del chofer no admite el servicio '{row.tipo_servicio}'"}
+        elif row.chofer_id == chofer_id:
+            resultados[item_id] = {"resultado": "sin_cambio", "estado": row.estado.value, "chofer_id": chofer_id}
+        else:
+            pendientes.append((item_id, row.chofer_id, chofer_id))
+    if not pendientes:
+        return resultados, []
+
+    nuevos = values(column("id", Integer), column("chofer_id", Integer), name="nueva_asignacion")\
+        .data([(item_id, chofer_id) for item_id, _, chofer_id in pendientes])
+    # Explicit cast: a batch of only unassignments would make the VALUES column text
+    cambios = {"chofer_id": cast(nuevos.c.chofer_id, Integer), "orden_en_ruta": None, "actualizado_en": get_now_arg()}
+    if model is PedidoIndividual:
+        cambios["estado"] = case(
+            (and_(model.estado == EstadoPedido.CREADA, nuevos.c.chofer_id.is_not(None)),
+             literal(EstadoPedido.ASIGNADA, model.estado.type)),
+            else_=model.estado
+        )
+    stmt = update(model).where(model.id == nuevos.c.id).values(**cambios)\
+        .returning(model.id, model.estado)\
+        .execution_options(synchronize_session=False)
+    estados = {row.id: row.estado for row in await db.execute(stmt)}
+    for item_id, _, chofer_id in pendientes:
+        resultados[item_id] = {"resultado": "aplicado", "estado": estados[item_id].value, "chofer_id": chofer_id}
+    return resultados, pendientes
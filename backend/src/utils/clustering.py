@@ -0,0 +1,109 @@
+import math
+from typing import List, Optional, Sequence, Tuple
+from src.utils.optimization import EARTH_RADIUS_KM
+
+Point = Tuple[float, float]
+
+
+def project_km(points: Sequence[Point]) -> List[Point]:
+    """
+    Equirectangular projection of (lat, lng) to planar km around the points'
+    mean latitude. Plenty accurate at the scale of a valley.
+    """
+    if not points:
+        return []
+    lat0 = math.radians(sum(lat for lat, _ in points) / len(points))
+    kx = math.radians(1) * EARTH_RADIUS_KM * math.cos(lat0)
+    ky = math.radians(1) * EARTH_RADIUS_KM
+    return [(lng * kx, lat * ky) for lat, lng in points]
+
+
+def _sq(a: Point, b: Point) -> float:
+    return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2
+
+
+def _mean(xy: Sequence[Point]) -> Point:
+    return sum(p[0] for p in xy) / len(xy), sum(p[1] for p in xy) / len(xy)
+
+
+def balanced_clusters(points: Sequence[Point], eligible: Sequence[Optional[Sequence[int]]], k: int,
+                      capacity: Sequence[int], max_capacity: Optional[Sequence[int]] = None,
+                      anchors: Optional[Sequence[Sequence[Point]]] = None, max_iter: int = 20) -> List[int]:
+    """
+    Balanced k-means on projected coordinates.
+
+    points: (lat, lng) of the stops to split.
+    eligible: per stop, the clusters it may join (None = any). Used for RutaDia
+              zone rules and vehicle compatibility.
+    capacity: soft size target per cluster; max_capacity: hard limit (defaults to capacity).
+    anchors: per cluster, (lat, lng) of stops it already has (e.g. a driver's
+             assigned stops); they pull the centroid but aren't reassigned.
+
+    Stops are placed hardest-first (fewest options, then largest regret between
+    their best and second best centroid) in the nearest cluster under its
+    target, falling back to any cluster under its hard limit.
+    Returns the cluster index of every stop, -1 if none could take it.
+    """
+    n = len(points)
+    if n == 0 or k == 0:
+        return [-1] * n
+    max_capacity = list(max_capacity) if max_capacity is not None else list(capacity)
+    anchors = anchors or [[] for _ in range(k)]
+
+    all_xy = project_km(list(points) + [p for group in anchors for p in group])
+    xy = all_xy[:n]
+    anchor_xy = []
+    offset = n
+    for group in anchors:
+        anchor_xy.append(all_xy[offset:offset + len(group)])
+        offset += len(group)
+
+    options = [list(e) if e is not None else list(range(k)) for e in eligible]
+
+    # Seeds: existing stops' centroid, otherwise farthest-first among the stops the
+    # cluster may take (deterministic, unlike k-means++)
+    centroids: List[Optional[Point]] = [_mean(a) if a else None for a in anchor_xy]
+    for c in range(k):
+        if centroids[c] is not None:
+            continue
+        candidates = [i for i in range(n) if c in options[i]]
+        if not candidates:
+            continue
+        placed = [p for p in centroids if p is not None]
+        if placed:
+            best = max(candidates, key=lambda i: min(_sq(xy[i], p) for p in placed))
+        else:
+            best = min(candidates)
+        centroids[c] = xy[best]
+
+    assignment = [-1] * n
+    for _ in range(max_iter):
+        ranked = []
+        for i in range(n):
+            dists = sorted((_sq(xy[i], centroids[c]), c) for c in options[i] if centroids[c] is not None)
+            regret = dists[1][0] - dists[0][0] if len(dists) > 1 else float("inf")
+            ranked.append((len(dists), -regret, i, dists))
+        ranked.sort(key=lambda r: (r[0], r[1], r[2]))
+
+        size = [0] * k
+        new_assignment = [-1] * n
+        for _, _, i, dists in ranked:
+            target = next((c for _, c in dists if size[c] < capacity[c]), None)
+            if target is None:
+                target = next((c for _, c in dists if size[c] < max_capacity[c]), None)
+            if target is None:
+                continue
+            new_assignment[i] = target
+            size[target] += 1
+
+        if new_assignment == assignment:
+            break
+        assignment = new_assignment
+
+        members: List[List[Point]] = [list(anchor_xy[c]) for c in range(k)]
+        for i, c in enumerate(assignment):
+            if c >= 0:
+                members[c].append(xy[i])
+        centroids = [_mean(m) if m else centroids[c] for c, m in enumerate(members)]
+
+    return assignment
@@ -0,0 +1,96 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Hashable, Optional
+from src.config import settings
+
+# CPU-bound route computations run here instead of on the event loop.
+# Jobs must be module-level functions taking plain data (lists / dicts / tuples),
+# never ORM objects.
+
+class ComputeTimeout(Exception):
+    """The job didn't get a worker or didn't finish in time."""
+
+_executor: Optional[ProcessPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
+# key -> [shared task, number of requests awaiting it]
+_in_flight: Dict[Hashable, list] = {}
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.ROUTE_POOL_WORKERS)
+    return _executor
+
+
+def _get_slots() -> asyncio.Semaphore:
+    # Bounds queued + running jobs; the executor's own queue is unbounded
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(settings.ROUTE_POOL_MAX_PENDING)
+    return _slots
+
+
+async def _run(fn: Callable, args: tuple, timeout: float):
+    global _executor
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    slots = _get_slots()
+    try:
+        await asyncio.wait_for(slots.acquire(), timeout)
+    except asyncio.TimeoutError:
+        raise ComputeTimeout("No hay capacidad de cálculo disponible")
+
+    try:
+        future = _get_executor().submit(fn, *args)
+    except BrokenProcessPool:
+        _executor = None
+        slots.release()
+        raise
+    # The slot is freed when the job really ends: a timed-out job that already
+    # started keeps its worker busy until it finishes.
+    def _release(_):
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(slots.release)
+    future.add_done_callback(_release)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), max(deadline - loop.time(), 0.001))
+    except asyncio.TimeoutError:
+        raise ComputeTimeout("El cálculo de la ruta tardó demasiado")
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM); start a fresh pool on the next job
+        _executor = None
+        raise
+
+
+async def run_in_pool(key: Hashable, fn: Callable, *args, timeout: Optional[float] = None):
+    """
+    Runs fn(*args) in the process pool. Concurrent calls with the same `key`
+    share one computation. The job is cancelled (if not started yet) when every
+    caller awaiting it goes away. Raises ComputeTimeout after `timeout` seconds
+    (ROUTE_COMPUTE_TIMEOUT_S by default).
+    """
+    timeout = timeout if timeout is not None else settings.ROUTE_COMPUTE_TIMEOUT_S
+    entry = _in_flight.get(key)
+    if entry is None:
+        task = asyncio.ensure_future(_run(fn, args, timeout))
+        entry = [task, 0]
+        _in_flight[key] = entry
+        task.add_done_callback(lambda _: _in_flight.pop(key, None) if _in_flight.get(key) is entry else None)
+    entry[1] += 1
+    try:
+        return await asyncio.shield(entry[0])
+    except asyncio.CancelledError:
+        if entry[1] == 1:
+            entry[0].cancel()
+        raise
+    finally:
+        entry[1] -= 1
+
+
+def shutdown_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,67 @@
+import hashlib
+import hmac
+import json
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional, Tuple
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.config import settings
+from src.models.planning import ParadaBaja, SyncMutacion
+from src.utils.time_utils import get_now_arg
+
+# Changes can commit a little after their actualizado_en was stamped, so every
+# delta looks back this far and the app applies rows idempotently
+CURSOR_OVERLAP = timedelta(seconds=30)
+# Cursors are day-bound, older tombstones are never read
+TOMBSTONE_RETENTION = timedelta(days=2)
+# Idempotency keys of /chofer/sync: a queue the app couldn't deliver for this
+# long is stale anyway (its bundle was for another day)
+SYNC_KEY_RETENTION = timedelta(days=7)
+
+
+def make_cursor(dia: date, ts: datetime) -> str:
+    return f"{dia.isoformat()}~{ts.isoformat()}"
+
+
+def parse_cursor(cursor: str) -> Optional[Tuple[date, datetime]]:
+    """(day, timestamp) of a cursor from make_cursor, None if it's malformed."""
+    try:
+        dia, ts = cursor.split("~", 1)
+        return date.fromisoformat(dia), datetime.fromisoformat(ts)
+    except ValueError:
+        return None
+
+
+async def record_removed_stops(db: AsyncSession, chofer_id: Optional[int], tipo: str, ids: Iterable[int]):
+    """Tombstones for stops leaving `chofer_id`'s list. Does not commit."""
+    ids = list(ids)
+    if chofer_id is None or not ids:
+        return
+    now = get_now_arg()
+    await db.execute(delete(ParadaBaja).where(ParadaBaja.creado_en < now - TOMBSTONE_RETENTION))
+    await db.execute(insert(ParadaBaja).values([
+        {"chofer_id": chofer_id, "tipo": tipo, "item_id": item_id, "creado_en": now} for item_id in ids
+    ]))
+
+
+async def prune_sync_keys(db: AsyncSession, chofer_id: int):
+    """Drops the driver's idempotency keys past SYNC_KEY_RETENTION. Does not commit."""
+    await db.execute(delete(SyncMutacion).where(
+        SyncMutacion.chofer_id == chofer_id, SyncMutacion.creado_en < get_now_arg() - SYNC_KEY_RETENTION
+    ))
+
+
+def content_revision(contenido: dict) -> str:
+    """Short stable hash of a bundle's content (its ETag)."""
+    canonical = json.dumps(contenido, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def sign_bundle(chofer_id: int, fecha: str, generado_en: datetime, revision: str) -> str:
+    """HMAC of what identifies a bundle, so the app can hand it back and we can trust its generado_en."""
+    message = f"bundle|{chofer_id}|{fecha}|{generado_en.isoformat()}|{revision}"
+    return hmac.new(settings.SECRET_KEY.encode(), message.encode(), hashlib.sha256).hexdigest()
+
+
+def verify_bundle(chofer_id: int, fecha: str, generado_en: datetime, revision: str, firma: str) -> bool:
+    return hmac.compare_digest(sign_bundle(chofer_id, fecha, generado_en, revision), firma)
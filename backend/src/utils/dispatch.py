@@ -0,0 +1,165 @@
+import math
+from src.utils.clustering import balanced_clusters
+from src.utils.optimization import evaluate_route, solve_tsptw, route_cost
+
+
+def _evaluate(order, ctx, vehicle):
+    return evaluate_route(order, ctx["dist"], ctx["mins"], ctx["windows"], ctx["service"],
+                          ctx["start_minute"], vehicle.get("origin"),
+                          ctx["loads"], vehicle.get("capacidad"))
+
+
+def _cost(order, ctx, vehicle):
+    if not order:
+        return 0.0, 0
+    ev = _evaluate(order, ctx, vehicle)
+    return route_cost(ev), ev["sobrecargas"]
+
+
+def _best_insertion(idx, order, ctx, vehicle, base_cost, base_overloads):
+    """
+    Cheapest position for `idx` in `order` that doesn't overflow the truck
+    (yard returns allowed when the vehicle has an origin). Returns (delta, position,
+    (cost, overloads) of the route with the stop inserted) or (None, None, None)
+    if it can't be carried.
+    """
+    best_delta, best_pos, best_state = None, None, None
+    for pos in range(len(order) + 1):
+        candidate = order[:pos] + [idx] + order[pos:]
+        cost, overloads = _cost(candidate, ctx, vehicle)
+        if overloads > base_overloads:
+            continue
+        delta = cost - base_cost
+        if best_delta is None or delta < best_delta:
+            best_delta, best_pos, best_state = delta, pos, (cost, overloads)
+    return best_delta, best_pos, best_state
+
+
+def solve_vrp(dist, mins, windows, service, loads, vehicles, stops, start_minute, max_relocate_passes=5):
+    """
+    Capacitated multi-vehicle routing over matrix indices.
+
+    loads: {tipo_servicio: units} per matrix index (None for the depot).
+    vehicles: list of dicts with
+        "origin": matrix index of the yard where the truck starts (or None),
+        "max_paradas": max number of stops for the day,
+        "capacidad": {tipo_servicio: units per trip} or None (unlimited); with an
+                     origin the truck returns to the yard mid-route when full,
+        "fixed": stops already assigned to this truck (kept on it, may be reordered).
+    stops: list of (matrix index, eligible vehicle positions).
+
+    Parallel cheapest insertion (hardest stops first: fewest eligible trucks,
+    earliest deadline), then inter-route relocation and a TSPTW re-sequence of
+    every route. Returns {"rutas": [order per vehicle], "sin_asignar": [idx]}.
+    """
+    ctx = {"dist": dist, "mins": mins, "windows": windows, "service": service,
+           "loads": loads, "start_minute": start_minute}
+    routes = [list(v.get("fixed", [])) for v in vehicles]
+    state = [_cost(r, ctx, v) for r, v in zip(routes, vehicles)]
+    eligible = {idx: set(allowed) for idx, allowed in stops}
+
+    def hardness(item):
+        idx, allowed = item
+        w = windows[idx]
+        return (len(allowed), w[1] if w else float("inf"))
+
+    def has_room(v):
+        return len(routes[v]) < vehicles[v]["max_paradas"]
+
+    unassigned = []
+    for idx, allowed in sorted(stops, key=hardness):
+        best = None
+        for v in allowed:
+            if not has_room(v):
+                continue
+            delta, pos, new_state = _best_insertion(idx, routes[v], ctx, vehicles[v], *state[v])
+            if delta is not None and (best is None or delta < best[0]):
+                best = (delta, v, pos, new_state)
+        if best is None:
+            unassigned.append(idx)
+            continue
+        _, v, pos, new_state = best
+        routes[v].insert(pos, idx)
+        state[v] = new_state # Cost and overloads, so later insertions see the real load
+
+    # Relocate movable stops between trucks while the total cost drops
+    fixed = {i for v in vehicles for i in v.get("fixed", [])}
+    for _ in range(max_relocate_passes):
+        moved = False
+        for src in range(len(routes)):
+            for idx in list(routes[src]):
+                if idx in fixed:
+                    continue
+                without = [i for i in routes[src] if i != idx]
+                without_state = _cost(without, ctx, vehicles[src])
+                saving = state[src][0] - without_state[0]
+                for dst in eligible.get(idx, ()):
+                    if dst == src or not has_room(dst):
+                        continue
+                    delta, pos, new_state = _best_insertion(idx, routes[dst], ctx, vehicles[dst], *state[dst])
+                    if delta is not None and delta < saving - 1e-6:
+                        routes[src] = without
+                        state[src] = without_state
+                        routes[dst].insert(pos, idx)
+                        state[dst] = new_state
+                        moved = True
+                        break
+        if not moved:
+            break
+
+    final_routes = []
+    for route, vehicle in zip(routes, vehicles):
+        if len(route) > 1:
+            result = solve_tsptw(dist, mins, windows, service, start_minute,
+                                 origin=vehicle.get("origin"), stops=route,
+                                 loads=loads, capacity=vehicle.get("capacidad"))
+            route = result["orden"]
+        final_routes.append(route)
+
+    return {"rutas": final_routes, "sin_asignar": unassigned}
+
+
+def partition_stops(points, vehicles, stops):
+    """
+    Splits `stops` (as for solve_vrp) into one cluster per vehicle with
+    balanced_clusters. points: (lat, lng) per matrix index. Each vehicle's fixed
+    stops anchor its cluster; sizes aim at an even share of the day's stops and
+    never exceed max_paradas. Returns ({vehicle position: [stop]}, [unplaced idx]).
+    """
+    total = len(stops) + sum(len(v.get("fixed", [])) for v in vehicles)
+    share = math.ceil(total / len(vehicles)) if vehicles else 0
+    room = [max(v["max_paradas"] - len(v.get("fixed", [])), 0) for v in vehicles]
+    target = [min(max(share - len(v.get("fixed", [])), 0), r) for v, r in zip(vehicles, room)]
+    labels = balanced_clusters(
+        [points[idx] for idx, _ in stops],
+        [allowed for _, allowed in stops],
+        len(vehicles),
+        capacity=target,
+        max_capacity=room,
+        anchors=[[points[i] for i in v.get("fixed", [])] for v in vehicles],
+    )
+    clusters = {}
+    unplaced = []
+    for stop, label in zip(stops, labels):
+        if label < 0:
+            unplaced.append(stop[0])
+        else:
+            clusters.setdefault(label, []).append(stop)
+    return clusters, unplaced
+
+
+def solve_vrp_clustered(dist, mins, windows, service, loads, vehicles, stops, start_minute, points):
+    """
+    solve_vrp for large days: partition_stops first, then each vehicle routes
+    its own cluster independently (no inter-route relocation). Same return
+    shape as solve_vrp.
+    """
+    clusters, unassigned = partition_stops(points, vehicles, stops)
+    routes = []
+    for v, vehicle in enumerate(vehicles):
+        cluster = [(idx, [0]) for idx, _ in clusters.get(v, [])]
+        result = solve_vrp(dist, mins, windows, service, loads, [vehicle], cluster, start_minute,
+                           max_relocate_passes=0)
+        routes.append(result["rutas"][0])
+        unassigned.extend(result["sin_asignar"])
+    return {"rutas": routes, "sin_asignar": unassigned}
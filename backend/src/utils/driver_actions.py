@@ -0,0 +1,94 @@
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.models.business import PedidoIndividual, ServicioFrecuente, Gasto
+from src.models.enums import EstadoPedido, EstadoFrecuente, EstadoOcurrencia, TipoEvento
+from src.utils.events import publish
+from src.utils.recurrence import mark_today, sync_occurrences, VISIT_STATE
+from src.utils.route_planner import invalidate_route_plans
+
+# Driver-side mutations shared by the individual endpoints and the offline
+# replay in /chofer/sync. None of them commit; errors are HTTPExceptions.
+
+# Closed by the office (payment verified / contract ended): the driver can't move them back
+LOCKED_PEDIDO = [EstadoPedido.FINALIZADO]
+LOCKED_FRECUENTE = [EstadoFrecuente.FINALIZADO, EstadoFrecuente.PAUSADO]
+
+
+async def _own_stop(db: AsyncSession, model, item_id: int, chofer_id: int):
+    item = (await db.execute(select(model).where(model.id == item_id))).scalar_one_or_none()
+    if not item:
+        raise HTTPException(status_code=404, detail="Pedido not found" if model is PedidoIndividual else "Frecuente not found")
+    if item.chofer_id != chofer_id:
+        raise HTTPException(status_code=403, detail="Not your pedido" if model is PedidoIndividual else "Not your service")
+    return item
+
+
+def check_pedido_unlocked(pedido: PedidoIndividual, estado: EstadoPedido):
+    """409 if a driver tries to move an order the office already closed."""
+    if pedido.estado in LOCKED_PEDIDO and estado != pedido.estado:
+        raise HTTPException(status_code=409, detail=f"El pedido ya está {pedido.estado.value}")
+
+
+def check_frecuente_unlocked(freq: ServicioFrecuente, estado: EstadoFrecuente):
+    """409 if a driver tries to move a contract the office finished or paused."""
+    if freq.estado in LOCKED_FRECUENTE and estado != freq.estado:
+        raise HTTPException(status_code=409, detail=f"El servicio está {freq.estado.value}")
+
+
+async def set_pedido_estado(db: AsyncSession, chofer_id: int, pedido_id: int, estado: EstadoPedido) -> PedidoIndividual:
+    pedido = await _own_stop(db, PedidoIndividual, pedido_id, chofer_id)
+    check_pedido_unlocked(pedido, estado)
+    pedido.estado = estado
+    await invalidate_route_plans(db, [chofer_id])
+    await publish(db, TipoEvento.ESTADO, "pedidos", pedido.id, [chofer_id], estado=estado.value)
+    return pedido
+
+
+async def set_frecuente_estado(db: AsyncSession, chofer_id: int, frecuente_id: int, estado: EstadoFrecuente) -> ServicioFrecuente:
+    freq = await _own_stop(db, ServicioFrecuente, frecuente_id, chofer_id)
+    check_frecuente_unlocked(freq, estado)
+    freq.estado = estado
+    if estado in VISIT_STATE:
+        await mark_today(db, [freq.id], VISIT_STATE[estado])
+    await sync_occurrences(db, freq)
+    await invalidate_route_plans(db, [chofer_id])
+    await publish(db, TipoEvento.ESTADO, "frecuentes", freq.id, [chofer_id], estado=estado.value)
+    return freq
+
+
+async def report_stop_payment(db: AsyncSession, chofer_id: int, item_id: int, tipo: str, monto: float,
+                              metodo: str, observaciones: Optional[str] = None):
+    """tipo: "Individual" (order) or "Recurrente" (recurring service)."""
+    if tipo == "Individual":
+        item = await _own_stop(db, PedidoIndividual, item_id, chofer_id)
+        item.estado = EstadoPedido.PAGO_PENDIENTE
+    else:
+        item = await _own_stop(db, ServicioFrecuente, item_id, chofer_id)
+        item.estado = EstadoFrecuente.PAGO_PENDIENTE
+        await mark_today(db, [item.id], EstadoOcurrencia.PAGO_PENDIENTE)
+    item.monto_reportado = monto
+    item.metodo_reportado = metodo
+    item.observaciones_chofer = observaciones
+
+    await invalidate_route_plans(db, [chofer_id])
+    await publish(db, TipoEvento.PAGO_REPORTADO, "pedidos" if tipo == "Individual" else "frecuentes", item.id,
+                  [chofer_id], monto=monto, metodo=metodo)
+    return item
+
+
+def add_expense(db: AsyncSession, chofer_id: Optional[int], usuario_id: int, monto: float, categoria: str,
+                descripcion: Optional[str] = None, fecha: Optional[datetime] = None) -> Gasto:
+    gasto = Gasto(
+        monto=monto,
+        categoria=categoria,
+        descripcion=descripcion,
+        chofer_id=chofer_id,
+        registrado_por=usuario_id
+    )
+    if fecha is not None:
+        gasto.fecha = fecha
+    db.add(gasto)
+    return gasto
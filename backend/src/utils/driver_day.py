@@ -0,0 +1,80 @@
+from datetime import date
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import select, and_, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.models.business import PedidoIndividual, ServicioFrecuente, ServicioOcurrencia
+from src.models.enums import EstadoPedido, EstadoFrecuente, EstadoOcurrencia
+from src.models.geo import RutaDia
+from src.utils.recurrence import STOPPED_FRECUENTE
+from src.utils.time_utils import day_bounds
+
+# States where a stop still has to be visited
+PENDING_PEDIDO = [EstadoPedido.CREADA, EstadoPedido.ASIGNADA, EstadoPedido.EN_CAMINO]
+PENDING_FRECUENTE = [EstadoFrecuente.ACTIVO, EstadoFrecuente.EN_CAMINO]
+PENDING_VISIT = [EstadoOcurrencia.PROGRAMADA, EstadoOcurrencia.EN_CAMINO]
+
+
+def frecuente_visits_on(fecha: date):
+    """
+    SQL predicate: the recurring service has a visit on `fecha` in the calendar
+    (servicio_ocurrencia) that wasn't cancelled, so a single visit cancelled
+    without touching the contract is honoured.
+    """
+    return exists().where(
+        ServicioOcurrencia.frecuente_id == ServicioFrecuente.id,
+        ServicioOcurrencia.fecha == fecha,
+        ServicioOcurrencia.estado != EstadoOcurrencia.CANCELADA
+    )
+
+
+async def zones_for_day(db: AsyncSession, dia_semana: int) -> Tuple[Dict[int, Set[int]], Set[int]]:
+    """
+    RutaDia rules for a weekday.
+    Returns ({chofer_id: {zona_id}}, {zona_id of general rules without chofer}).
+    """
+    stmt = select(RutaDia.chofer_id, RutaDia.zona_id).where(
+        RutaDia.dia_semana == dia_semana,
+        RutaDia.activo == True
+    )
+    rows = (await db.execute(stmt)).all()
+    by_driver: Dict[int, Set[int]] = {}
+    general: Set[int] = set()
+    for chofer_id, zona_id in rows:
+        if chofer_id is None:
+            general.add(zona_id)
+        else:
+            by_driver.setdefault(chofer_id, set()).add(zona_id)
+    return by_driver, general
+
+
+async def load_pending_stops(db: AsyncSession, fecha: date, chofer_ids: Optional[List[int]] = None) -> Dict[int, list]:
+    """
+    Pending stops (individual orders for `fecha` + recurring services with a
+    pending visit that day in the calendar) grouped by chofer_id.
+    """
+    start, end = day_bounds(fecha)
+    stmt_ped = select(PedidoIndividual).where(
+        PedidoIndividual.chofer_id != None,
+        PedidoIndividual.fecha_hora_ejecucion >= start,
+        PedidoIndividual.fecha_hora_ejecucion < end,
+        PedidoIndividual.estado.in_(PENDING_PEDIDO)
+    )
+    # Recurring stops come from the day's visits (index on fecha / chofer_id, fecha)
+    stmt_freq = select(ServicioFrecuente, ServicioOcurrencia.chofer_id)\
+        .join(ServicioOcurrencia, and_(ServicioOcurrencia.frecuente_id == ServicioFrecuente.id,
+                                       ServicioOcurrencia.fecha == fecha))\
+        .where(
+            ServicioOcurrencia.chofer_id != None,
+            ServicioOcurrencia.estado.in_(PENDING_VISIT), # Today's visit mirrors the contract's daily state
+            ServicioFrecuente.estado.not_in(STOPPED_FRECUENTE)
+        )
+    if chofer_ids is not None:
+        stmt_ped = stmt_ped.where(PedidoIndividual.chofer_id.in_(chofer_ids))
+        stmt_freq = stmt_freq.where(ServicioOcurrencia.chofer_id.in_(chofer_ids))
+
+    stops: Dict[int, list] = {}
+    for p in (await db.execute(stmt_ped)).scalars().all():
+        stops.setdefault(p.chofer_id, []).append(p)
+    for f, chofer_id in (await db.execute(stmt_freq)).all():
+        stops.setdefault(chofer_id, []).append(f)
+    return stops
@@ -0,0 +1,280 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.config import settings
+from src.models.business import PedidoIndividual
+from src.models.enums import TipoEvento, EstadoOcurrencia
+from src.models.planning import RoutePlan
+from src.utils.driver_day import load_pending_stops, PENDING_PEDIDO, PENDING_FRECUENTE
+from src.utils.events import hub
+from src.utils.optimization import (
+    build_matrices, haversine_km, sort_manual_then_nearest, ROAD_FACTOR, YARD_RETURN_MINUTES
+)
+from src.utils.positions import positions
+from src.utils.route_planner import get_depot, stop_kind
+from src.utils.time_utils import get_now_arg
+from src.utils.time_windows import estimate_service_minutes, format_clock, window_for_stop
+
+# Live ETAs: the driver's remaining stops (in the stored plan's order) and the
+# travel times between them are loaded once per driver and kept in memory. A
+# GPS fix only re-walks that list from the truck's position (one haversine + a
+# sum over the cached legs); a finished stop is just dropped from it. The list
+# is reloaded from the DB when the route itself changes (assignment, reorder).
+
+StopKey = Tuple[str, int]
+
+_STILL_PENDING = {e.value for e in PENDING_PEDIDO} | {e.value for e in PENDING_FRECUENTE} | {
+    EstadoOcurrencia.PROGRAMADA.value, EstadoOcurrencia.EN_CAMINO.value
+}
+
+
+class _Route:
+    """Remaining stops of one driver and the matrix they index into."""
+
+    def __init__(self, chofer_id: int, fecha, keys: List[StopKey], points, windows, service, planned):
+        self.chofer_id = chofer_id
+        self.fecha = fecha
+        self.keys = keys # ("B", n) = mid-route yard return
+        self.points = points
+        self.windows = windows
+        self.service = service
+        self.planned = planned # Plan arrival (minutes) per stop, used without a fresh fix
+        # Owned by this route (not the shared cache): it's dropped with the route on reload
+        _, self.mins = build_matrices(points, settings.ROUTE_AVG_SPEED_KMH)
+        self.order = list(range(len(keys)))
+        self._trim()
+        self.cargado_en = get_now_arg()
+        self.stale = False
+        self.fix: Optional[dict] = None # Fix the current ETAs were computed from
+        self.etas: Dict[StopKey, float] = {}
+        self.origen = "plan"
+        self.calculado_en: Optional[datetime] = None
+
+    def _trim(self):
+        # A yard return with nothing after it is pointless
+        while self.order and self.keys[self.order[-1]][0] == "B":
+            self.order.pop()
+
+    def has(self, key: StopKey) -> bool:
+        return any(self.keys[i] == key for i in self.order)
+
+    def drop(self, key: StopKey):
+        self.order = [i for i in self.order if self.keys[i] != key]
+        self._trim()
+
+    def recompute(self, fix: Optional[dict]):
+        now = get_now_arg()
+        clock = float(now.hour * 60 + now.minute + now.second / 60)
+        self.etas = {}
+        self.fix = fix
+        self.calculado_en = now
+        prev = None
+        if self.order and fix is not None:
+            lat, lng = self.points[self.order[0]]
+            km = haversine_km(fix["lat"], fix["lng"], lat, lng) * ROAD_FACTOR
+            clock += km / settings.ROUTE_AVG_SPEED_KMH * 60
+            self.origen = "gps"
+        elif self.order:
+            # No usable position: trust the plan for the next stop, never in the past
+            planned = self.planned[self.order[0]]
+            if planned is not None:
+                clock = max(clock, planned)
+            self.origen = "plan"
+        for idx in self.order:
+            if prev is not None:
+                clock += self.mins[prev][idx]
+            window = self.windows[idx]
+            if window and clock < window[0]:
+                clock = float(window[0])
+            self.etas[self.keys[idx]] = clock
+            clock += self.service[idx]
+            prev = idx
+
+    def to_dict(self) -> dict:
+        now = get_now_arg()
+        now_minute = now.hour * 60 + now.minute
+        return {
+            "chofer_id": self.chofer_id,
+            "origen": self.origen,
+            "calculado_en": self.calculado_en,
+            "posicion_en": self.fix["registrado_en"] if self.fix else None,
+            "paradas": [
+                {"tipo": tipo, "id": id, "llegada": format_clock(minute),
+                 "minutos": max(int(round(minute - now_minute)), 0)}
+                for (tipo, id), minute in self.etas.items() if tipo != "B"
+            ],
+        }
+
+
+def customer_window(llegada: str) -> str:
+    """'10:07' -> '09:45 - 10:15': a half-hour range on quarter hours for customers."""
+    hour, _, minute = llegada.partition(":")
+    start = (int(hour) * 60 + int(minute) - 10) // 15 * 15
+    return f"{format_clock(max(start, 0))} - {format_clock(max(start, 0) + 30)}"
+
+
+def _fresh_fix(chofer_id: int) -> Optional[dict]:
+    fix = positions.get(chofer_id)
+    if fix is None:
+        return None
+    age = (get_now_arg() - fix["registrado_en"]).total_seconds()
+    return fix if age <= settings.ETA_MAX_FIX_AGE_S else None
+
+
+def _moved_m(a: dict, b: dict) -> float:
+    return haversine_km(a["lat"], a["lng"], b["lat"], b["lng"]) * 1000
+
+
+def _parse_minute(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    hour, _, minute = value.partition(":")
+    return float(int(hour) * 60 + int(minute))
+
+
+class EtaEngine:
+    def __init__(self):
+        self._routes: Dict[int, _Route] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    # --- loading ---
+
+    async def _load(self, db: AsyncSession, chofer_id: int, fecha) -> _Route:
+        stops = (await load_pending_stops(db, fecha, [chofer_id])).get(chofer_id, [])
+        plans = (await db.execute(
+            select(RoutePlan).where(RoutePlan.chofer_id == chofer_id, RoutePlan.fecha == fecha)
+            .order_by(RoutePlan.creado_en.desc())
+        )).scalars().all()
+        # The driver's most recently built plan is the one on their screen
+        secuencia = plans[0].secuencia if plans else []
+
+        # None = yard return
+        ordered = []
+        rest = {(stop_kind(s), s.id): s for s in stops}
+        for p in secuencia:
+            if p["tipo"] == "B":
+                ordered.append(None)
+            elif (p["tipo"], p["id"]) in rest:
+                ordered.append(rest.pop((p["tipo"], p["id"])))
+        # Stops the plan doesn't know yet go last, as in /chofer/hoy
+        pedidos = [s for s in rest.values() if isinstance(s, PedidoIndividual)]
+        frecuentes = [s for s in rest.values() if not isinstance(s, PedidoIndividual)]
+        ordered += sort_manual_then_nearest(pedidos) + sort_manual_then_nearest(frecuentes)
+        planned_by_key = {(p["tipo"], p["id"]): _parse_minute(p.get("llegada")) for p in secuencia}
+
+        depot = get_depot()
+        keys, points, windows, service, planned = [], [], [], [], []
+        for stop in ordered:
+            if stop is None:
+                if depot is None or not keys:
+                    continue
+                keys.append(("B", len(keys)))
+                points.append(depot)
+                windows.append(None)
+                service.append(YARD_RETURN_MINUTES)
+                planned.append(None)
+                continue
+            if stop.lat is None or stop.lng is None:
+                continue # No ETA without coordinates
+            key = (stop_kind(stop), stop.id)
+            keys.append(key)
+            points.append((stop.lat, stop.lng))
+            windows.append(window_for_stop(stop))
+            service.append(estimate_service_minutes(stop.tipo_servicio, getattr(stop, "cantidad", 1)))
+            planned.append(planned_by_key.get(key))
+        route = _Route(chofer_id, fecha, keys, points, windows, service, planned)
+        route.recompute(_fresh_fix(chofer_id))
+        return route
+
+    def _prune(self, fecha):
+        # Only drivers queried today are kept; a lock goes once nobody holds it
+        for chofer_id in [c for c, r in self._routes.items() if r.fecha != fecha]:
+            del self._routes[chofer_id]
+        for chofer_id in [c for c, l in self._locks.items() if c not in self._routes and not l.locked()]:
+            del self._locks[chofer_id]
+
+    def _usable(self, route: Optional[_Route], fecha) -> bool:
+        if route is None or route.stale or route.fecha != fecha:
+            return False
+        # Plans can also change without an event (e.g. a manual re-plan); reload now and then
+        return (get_now_arg() - route.cargado_en).total_seconds() < settings.ETA_RELOAD_S
+
+    async def for_driver(self, db: AsyncSession, chofer_id: int) -> dict:
+        """Current ETAs of the driver's remaining stops, loading their route if needed."""
+        # Plans are keyed by server date, as in /chofer/hoy
+        fecha = datetime.now().date()
+        route = self._routes.get(chofer_id)
+        if not self._usable(route, fecha):
+            self._prune(fecha)
+            lock = self._locks.setdefault(chofer_id, asyncio.Lock())
+            async with lock:
+                route = self._routes.get(chofer_id)
+                if not self._usable(route, fecha):
+                    route = await self._load(db, chofer_id, fecha)
+                    self._routes[chofer_id] = route
+        return route.to_dict()
+
+    async def for_stop(self, db: AsyncSession, chofer_id: int, tipo: str, stop_id: int) -> Optional[dict]:
+        data = await self.for_driver(db, chofer_id)
+        return next((p for p in data["paradas"] if p["tipo"] == tipo and p["id"] == stop_id), None)
+
+    # --- incremental updates ---
+
+    def _on_position(self, fix: dict):
+        route = self._routes.get(fix["chofer_id"])
+        if route is None or route.stale:
+            return
+        fix = {**fix, "registrado_en": datetime.fromisoformat(fix["registrado_en"])}
+        if route.fix is not None and _moved_m(route.fix, fix) < settings.ETA_MOVE_THRESHOLD_M:
+            return
+        route.recompute(fix)
+
+    def _on_event(self, event: dict):
+        tipo = event.get("tipo")
+        if tipo == TipoEvento.POSICION.value:
+            for fix in event["datos"].get("posiciones", []):
+                self._on_position(fix)
+            return
+        # A payment (reported or recorded) also closes the stop
+        closing = (TipoEvento.ESTADO.value, TipoEvento.PAGO_REPORTADO.value, TipoEvento.PAGO_REGISTRADO.value)
+        if tipo in closing and event["recurso"] in ("pedidos", "frecuentes", "ocurrencias"):
+            if event["recurso"] == "pedidos":
+                key = ("P", event["id"])
+            elif event["recurso"] == "frecuentes":
+                key = ("F", event["id"])
+            else:
+                key = ("F", event["datos"].get("frecuente_id"))
+            pending = event["datos"].get("estado") in _STILL_PENDING
+            for chofer_id in event["choferes"]:
+                route = self._routes.get(chofer_id)
+                if route is None or route.stale:
+                    continue
+                if pending:
+                    # Reopened stop: it needs its place in the tour back
+                    if not route.has(key):
+                        route.stale = True
+                    continue
+                # Stop completed (or cancelled): the rest of the tour moves up
+                route.drop(key)
+                route.recompute(_fresh_fix(chofer_id))
+            return
+        if tipo in (TipoEvento.ASIGNACION.value, TipoEvento.RUTA_REORDENADA.value, TipoEvento.PARADA_EDITADA.value):
+            for chofer_id in event["choferes"]:
+                if chofer_id in self._routes:
+                    self._routes[chofer_id].stale = True
+        elif tipo == TipoEvento.RESYNC.value:
+            for route in self._routes.values():
+                route.stale = True
+
+    def start(self):
+        hub.on_event(self._on_event)
+
+    def stop(self):
+        hub.off_event(self._on_event)
+        self._routes.clear()
+        self._locks.clear()
+
+
+eta_engine = EtaEngine()
@@ -0,0 +1,165 @@
+import asyncio
+import json
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+import asyncpg
+from sqlalchemy import select, func, bindparam, Text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.config import settings
+from src.models.enums import TipoEvento
+from src.utils.time_utils import get_now_arg
+
+# Live updates for the driver / dispatch screens. Events go through Postgres
+# NOTIFY so every worker process sees them, and only once the transaction that
+# produced them commits.
+
+# NOTIFY payloads are capped at 8000 bytes
+_MAX_PAYLOAD = 7500
+
+
+def _payload(tipo: TipoEvento, recurso: str, recurso_id: Optional[int],
+             chofer_ids: Iterable[Optional[int]], datos: dict) -> str:
+    event = {
+        "tipo": tipo.value,
+        "recurso": recurso,
+        "id": recurso_id,
+        "choferes": sorted({c for c in chofer_ids if c is not None}),
+        "datos": datos,
+        "ts": get_now_arg().isoformat(),
+    }
+    payload = json.dumps(event, default=str)
+    if len(payload) > _MAX_PAYLOAD:
+        event["datos"] = {"truncado": True}
+        payload = json.dumps(event, default=str)
+    return payload
+
+
+async def publish(db: AsyncSession, tipo: TipoEvento, recurso: str, recurso_id: Optional[int],
+                  chofer_ids: Iterable[Optional[int]] = (), **datos):
+    """
+    Queues an event on the session's transaction; it's delivered on commit and
+    dropped on rollback. `chofer_ids` are the drivers whose screens it concerns.
+    """
+    payload = _payload(tipo, recurso, recurso_id, chofer_ids, datos)
+    await db.execute(select(func.pg_notify(settings.EVENTS_CHANNEL, payload)))
+
+
+async def publish_many(db: AsyncSession, tipo: TipoEvento, recurso: str,
+                       events: List[Tuple[Optional[int], Iterable[Optional[int]], dict]]):
+    """Same as publish for several (recurso_id, chofer_ids, datos) at once, in one statement."""
+    if not events:
+        return
+    payloads = [_payload(tipo, recurso, recurso_id, chofer_ids, datos) for recurso_id, chofer_ids, datos in events]
+    payload = func.unnest(bindparam("payloads", payloads, type_=ARRAY(Text))).column_valued("payload")
+    await db.execute(select(func.pg_notify(settings.EVENTS_CHANNEL, payload)))
+
+
+class Subscriber:
+    """One connected client. chofer_id=None receives everything (staff)."""
+
+    def __init__(self, chofer_id: Optional[int]):
+        self.chofer_id = chofer_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+
+    def wants(self, event: dict) -> bool:
+        if self.chofer_id is None or event["tipo"] == TipoEvento.RESYNC.value:
+            return True
+        # A POSICION event carries the fixes of up to 30 drivers: office only
+        if event["tipo"] == TipoEvento.POSICION.value:
+            return False
+        return self.chofer_id in event["choferes"]
+
+    def push(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too far behind: replace the backlog with a single RESYNC
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_resync_event())
+
+
+def _resync_event() -> dict:
+    return {"tipo": TipoEvento.RESYNC.value, "recurso": None, "id": None, "choferes": [], "datos": {},
+            "ts": get_now_arg().isoformat()}
+
+
+class EventHub:
+    """
+    Per-process fan-out: one dedicated LISTEN connection, many local subscribers.
+    Reconnects with backoff; subscribers get RESYNC after a reconnect since
+    notifications sent meanwhile are gone.
+    """
+
+    def __init__(self):
+        self._subscribers: Set[Subscriber] = set()
+        self._callbacks: List[Callable[[dict], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def on_event(self, callback: Callable[[dict], None]):
+        """In-process hook called with every event received (e.g. to keep a cache current)."""
+        self._callbacks.append(callback)
+
+    def off_event(self, callback: Callable[[dict], None]):
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
+
+    def subscribe(self, chofer_id: Optional[int]) -> Subscriber:
+        sub = Subscriber(chofer_id)
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        self._subscribers.discard(sub)
+
+    def _dispatch(self, event: dict):
+        for callback in self._callbacks:
+            callback(event)
+        for sub in list(self._subscribers):
+            if sub.wants(event):
+                sub.push(event)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+        self._dispatch(event)
+
+    async def _listen_forever(self):
+        dsn = make_url(settings.DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        delay = 1
+        connected_before = False
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(dsn, ssl=False)
+                await conn.add_listener(settings.EVENTS_CHANNEL, self._on_notify)
+                if connected_before:
+                    self._dispatch(_resync_event())
+                connected_before = True
+                delay = 1
+                while not conn.is_closed():
+                    await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Events: listener error: {e}", flush=True)
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen_forever())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+hub = EventHub()
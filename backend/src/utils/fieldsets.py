@@ -0,0 +1,94 @@
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.models.business import Cliente, Pago
+from src.models.geo import Zona
+from src.models.users import Chofer, Usuario
+
+# Sparse list responses: ?fields=id,estado,... picks the row's own columns and
+# ?include=cliente,zona,chofer,pagos adds small related objects. Columns are
+# selected directly and related data comes from outer joins (pagos: one extra
+# query for the whole page), so no ORM objects or relationship loads are involved.
+
+INCLUDES = ("cliente", "zona", "chofer", "pagos")
+
+# Columns of each related object, as in ClienteResumen / ZonaResumen / ChoferResumen
+_CLIENTE = (Cliente.id, Cliente.nombre, Cliente.telefono, Cliente.direccion)
+_ZONA = (Zona.id, Zona.nombre)
+_PAGO = (Pago.id, Pago.monto, Pago.metodo_pago, Pago.fecha, Pago.registrado_por)
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+
+def parse_fieldset(fields: Optional[str], include: Optional[str], schema: type[BaseModel],
+                   default_fields: Sequence[str]) -> Tuple[List[str], Set[str]]:
+    """
+    (columns, includes) from the query string, checked against the row schema.
+    `id` is always returned; without `fields` the schema's default row is used.
+    """
+    allowed = [name for name in schema.model_fields if name not in INCLUDES]
+    campos = _split(fields) or list(default_fields)
+    unknown = sorted(set(campos) - set(allowed))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Campos desconocidos: {unknown}. Válidos: {allowed}")
+    includes = set(_split(include))
+    unknown = sorted(includes - set(INCLUDES))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"include desconocido: {unknown}. Válidos: {list(INCLUDES)}")
+    return ["id"] + [c for c in dict.fromkeys(campos) if c != "id"], includes
+
+
+def sparse_select(model, campos: Sequence[str], includes: Set[str], extra=()):
+    """SELECT of just `campos` (+ `extra` labeled columns) with the joins `includes` needs."""
+    stmt = select(*[getattr(model, c).label(c) for c in campos], *extra)
+    if "cliente" in includes:
+        stmt = stmt.add_columns(*[col.label(f"cliente__{col.key}") for col in _CLIENTE])\
+            .outerjoin(Cliente, model.cliente_id == Cliente.id)
+    if "zona" in includes:
+        stmt = stmt.add_columns(*[col.label(f"zona__{col.key}") for col in _ZONA])\
+            .outerjoin(Zona, model.zona_id == Zona.id)
+    if "chofer" in includes:
+        stmt = stmt.add_columns(Chofer.id.label("chofer__id"), Usuario.nombre.label("chofer__nombre"),
+                                Chofer.patente.label("chofer__patente"))\
+            .outerjoin(Chofer, model.chofer_id == Chofer.id)\
+            .outerjoin(Usuario, Chofer.usuario_id == Usuario.id)
+    return stmt
+
+
+def _nest(row: dict) -> dict:
+    fila: Dict[str, object] = {}
+    for key, value in row.items():
+        if key.startswith("_"):
+            continue
+        rel, sep, attr = key.partition("__")
+        if sep:
+            fila.setdefault(rel, {})[attr] = value
+        else:
+            fila[key] = value
+    for rel in ("cliente", "zona", "chofer"):
+        if rel in fila and fila[rel]["id"] is None:
+            fila[rel] = None # outer join found nothing
+    return fila
+
+
+async def sparse_rows(db: AsyncSession, rows: Sequence[dict], includes: Set[str], pago_fk,
+                      schema: type[BaseModel]) -> List[dict]:
+    """
+    JSON-ready rows with only the requested keys. `pago_fk` is the Pago column
+    pointing at this kind of stop (Pago.pedido_id / Pago.frecuente_id).
+    """
+    filas = [_nest(dict(row)) for row in rows]
+    if "pagos" in includes:
+        pagos: Dict[int, list] = {f["id"]: [] for f in filas}
+        if pagos:
+            stmt = select(pago_fk.label("_owner"), *_PAGO).where(pago_fk.in_(list(pagos))).order_by(Pago.id)
+            for pago in (await db.execute(stmt)).mappings():
+                pago = dict(pago)
+                pagos[pago.pop("_owner")].append(pago)
+        for fila in filas:
+            fila["pagos"] = pagos[fila["id"]]
+    return [schema.model_validate(f).model_dump(mode="json", exclude_unset=True) for f in filas]
@@ -1,4 +1,5 @@
 import math
+from collections import OrderedDict
 
 def calculate_distance(lat1, lng1, lat2, lng2):
     # Haversine or simple Euclidean for small areas?
@@ -39,3 +40,259 @@ def sort_by_nearest_neighbor(items):
         sorted_items.append(valid_items.pop(closest_idx))
         
     return sorted_items + invalid_items
+
+def sort_manual_then_nearest(items):
+    """
+    Manual order first (orden_en_ruta set, ascending), then the rest via
+    nearest neighbor. This is the driver's "current tour".
+    """
+    manual = [i for i in items if i.orden_en_ruta is not None]
+    automatic = [i for i in items if i.orden_en_ruta is None]
+    manual.sort(key=lambda x: x.orden_en_ruta)
+    return manual + sort_by_nearest_neighbor(automatic)
+
+
+EARTH_RADIUS_KM = 6371.0
+# Rural roads are never straight; haversine underestimates the driven distance
+ROAD_FACTOR = 1.3
+# Weight of one minute of lateness vs one minute of driving in the TSPTW objective
+LATE_PENALTY = 20.0
+# Stops that don't fit in the truck even after a yard return (or with no yard configured)
+OVERLOAD_PENALTY = 1000.0
+# Minutes spent at the yard unloading / reloading on a mid-route return
+YARD_RETURN_MINUTES = 15
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def build_matrices(points, speed_kmh):
+    """
+    points: list of (lat, lng).
+    Returns (distance_km, minutes) square matrices using road-corrected haversine.
+    """
+    n = len(points)
+    dist = [[0.0] * n for _ in range(n)]
+    mins = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        lat1, lng1 = points[i]
+        for j in range(i + 1, n):
+            lat2, lng2 = points[j]
+            d = haversine_km(lat1, lng1, lat2, lng2) * ROAD_FACTOR
+            dist[i][j] = dist[j][i] = d
+            mins[i][j] = mins[j][i] = d / speed_kmh * 60.0
+    return dist, mins
+
+
+# Matrices kept by cached_matrices, bounded by their total n² (each cell is two
+# boxed floats, ~64 bytes) rather than by count: one 300-stop day weighs as much
+# as ninety 30-stop ones.
+MATRIX_CACHE_MAX_CELLS = 500_000
+_matrix_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_matrix_cache_cells = 0
+
+
+def cached_matrices(points, speed_kmh):
+    """
+    build_matrices memoized on the point set, for callers that evaluate many
+    scenarios over the same day's stops. The result is shared: don't mutate it.
+    Least recently used matrices are evicted past MATRIX_CACHE_MAX_CELLS.
+    """
+    global _matrix_cache_cells
+    key = (tuple((round(lat, 6), round(lng, 6)) for lat, lng in points), float(speed_kmh))
+    hit = _matrix_cache.get(key)
+    if hit is not None:
+        _matrix_cache.move_to_end(key)
+        return hit
+    result = build_matrices(points, speed_kmh)
+    cells = len(points) ** 2
+    if cells > MATRIX_CACHE_MAX_CELLS:
+        return result # Too big to keep at all
+    while _matrix_cache and _matrix_cache_cells + cells > MATRIX_CACHE_MAX_CELLS:
+        old_key, _ = _matrix_cache.popitem(last=False)
+        _matrix_cache_cells -= len(old_key[0]) ** 2
+    _matrix_cache[key] = result
+    _matrix_cache_cells += cells
+    return result
+
+
+def _exceeds(load, extra, capacity):
+    return any(
+        tipo in capacity and load.get(tipo, 0) + qty > capacity[tipo]
+        for tipo, qty in extra.items()
+    )
+
+
+def evaluate_route(order, dist, mins, windows, service, start_minute, origin=None, loads=None, capacity=None):
+    """
+    Simulates driving `order` (indices into the matrices) starting at `origin`
+    (matrix index or None to start directly at the first stop) at `start_minute`.
+    Waits when arriving before a window opens.
+
+    With `loads` ({tipo_servicio: units} per matrix index) and `capacity`
+    ({tipo_servicio: max units}, missing tipos are unlimited) the truck goes back
+    to `origin` (the yard) before a stop that would overflow it. Stops that can't
+    fit even then are counted in "sobrecargas".
+    """
+    clock = float(start_minute)
+    distance = 0.0
+    arrivals = []
+    lateness = []
+    returns = []
+    overloads = 0
+    load = {}
+    prev = origin
+    for pos, idx in enumerate(order):
+        extra = loads[idx] if (loads and capacity) else None
+        if extra and _exceeds(load, extra, capacity):
+            if origin is not None and prev is not None and prev != origin:
+                distance += dist[prev][origin]
+                clock += mins[prev][origin] + YARD_RETURN_MINUTES
+                prev = origin
+                returns.append(pos)
+                load = {}
+            if _exceeds(load, extra, capacity):
+                overloads += 1
+        if extra:
+            for tipo, qty in extra.items():
+                load[tipo] = load.get(tipo, 0) + qty
+        if prev is not None:
+            distance += dist[prev][idx]
+            clock += mins[prev][idx]
+        window = windows[idx]
+        if window and clock < window[0]:
+            clock = float(window[0])
+        arrivals.append(clock)
+        late = max(0.0, clock - window[1]) if window else 0.0
+        lateness.append(late)
+        clock += service[idx]
+        prev = idx
+    return {
+        "llegadas": arrivals,
+        "tardanzas": lateness,
+        "distancia_km": distance,
+        "fin": clock,
+        "duracion_min": clock - start_minute,
+        "regresos": returns, # positions in `order` preceded by a yard return
+        "sobrecargas": overloads,
+    }
+
+
+def route_cost(ev):
+    return ev["duracion_min"] + LATE_PENALTY * sum(ev["tardanzas"]) + OVERLOAD_PENALTY * ev["sobrecargas"]
+
+
+def solve_tsptw(dist, mins, windows, service, start_minute, origin=None, stops=None, max_passes=50,
+                loads=None, capacity=None):
+    """
+    TSP with time windows over matrix indices `stops` (defaults to every index
+    except `origin`). Builds the route by cheapest insertion in window-deadline
+    order, then improves it with or-opt moves and 2-opt reversals under a
+    cost of total time plus weighted lateness (including yard returns when
+    `loads` / `capacity` are given, see evaluate_route).
+    Returns the evaluation dict of the best route plus "orden".
+    """
+    def _route_cost(candidate):
+        ev = evaluate_route(candidate, dist, mins, windows, service, start_minute, origin, loads, capacity)
+        return route_cost(ev), ev
+
+    if stops is None:
+        stops = [i for i in range(len(dist)) if i != origin]
+    if not stops:
+        ev = evaluate_route([], dist, mins, windows, service, start_minute, origin)
+        ev["orden"] = []
+        return ev
+
+    def deadline(i):
+        w = windows[i]
+        return (w[1], w[0]) if w else (float("inf"), float("inf"))
+
+    order = []
+    for idx in sorted(stops, key=deadline):
+        best_cost, best_pos = None, 0
+        for pos in range(len(order) + 1):
+            candidate = order[:pos] + [idx] + order[pos:]
+            cost, _ = _route_cost(candidate)
+            if best_cost is None or cost < best_cost:
+                best_cost, best_pos = cost, pos
+        order.insert(best_pos, idx)
+
+    best_cost, best_ev = _route_cost(order)
+    n = len(order)
+    for _ in range(max_passes):
+        improved = False
+        # Or-opt: relocate segments of 1..3 stops
+        for seg_len in (1, 2, 3):
+            for i in range(n - seg_len + 1):
+                segment = order[i:i + seg_len]
+                rest = order[:i] + order[i + seg_len:]
+                for j in range(len(rest) + 1):
+                    if j == i:
+                        continue
+                    candidate = rest[:j] + segment + rest[j:]
+                    cost, ev = _route_cost(candidate)
+                    if cost < best_cost - 1e-9:
+                        order, best_cost, best_ev = candidate, cost, ev
+                        improved = True
+                        break
+                if improved:
+                    break
+            if improved:
+                break
+        if improved:
+            continue
+        # 2-opt
+        for i in range(n - 1):
+            for j in range(i + 1, n):
+                candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                cost, ev = _route_cost(candidate)
+                if cost < best_cost - 1e-9:
+                    order, best_cost, best_ev = candidate, cost, ev
+                    improved = True
+                    break
+            if improved:
+                break
+        if not improved:
+            break
+
+    best_ev["orden"] = order
+    return best_ev
+
+
+def stop_load(item):
+    """Units a stop puts on the truck: `cantidad` for recurring services, 1 for orders."""
+    return {item.tipo_servicio: getattr(item, "cantidad", None) or 1}
+
+
+def cheapest_insertion(tour, point, origin=None):
+    """
+    O(n) cheapest position to insert `point` into `tour` (list of (lat, lng)),
+    optionally starting from `origin`. Returns (extra_km, position).
+    """
+    if not tour:
+        extra = haversine_km(*origin, *point) * ROAD_FACTOR if origin else 0.0
+        return extra, 0
+
+    def d(a, b):
+        return haversine_km(a[0], a[1], b[0], b[1]) * ROAD_FACTOR
+
+    # Before the first stop
+    if origin:
+        best = (d(origin, point) + d(point, tour[0]) - d(origin, tour[0]), 0)
+    else:
+        best = (d(point, tour[0]), 0)
+    for pos in range(1, len(tour)):
+        a, b = tour[pos - 1], tour[pos]
+        delta = d(a, point) + d(point, b) - d(a, b)
+        if delta < best[0]:
+            best = (delta, pos)
+    # After the last stop (open tour)
+    tail = d(tour[-1], point)
+    if tail < best[0]:
+        best = (tail, len(tour))
+    return best
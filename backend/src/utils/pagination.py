@@ -0,0 +1,34 @@
+from datetime import datetime
+from typing import Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, tuple_
+
+# Keyset pagination over (nullable datetime, id), newest first. Rows without a
+# date come first (that's where DESC puts NULLs in Postgres), so a plain
+# (fecha, id) btree index read backwards serves every page.
+
+
+def make_keyset(fecha: Optional[datetime], row_id: int) -> str:
+    return f"{fecha.isoformat() if fecha else ''}~{row_id}"
+
+
+def parse_keyset(cursor: str) -> Tuple[Optional[datetime], int]:
+    """(fecha, id) of a cursor from make_keyset; 400 if it's malformed."""
+    try:
+        fecha, row_id = cursor.split("~", 1)
+        return (datetime.fromisoformat(fecha) if fecha else None), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def after_keyset(fecha_col, id_col, cursor: str):
+    """Predicate for the rows following `cursor` in (fecha DESC NULLS FIRST, id DESC) order."""
+    fecha, row_id = parse_keyset(cursor)
+    if fecha is None:
+        return or_(and_(fecha_col == None, id_col < row_id), fecha_col != None)
+    # Row comparison: Postgres turns it into a single index range condition
+    return tuple_(fecha_col, id_col) < tuple_(fecha, row_id)
+
+
+def keyset_order(fecha_col, id_col):
+    return fecha_col.desc().nulls_first(), id_col.desc()
@@ -0,0 +1,197 @@
+import asyncio
+import json
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import insert, select, func, text
+from src.config import settings
+from src.db import engine
+from src.models.enums import TipoEvento
+from src.models.tracking import PosicionChofer
+from src.utils.events import hub
+from src.utils.time_utils import get_now_arg
+
+logger = logging.getLogger(__name__)
+
+# GPS ingestion: POST /chofer/posiciones only appends to an in-memory buffer;
+# a background task writes it with one multi-row INSERT every
+# POSITION_FLUSH_INTERVAL_S and then NOTIFYs the newest fix per driver, so every
+# worker keeps the same latest-position map for the dispatch map.
+
+
+# Drivers per NOTIFY (~200 bytes each)
+_NOTIFY_CHUNK = 30
+
+
+def _month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def _add_months(d: date, months: int) -> date:
+    total = d.year * 12 + d.month - 1 + months
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f"posicion_chofer_{month:%Y_%m}"
+
+
+async def ensure_partitions():
+    """Partitions for this month and the next; drops the ones past retention."""
+    this_month = _month_start(get_now_arg().date())
+    async with engine.begin() as conn:
+        for offset in (0, 1):
+            start = _add_months(this_month, offset)
+            end = _add_months(start, 1)
+            await conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {_partition_name(start)} PARTITION OF posicion_chofer "
+                f"FOR VALUES FROM ('{start}') TO ('{end}')"
+            ))
+        oldest = _add_months(this_month, -settings.POSITION_RETENTION_MONTHS)
+        rows = await conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'posicion_chofer'"
+        ))
+        for (name,) in rows:
+            try:
+                month = datetime.strptime(name[len("posicion_chofer_"):], "%Y_%m").date()
+            except ValueError:
+                continue # posicion_chofer_default
+            if month < oldest:
+                await conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+
+
+class PositionBuffer:
+    def __init__(self):
+        self._pending: List[dict] = []
+        self._latest: Dict[int, dict] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    # --- latest positions (dispatch map) ---
+
+    def _remember(self, fix: dict):
+        current = self._latest.get(fix["chofer_id"])
+        if current is None or fix["registrado_en"] >= current["registrado_en"]:
+            self._latest[fix["chofer_id"]] = fix
+
+    def get(self, chofer_id: int) -> Optional[dict]:
+        return self._latest.get(chofer_id)
+
+    def latest(self) -> List[dict]:
+        return sorted(self._latest.values(), key=lambda f: f["chofer_id"])
+
+    def _on_event(self, event: dict):
+        # Fixes flushed by any worker (including this one)
+        if event.get("tipo") != TipoEvento.POSICION.value:
+            return
+        for fix in event["datos"].get("posiciones", []):
+            fix = {**fix, "registrado_en": datetime.fromisoformat(fix["registrado_en"])}
+            self._remember(fix)
+
+    async def load_latest(self, horas: int = 12):
+        """Warm the map after a restart from the last `horas` of fixes."""
+        desde = get_now_arg() - timedelta(hours=horas)
+        stmt = select(
+            PosicionChofer.chofer_id, PosicionChofer.lat, PosicionChofer.lng, PosicionChofer.velocidad_kmh,
+            PosicionChofer.rumbo, PosicionChofer.precision_m, PosicionChofer.registrado_en
+        ).where(PosicionChofer.registrado_en >= desde)\
+            .distinct(PosicionChofer.chofer_id)\
+            .order_by(PosicionChofer.chofer_id, PosicionChofer.registrado_en.desc())
+        async with engine.connect() as conn:
+            for row in (await conn.execute(stmt)).mappings():
+                self._remember(dict(row))
+
+    # --- ingestion ---
+
+    def add(self, chofer_id: int, fixes: List[dict]):
+        recibido_en = get_now_arg()
+        for fix in fixes:
+            row = {**fix, "chofer_id": chofer_id, "recibido_en": recibido_en}
+            self._pending.append(row)
+        overflow = len(self._pending) - settings.POSITION_BUFFER_MAX
+        if overflow > 0:
+            del self._pending[:overflow]
+            logger.warning("Positions: buffer full, dropped the %d oldest fixes", overflow)
+        if len(self._pending) >= settings.POSITION_FLUSH_BATCH:
+            self._wake.set()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        newest: Dict[int, dict] = {}
+        for row in batch:
+            if row["chofer_id"] not in newest or row["registrado_en"] >= newest[row["chofer_id"]]["registrado_en"]:
+                newest[row["chofer_id"]] = row
+        posiciones = [
+            {k: row[k] for k in ("chofer_id", "lat", "lng", "velocidad_kmh", "rumbo", "precision_m", "registrado_en")}
+            for row in newest.values()
+        ]
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(insert(PosicionChofer), batch)
+                # Several NOTIFYs when the fleet is large: payloads are capped at 8000 bytes
+                for start in range(0, len(posiciones), _NOTIFY_CHUNK):
+                    chunk = posiciones[start:start + _NOTIFY_CHUNK]
+                    event = {"tipo": TipoEvento.POSICION.value, "recurso": "posiciones", "id": None,
+                             "choferes": [p["chofer_id"] for p in chunk], "datos": {"posiciones": chunk},
+                             "ts": get_now_arg().isoformat()}
+                    await conn.execute(select(func.pg_notify(settings.EVENTS_CHANNEL, json.dumps(event, default=str))))
+        except BaseException:
+            # Keep them for the next attempt (bounded by POSITION_BUFFER_MAX), also when cancelled
+            self._pending = batch + self._pending
+            del self._pending[:max(len(self._pending) - settings.POSITION_BUFFER_MAX, 0)]
+            raise
+
+    async def _run(self):
+        last_partition_check = None
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), settings.POSITION_FLUSH_INTERVAL_S)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            today = get_now_arg().date()
+            if last_partition_check != today:
+                # Once a day, even if it fails: the DEFAULT partition takes the fixes meanwhile
+                last_partition_check = today
+                try:
+                    await ensure_partitions()
+                except Exception:
+                    logger.exception("Positions: partition maintenance failed")
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Positions: flush failed (%d pending)", len(self._pending))
+
+    async def start(self):
+        if self._task is not None:
+            return
+        hub.on_event(self._on_event)
+        try:
+            await ensure_partitions()
+            await self.load_latest()
+        except Exception:
+            logger.exception("Positions: startup warm-up failed")
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            # Let a flush in progress finish instead of cancelling it halfway
+            self._stopping = True
+            self._wake.set()
+            try:
+                await asyncio.wait_for(self._task, settings.POSITION_FLUSH_INTERVAL_S * 5)
+            except asyncio.TimeoutError:
+                pass # Cancelled by wait_for; flush() put its batch back
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Positions: final flush failed, %d fixes lost", len(self._pending))
+
+
+positions = PositionBuffer()
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import select, delete, update, values, column, cast, Integer
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.config import settings
+from src.models.business import ServicioFrecuente, ServicioOcurrencia
+from src.models.enums import EstadoFrecuente, EstadoOcurrencia
+from src.utils.time_utils import get_now_arg
+
+# Contracts in these states don't get new visits
+STOPPED_FRECUENTE = [EstadoFrecuente.PAUSADO, EstadoFrecuente.FINALIZADO]
+
+# Daily state of the contract -> state of today's visit
+VISIT_STATE = {
+    EstadoFrecuente.ACTIVO: EstadoOcurrencia.PROGRAMADA,
+    EstadoFrecuente.EN_CAMINO: EstadoOcurrencia.EN_CAMINO,
+    EstadoFrecuente.COMPLETADA: EstadoOcurrencia.COMPLETADA,
+    EstadoFrecuente.PAGO_PENDIENTE: EstadoOcurrencia.PAGO_PENDIENTE,
+}
+
+_INSERT_CHUNK = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def horizon(hoy: Optional[date] = None):
+    hoy = hoy or get_now_arg().date()
+    return hoy, hoy + timedelta(days=settings.OCCURRENCE_HORIZON_DAYS)
+
+
+def occurrence_dates(frecuente: ServicioFrecuente, desde: date, hasta: date) -> List[date]:
+    """Visit dates of the contract in [desde, hasta], from dias_mask and its validity range."""
+    if frecuente.estado in STOPPED_FRECUENTE or not frecuente.dias_mask:
+        return []
+    if frecuente.fecha_inicio and frecuente.fecha_inicio.date() > desde:
+        desde = frecuente.fecha_inicio.date()
+    if frecuente.fecha_fin and frecuente.fecha_fin.date() < hasta:
+        hasta = frecuente.fecha_fin.date()
+    fechas = []
+    day = desde
+    while day <= hasta:
+        if frecuente.dias_mask & (1 << day.weekday()):
+            fechas.append(day)
+        day += timedelta(days=1)
+    return fechas
+
+
+def _row(frecuente: ServicioFrecuente, fecha: date) -> dict:
+    return {
+        "frecuente_id": frecuente.id,
+        "fecha": fecha,
+        "chofer_id": frecuente.chofer_id,
+        "estado": EstadoOcurrencia.PROGRAMADA,
+        "monto": (frecuente.costo_individual or 0.0) * (frecuente.cantidad or 1),
+        "actualizado_en": get_now_arg(),
+    }
+
+
+async def _insert_missing(db: AsyncSession, rows: List[dict]):
+    for start in range(0, len(rows), _INSERT_CHUNK):
+        stmt = insert(ServicioOcurrencia).values(rows[start:start + _INSERT_CHUNK])
+        await db.execute(stmt.on_conflict_do_nothing(constraint="uq_ocurrencia_frecuente_fecha"))
+
+
+async def sync_occurrences(db: AsyncSession, frecuente: ServicioFrecuente):
+    """
+    Brings the contract's upcoming visits (today .. horizon) in line with its rule:
+    adds missing dates, drops dates that no longer apply and refreshes driver and
+    amount. Visits already started, done or paid are never touched. Does not commit.
+    """
+    desde, hasta = horizon()
+    wanted = set(occurrence_dates(frecuente, desde, hasta))
+    stmt = select(ServicioOcurrencia).where(
+        ServicioOcurrencia.frecuente_id == frecuente.id,
+        ServicioOcurrencia.fecha >= desde
+    )
+    existing = (await db.execute(stmt)).scalars().all()
+
+    monto = (frecuente.costo_individual or 0.0) * (frecuente.cantidad or 1)
+    obsolete = []
+    for ocurrencia in existing:
+        if ocurrencia.estado != EstadoOcurrencia.PROGRAMADA or ocurrencia.pago_id is not None:
+            continue
+        if ocurrencia.fecha not in wanted:
+            obsolete.append(ocurrencia.id)
+        else:
+            ocurrencia.chofer_id = frecuente.chofer_id
+            ocurrencia.monto = monto
+    if obsolete:
+        await db.execute(delete(ServicioOcurrencia).where(ServicioOcurrencia.id.in_(obsolete)))
+
+    have = {o.fecha for o in existing}
+    await _insert_missing(db, [_row(frecuente, f) for f in sorted(wanted - have)])
+
+
+async def reassign_upcoming(db: AsyncSession, choferes: Dict[int, Optional[int]]):
+    """
+    {frecuente_id: chofer_id}: moves the contracts' upcoming visits to their new
+    driver in one UPDATE (same rule as sync_occurrences: only visits not started
+    nor paid). Does not commit.
+    """
+    if not choferes:
+        return
+    nuevos = values(column("frecuente_id", Integer), column("chofer_id", Integer), name="nuevo_chofer")\
+        .data(list(choferes.items()))
+    await db.execute(
+        update(ServicioOcurrencia)
+        .where(
+            ServicioOcurrencia.frecuente_id == nuevos.c.frecuente_id,
+            ServicioOcurrencia.fecha >= get_now_arg().date(),
+            ServicioOcurrencia.estado == EstadoOcurrencia.PROGRAMADA,
+            ServicioOcurrencia.pago_id == None
+        )
+        .values(chofer_id=cast(nuevos.c.chofer_id, Integer), actualizado_en=get_now_arg())
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def extend_horizon(db: AsyncSession) -> int:
+    """
+    Generates the missing visits of every running contract up to the horizon
+    (idempotent; existing rows are left alone). Commits. Returns the contracts scanned.
+    """
+    desde, hasta = horizon()
+    stmt = select(ServicioFrecuente).where(
+        ServicioFrecuente.estado.not_in(STOPPED_FRECUENTE),
+        ServicioFrecuente.dias_mask != 0,
+        (ServicioFrecuente.fecha_fin == None) | (ServicioFrecuente.fecha_fin >= desde)
+    )
+    frecuentes = (await db.execute(stmt)).scalars().all()
+    rows = [_row(f, fecha) for f in frecuentes for fecha in occurrence_dates(f, desde, hasta)]
+    await _insert_missing(db, rows)
+    await db.commit()
+    return len(frecuentes)
+
+
+async def mark_today(db: AsyncSession, frecuente_ids: Iterable[int], estado: EstadoOcurrencia,
+                     pago_id: Optional[int] = None):
+    """Mirrors a same-day state change of the contracts on today's visit. Does not commit."""
+    ids = list(frecuente_ids)
+    if not ids:
+        return
+    cambios = {"estado": estado, "actualizado_en": get_now_arg()}
+    if pago_id is not None:
+        cambios["pago_id"] = pago_id
+    await db.execute(
+        update(ServicioOcurrencia)
+        .where(ServicioOcurrencia.frecuente_id.in_(ids), ServicioOcurrencia.fecha == get_now_arg().date())
+        .values(**cambios)
+    )
+
+
+async def occurrence_worker(session_factory, every_hours: float = 12):
+    """Background loop keeping the calendar filled up to the horizon."""
+    while True:
+        try:
+            async with session_factory() as db:
+                scanned = await extend_horizon(db)
+                logger.info("Occurrences: horizon extended for %d contracts", scanned)
+        except Exception:
+            logger.exception("Occurrences: horizon extension failed")
+        await asyncio.sleep(every_hours * 3600)
@@ -0,0 +1,86 @@
+from typing import Optional
+from sqlalchemy import inspect, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+from src.models.business import Cliente, Pago, PedidoIndividual
+from src.models.geo import Zona
+from src.models.users import Chofer, Usuario
+
+# Write endpoints answer with PedidoRead / FrecuenteRead. Instead of reloading
+# the row after the commit (refresh + a SELECT with four selectinloads), the
+# row they just wrote gets its related objects attached here: whatever the
+# session already holds (e.g. the zones find_zone_for_point loaded) is reused
+# and the rest comes in a single SELECT.
+
+
+def _current(item, attr: str, fk: Optional[int]) -> bool:
+    """The relationship is loaded and still matches its foreign key."""
+    if attr in inspect(item).unloaded:
+        return False
+    value = inspect(item).attrs[attr].loaded_value
+    return (value.id if value is not None else None) == fk
+
+
+def _in_session(db: AsyncSession, model, pk: int):
+    return db.identity_map.get(identity_key(model, pk))
+
+
+async def attach_related(db: AsyncSession, item):
+    """
+    Sets cliente, zona and chofer (with its usuario) on an order or contract,
+    plus pagos for orders, issuing at most one SELECT. Relationships already
+    loaded and still matching their foreign key are kept. Never marks anything
+    dirty, so it can run right before the commit.
+    """
+    joins = [] # (attr, model, onclause), fetched together below
+    for attr, model, fk in (("cliente", Cliente, item.cliente_id), ("zona", Zona, item.zona_id),
+                            ("chofer", Chofer, item.chofer_id)):
+        if _current(item, attr, fk):
+            continue
+        found = _in_session(db, model, fk) if fk is not None else None
+        if fk is None or found is not None:
+            set_committed_value(item, attr, found)
+        else:
+            joins.append((attr, model, model.id == fk))
+
+    if joins and joins[-1][0] == "chofer":
+        joins.append(("usuario", Usuario, Usuario.id == Chofer.usuario_id))
+    else:
+        chofer = inspect(item).attrs.chofer.loaded_value
+        if chofer is not None and not _current(chofer, "usuario", chofer.usuario_id):
+            usuario = _in_session(db, Usuario, chofer.usuario_id)
+            if usuario is not None:
+                set_committed_value(chofer, "usuario", usuario)
+            else:
+                joins.append(("usuario", Usuario, Usuario.id == chofer.usuario_id))
+
+    if isinstance(item, PedidoIndividual):
+        if "pagos" in inspect(item).unloaded:
+            if item.id is None:
+                set_committed_value(item, "pagos", []) # Not inserted yet
+            else:
+                joins.append(("pagos", Pago, Pago.pedido_id == item.id))
+
+    if joins:
+        # Every missing object as a LEFT JOIN off a constant: one row, or one
+        # per payment when those are needed too
+        stmt = select(*[model for _, model, _ in joins])\
+            .select_from(select(literal(1).label("uno")).subquery())
+        for _, model, onclause in joins:
+            stmt = stmt.outerjoin(model, onclause)
+        if any(model is Zona for _, model, _ in joins):
+            stmt = stmt.options(load_only(Zona.id, Zona.nombre)) # Embedded as ZonaResumen
+        if joins[-1][0] == "pagos":
+            stmt = stmt.order_by(Pago.id)
+        rows = (await db.execute(stmt)).all()
+        found = dict(zip([attr for attr, _, _ in joins], rows[0]))
+        for attr in ("cliente", "zona", "chofer"):
+            if attr in found:
+                set_committed_value(item, attr, found[attr])
+        chofer = inspect(item).attrs.chofer.loaded_value
+        if "usuario" in found and chofer is not None:
+            set_committed_value(chofer, "usuario", found["usuario"])
+        if "pagos" in found:
+            set_committed_value(item, "pagos", [row[-1] for row in rows if row[-1] is not None])
@@ -0,0 +1,103 @@
+import hashlib
+import json
+from typing import List, Optional, Tuple
+import httpx
+from src.config import settings
+from src.utils.optimization import build_matrices
+from src.utils.time_windows import format_clock
+
+
+def encode_polyline(points: List[Tuple[float, float]], precision: int = 5) -> str:
+    """Google encoded polyline of (lat, lng) points (same format OSRM returns)."""
+    factor = 10 ** precision
+    chunks = []
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        ilat, ilng = int(round(lat * factor)), int(round(lng * factor))
+        for delta in (ilat - prev_lat, ilng - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            chunks.append(chr(value + 63))
+        prev_lat, prev_lng = ilat, ilng
+    return "".join(chunks)
+
+
+def sequence_hash(waypoints: List[dict]) -> str:
+    """Identifies a stop sequence: same stops, same order, same coordinates."""
+    key = [[w["tipo"], w["id"], round(w["lat"], 6), round(w["lng"], 6)] for w in waypoints]
+    return hashlib.sha256(json.dumps(key, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+async def fetch_osrm_route(points: List[Tuple[float, float]]):
+    """
+    Road geometry from OSRM. Returns (encoded polyline, [(metros, segundos)] per leg)
+    or None if OSRM isn't configured, is unreachable or can't route the points.
+    """
+    if not settings.OSRM_URL:
+        return None
+    coords = ";".join(f"{lng:.6f},{lat:.6f}" for lat, lng in points)
+    url = f"{settings.OSRM_URL.rstrip('/')}/route/v1/driving/{coords}"
+    async with httpx.AsyncClient(timeout=settings.OSRM_TIMEOUT_S) as client:
+        try:
+            response = await client.get(url, params={"overview": "full", "geometries": "polyline", "steps": "false"})
+            data = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"OSRM route error: {e}")
+            return None
+    if data.get("code") != "Ok" or not data.get("routes"):
+        return None
+    route = data["routes"][0]
+    return route["geometry"], [(leg["distance"], leg["duration"]) for leg in route["legs"]]
+
+
+def estimated_route(points: List[Tuple[float, float]]):
+    """Fallback without OSRM: straight segments, road-corrected haversine legs."""
+    dist, mins = build_matrices(points, settings.ROUTE_AVG_SPEED_KMH)
+    legs = [(dist[i][i + 1] * 1000, mins[i][i + 1] * 60) for i in range(len(points) - 1)]
+    return encode_polyline(points), legs
+
+
+async def build_route_geometry(waypoints: List[dict], windows: List[Optional[Tuple[int, int]]],
+                               service: List[int], start_minute: int):
+    """
+    waypoints: [{"tipo", "id", "lat", "lng"}] in driving order (the yard, if any, first).
+    windows / service: aligned with waypoints, used to accumulate ETAs the same way
+    evaluate_route does (wait for the window to open, then stay on site).
+    """
+    points = [(w["lat"], w["lng"]) for w in waypoints]
+    fuente = "osrm"
+    result = await fetch_osrm_route(points) if len(points) > 1 else None
+    if result is None or len(result[1]) != len(points) - 1:
+        fuente = "estimada"
+        result = estimated_route(points)
+    polyline, legs = result
+
+    tramos = []
+    clock = float(start_minute)
+    if waypoints:
+        clock += service[0]
+    for i, (metros, segundos) in enumerate(legs, start=1):
+        clock += segundos / 60.0
+        llegada = clock
+        if windows[i] and clock < windows[i][0]:
+            clock = windows[i][0]
+        clock += service[i]
+        tramos.append({
+            "tipo": waypoints[i]["tipo"],
+            "id": waypoints[i]["id"],
+            "distancia_m": int(round(metros)),
+            "duracion_s": int(round(segundos)),
+            "llegada": format_clock(llegada),
+        })
+
+    return {
+        "hash": sequence_hash(waypoints),
+        "fuente": fuente,
+        "salida": format_clock(start_minute),
+        "polyline": polyline,
+        "distancia_km": round(sum(m for m, _ in legs) / 1000, 2),
+        "duracion_min": round(clock - start_minute, 1),
+        "tramos": tramos,
+    }
@@ -0,0 +1,181 @@
+from src.utils.dispatch import partition_stops, solve_vrp
+from src.utils.optimization import build_matrices, evaluate_route, solve_tsptw, sort_manual_then_nearest
+from src.utils.time_windows import format_clock
+
+# Entry points executed in the compute pool (see compute_pool.run_in_pool).
+# They only take and return plain data so the payload pickles small and fast.
+
+
+class _Stop:
+    """Lightweight stand-in for an order / recurring service inside a worker."""
+    __slots__ = ("tipo", "id", "lat", "lng", "orden_en_ruta", "ventana", "servicio", "carga", "hecha")
+
+    def __init__(self, tipo, id, lat, lng, orden_en_ruta, ventana, servicio, carga, hecha):
+        self.tipo = tipo
+        self.id = id
+        self.lat = lat
+        self.lng = lng
+        self.orden_en_ruta = orden_en_ruta
+        self.ventana = tuple(ventana) if ventana else None
+        self.servicio = servicio
+        self.carga = carga
+        self.hecha = hecha
+
+
+def _window_label(window):
+    return f"{format_clock(window[0])}-{format_clock(window[1])}" if window else None
+
+
+def _matrix_inputs(stops, depot):
+    points = [(s.lat, s.lng) for s in stops]
+    windows = [s.ventana for s in stops]
+    service = [s.servicio for s in stops]
+    loads = [s.carga for s in stops]
+    origin = None
+    if depot is not None:
+        points.append(tuple(depot))
+        windows.append(None)
+        service.append(0)
+        loads.append(None)
+        origin = len(points) - 1
+    return points, windows, service, loads, origin
+
+
+def solve_day_sequence(payload: dict):
+    """
+    payload: {"modo", "start_minute", "speed_kmh", "depot", "capacity",
+              "stops": [[tipo, id, lat, lng, orden_en_ruta, ventana, servicio, carga, hecha], ...]}
+    with stops listed individual orders first, then recurring services.
+    - "cercania": manual order then nearest neighbor, individual orders first.
+    - "ventanas": a single TSPTW over pending stops of both kinds.
+    - "fijo": the stops in the order given (an insertion already placed them).
+    Completed stops are kept at the end of their kind. Yard returns show up as
+    {"tipo": "B"} entries. Returns (secuencia, distancia_km, duracion_min).
+    """
+    stops = [_Stop(*s) for s in payload["stops"]]
+    start_minute = payload["start_minute"]
+    depot = payload["depot"]
+    capacity = payload["capacity"]
+    speed_kmh = payload["speed_kmh"]
+    pedidos = [s for s in stops if s.tipo == "P"]
+    frecuentes = [s for s in stops if s.tipo == "F"]
+
+    if payload["modo"] == "ventanas":
+        pendientes = [s for s in stops if not s.hecha]
+        located = [s for s in pendientes if s.lat is not None and s.lng is not None]
+        unlocated = [s for s in pendientes if s.lat is None or s.lng is None]
+        ruta = []
+        if located:
+            points, windows, service, loads, origin = _matrix_inputs(located, depot)
+            dist, mins = build_matrices(points, speed_kmh)
+            result = solve_tsptw(dist, mins, windows, service, start_minute, origin=origin,
+                                 loads=loads, capacity=capacity)
+            ruta = [located[idx] for idx in result["orden"]]
+        ordered = ruta + unlocated + [s for s in pedidos if s.hecha] + [s for s in frecuentes if s.hecha]
+    elif payload["modo"] == "fijo":
+        ordered = [s for s in stops if not s.hecha] + [s for s in stops if s.hecha]
+    else:
+        ordered = sort_manual_then_nearest(pedidos) + sort_manual_then_nearest(frecuentes)
+
+    located = [s for s in ordered if not s.hecha and s.lat is not None and s.lng is not None]
+    points, windows, service, loads, origin = _matrix_inputs(located, depot)
+    dist, mins = build_matrices(points, speed_kmh)
+    ev = evaluate_route(list(range(len(located))), dist, mins, windows, service, start_minute, origin,
+                        loads=loads, capacity=capacity)
+
+    eta = {id(s): pos for pos, s in enumerate(located)}
+    regresos = set(ev["regresos"])
+    secuencia = []
+    for s in ordered:
+        pos = eta.get(id(s))
+        if pos in regresos:
+            secuencia.append({"tipo": "B", "id": 0, "llegada": None, "ventana": None, "minutos_tarde": 0})
+        parada = {"tipo": s.tipo, "id": s.id, "llegada": None, "ventana": None, "minutos_tarde": 0}
+        if pos is not None:
+            parada["llegada"] = format_clock(ev["llegadas"][pos])
+            parada["ventana"] = _window_label(windows[pos])
+            parada["minutos_tarde"] = int(round(ev["tardanzas"][pos]))
+        secuencia.append(parada)
+    return secuencia, ev["distancia_km"], ev["duracion_min"]
+
+
+def solve_tour_order(payload: dict):
+    """
+    payload: {"start_minute", "speed_kmh", "depot", "capacity",
+              "stops": [[tipo, id, lat, lng, orden_en_ruta, ventana, servicio, carga, hecha], ...]}
+    with every stop located. TSPTW over them (yard returns when the truck has a
+    capacity and there's a depot). Returns the stop positions in driving order.
+    """
+    stops = [_Stop(*s) for s in payload["stops"]]
+    points, windows, service, loads, origin = _matrix_inputs(stops, payload["depot"])
+    dist, mins = build_matrices(points, payload["speed_kmh"])
+    result = solve_tsptw(dist, mins, windows, service, payload["start_minute"], origin=origin,
+                         loads=loads, capacity=payload["capacity"])
+    return result["orden"]
+
+
+def solve_dispatch(payload: dict):
+    """
+    payload: {"points", "windows", "service", "loads", "vehicles", "stops",
+              "start_minute", "speed_kmh", "origin"} as for solve_vrp.
+    Builds the matrices in the worker and returns the routes with their
+    evaluation: {"rutas": [{"orden", "llegadas", "tardanzas", "regresos",
+    "distancia_km", "duracion_min"}], "sin_asignar": [idx]}.
+    """
+    points = [tuple(p) for p in payload["points"]]
+    windows = [tuple(w) if w else None for w in payload["windows"]]
+    service, loads, vehicles = payload["service"], payload["loads"], payload["vehicles"]
+    stops, start_minute = payload["stops"], payload["start_minute"]
+
+    dist, mins = build_matrices(points, payload["speed_kmh"])
+    result = solve_vrp(dist, mins, windows, service, loads, vehicles, stops, start_minute)
+
+    rutas = []
+    for vehicle, route in zip(vehicles, result["rutas"]):
+        ev = evaluate_route(route, dist, mins, windows, service, start_minute, payload["origin"],
+                            loads=loads, capacity=vehicle["capacidad"])
+        rutas.append({
+            "orden": route,
+            "llegadas": ev["llegadas"],
+            "tardanzas": ev["tardanzas"],
+            "regresos": ev["regresos"],
+            "distancia_km": ev["distancia_km"],
+            "duracion_min": ev["duracion_min"],
+        })
+    return {"rutas": rutas, "sin_asignar": result["sin_asignar"]}
+
+
+def _dispatch_subset(payload: dict, vehicle: dict, cluster: list):
+    """solve_dispatch payload for one vehicle over its own cluster, re-indexed."""
+    indices = list(dict.fromkeys(
+        [i for i in (payload["origin"], vehicle["origin"]) if i is not None]
+        + vehicle.get("fixed", []) + [idx for idx, _ in cluster]
+    ))
+    local = {idx: pos for pos, idx in enumerate(indices)}
+    sub = {
+        "points": [payload["points"][i] for i in indices],
+        "windows": [payload["windows"][i] for i in indices],
+        "service": [payload["service"][i] for i in indices],
+        "loads": [payload["loads"][i] for i in indices],
+        "vehicles": [{**vehicle, "origin": local.get(vehicle["origin"]),
+                      "fixed": [local[i] for i in vehicle.get("fixed", [])]}],
+        "stops": [(local[idx], [0]) for idx, _ in cluster],
+        "start_minute": payload["start_minute"],
+        "speed_kmh": payload["speed_kmh"],
+        "origin": local.get(payload["origin"]),
+    }
+    return sub, indices
+
+
+def partition_dispatch(payload: dict):
+    """
+    payload as for solve_dispatch. Splits the day with partition_stops and
+    returns ([(solve_dispatch payload, matrix indices)] per vehicle, [unplaced
+    idx]) so each territory can be solved as its own job (no inter-route
+    relocation). A sub-result's positions map back through its indices.
+    """
+    points = [tuple(p) for p in payload["points"]]
+    clusters, unplaced = partition_stops(points, payload["vehicles"], payload["stops"])
+    parts = [_dispatch_subset(payload, vehicle, clusters.get(v, []))
+             for v, vehicle in enumerate(payload["vehicles"])]
+    return parts, unplaced
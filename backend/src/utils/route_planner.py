@@ -0,0 +1,310 @@
+import hashlib
+import json
+from datetime import date, timedelta
+from typing import Iterable, List, Optional
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException
+from src.config import settings
+from src.models.business import PedidoIndividual, ServicioFrecuente
+from src.models.enums import EstadoPedido, EstadoFrecuente
+from src.models.planning import RoutePlan
+from src.models.users import Chofer, PerfilVehiculo
+from src.utils.compute_pool import run_in_pool, ComputeTimeout
+from src.utils.driver_day import load_pending_stops
+from src.utils.optimization import (
+    sort_manual_then_nearest, cheapest_insertion, stop_load
+)
+from src.utils.route_geometry import build_route_geometry, sequence_hash
+from src.utils.route_jobs import solve_day_sequence, solve_tour_order
+from src.utils.time_utils import get_now_arg
+from src.utils.time_windows import parse_clock, window_for_stop, estimate_service_minutes
+
+DONE_PEDIDO = [EstadoPedido.COMPLETADA, EstadoPedido.FINALIZADO]
+DONE_FRECUENTE = [EstadoFrecuente.COMPLETADA]
+
+
+def get_depot():
+    if settings.DEPOT_LAT is not None and settings.DEPOT_LNG is not None:
+        return settings.DEPOT_LAT, settings.DEPOT_LNG
+    return None
+
+
+def vehicle_allows(perfil: Optional[PerfilVehiculo], tipo_servicio: Optional[str]) -> bool:
+    if perfil is None or not perfil.tipos_permitidos:
+        return True
+    return tipo_servicio in perfil.tipos_permitidos
+
+
+def vehicle_capacity(perfil: Optional[PerfilVehiculo]):
+    if perfil is None or not perfil.capacidad:
+        return None
+    return {tipo: int(units) for tipo, units in perfil.capacidad.items()}
+
+
+async def load_vehicle_profiles(db: AsyncSession, chofer_ids: Iterable[int]):
+    """{chofer_id: PerfilVehiculo or None} in a single query."""
+    ids = list(set(chofer_ids))
+    if not ids:
+        return {}
+    stmt = select(Chofer.id, PerfilVehiculo)\
+        .outerjoin(PerfilVehiculo, Chofer.perfil_vehiculo_id == PerfilVehiculo.id)\
+        .where(Chofer.id.in_(ids))
+    return {cid: perfil for cid, perfil in (await db.execute(stmt)).all()}
+
+
+async def check_vehicle_allows(db: AsyncSession, chofer_id: Optional[int], tipo_servicio: Optional[str]):
+    if chofer_id is None:
+        return
+    perfil = (await load_vehicle_profiles(db, [chofer_id])).get(chofer_id)
+    if not vehicle_allows(perfil, tipo_servicio):
+        raise HTTPException(
+            status_code=400,
+            detail=f"El vehículo del chofer ({perfil.nombre}) no admite el servicio '{tipo_servicio}'"
+        )
+
+
+def _same_stop(a, b) -> bool:
+    return type(a) is type(b) and a.id == b.id
+
+
+async def suggest_drivers(db: AsyncSession, item, fecha: date, chofer_ids: Optional[List[int]] = None):
+    """
+    Ranks drivers by how cheaply their current tour for `fecha` absorbs `item`
+    (extra km of the cheapest insertion). Cheapest first.
+    """
+    if item.lat is None or item.lng is None:
+        return []
+    tours = await load_pending_stops(db, fecha, chofer_ids)
+    if chofer_ids:
+        for cid in chofer_ids:
+            tours.setdefault(cid, [])
+
+    depot = get_depot()
+    perfiles = await load_vehicle_profiles(db, tours.keys())
+    ranking = []
+    for chofer_id, stops in tours.items():
+        if not vehicle_allows(perfiles.get(chofer_id), item.tipo_servicio):
+            continue
+        tour = [s for s in sort_manual_then_nearest([s for s in stops if not _same_stop(s, item)])
+                if s.lat is not None and s.lng is not None]
+        extra_km, pos = cheapest_insertion([(s.lat, s.lng) for s in tour], (item.lat, item.lng), depot)
+        ranking.append({
+            "chofer_id": chofer_id,
+            "costo_km": round(extra_km, 2),
+            "posicion": pos + 1,
+            "paradas": len(tour),
+        })
+    ranking.sort(key=lambda r: r["costo_km"])
+    return ranking
+
+
+async def _reoptimized_tour(chofer_id: int, fecha: date, items, perfil: Optional[PerfilVehiculo], depot):
+    """TSPTW over `items` (all located) in the compute pool; None if it timed out."""
+    payload = {
+        "start_minute": parse_clock(settings.ROUTE_DAY_START),
+        "speed_kmh": settings.ROUTE_AVG_SPEED_KMH,
+        "depot": depot,
+        "capacity": vehicle_capacity(perfil),
+        "stops": [
+            [stop_kind(i), i.id, i.lat, i.lng, i.orden_en_ruta, window_for_stop(i),
+             estimate_service_minutes(i.tipo_servicio, getattr(i, "cantidad", 1)), stop_load(i), False]
+            for i in items
+        ],
+    }
+    fingerprint = hashlib.sha1(json.dumps(payload, separators=(",", ":")).encode("utf-8")).hexdigest()
+    try:
+        orden = await run_in_pool(("insert_tour", chofer_id, fecha, fingerprint), solve_tour_order, payload)
+    except ComputeTimeout:
+        return None
+    return [items[idx] for idx in orden]
+
+
+async def insert_into_tour(db: AsyncSession, item, chofer_id: int, fecha: date):
+    """
+    Places `item` in `chofer_id`'s tour for `fecha` at the cheapest position. The
+    tour is only re-optimized from scratch (in the compute pool) when the
+    insertion costs more than INSERTION_REOPT_THRESHOLD_KM. The resulting order
+    is stored as the driver's "cercania" plan for that day; orden_en_ruta is left
+    alone, so the next change re-plans the day freely. Call it after
+    invalidate_route_plans. Does not commit.
+    """
+    stops = (await load_pending_stops(db, fecha, [chofer_id])).get(chofer_id, [])
+    tour = sort_manual_then_nearest([s for s in stops if not _same_stop(s, item)])
+    located = [s for s in tour if s.lat is not None and s.lng is not None]
+    unlocated = [s for s in tour if s.lat is None or s.lng is None]
+
+    perfil = (await load_vehicle_profiles(db, [chofer_id])).get(chofer_id)
+    reoptimizado = False
+    extra_km = 0.0
+    if item.lat is None or item.lng is None:
+        ordered = located + unlocated + [item]
+    else:
+        depot = get_depot()
+        extra_km, pos = cheapest_insertion([(s.lat, s.lng) for s in located], (item.lat, item.lng), depot)
+        ordered = None
+        if extra_km > settings.INSERTION_REOPT_THRESHOLD_KM and located:
+            ordered = await _reoptimized_tour(chofer_id, fecha, located + [item], perfil, depot)
+            if ordered is not None:
+                ordered = ordered + unlocated
+                reoptimizado = True
+        if ordered is None:
+            ordered = located[:pos] + [item] + located[pos:] + unlocated
+
+    secuencia, distancia_km, duracion_min = compute_day_sequence(ordered, [], "fijo", perfil)
+    await store_route_plan(db, chofer_id, fecha, "cercania", secuencia, distancia_km, duracion_min)
+
+    return {
+        "posicion": next(i for i, s in enumerate(ordered, start=1) if s is item),
+        "costo_km": round(extra_km, 2),
+        "reoptimizado": reoptimizado,
+    }
+
+
+def stop_kind(item) -> str:
+    return "P" if isinstance(item, PedidoIndividual) else "F"
+
+
+def _is_done(item) -> bool:
+    if isinstance(item, PedidoIndividual):
+        return item.estado in DONE_PEDIDO
+    return item.estado in DONE_FRECUENTE
+
+
+def _start_minute() -> int:
+    now_arg = get_now_arg()
+    return max(parse_clock(settings.ROUTE_DAY_START), now_arg.hour * 60 + now_arg.minute)
+
+
+def day_sequence_payload(pedidos, frecuentes, modo: str, perfil: Optional[PerfilVehiculo] = None) -> dict:
+    """Plain-data snapshot of a driver's day for route_jobs.solve_day_sequence."""
+    stops = [
+        [stop_kind(i), i.id, i.lat, i.lng, i.orden_en_ruta, window_for_stop(i),
+         estimate_service_minutes(i.tipo_servicio, getattr(i, "cantidad", 1)), stop_load(i), _is_done(i)]
+        for i in list(pedidos) + list(frecuentes)
+    ]
+    return {
+        "modo": modo,
+        "start_minute": _start_minute(),
+        "speed_kmh": settings.ROUTE_AVG_SPEED_KMH,
+        "depot": get_depot(),
+        "capacity": vehicle_capacity(perfil),
+        "stops": stops,
+    }
+
+
+def compute_day_sequence(pedidos, frecuentes, modo: str, perfil: Optional[PerfilVehiculo] = None):
+    """
+    Builds the day's sequence for a driver inline (see route_jobs.solve_day_sequence).
+    Returns (secuencia, distancia_km, duracion_min).
+    """
+    return solve_day_sequence(day_sequence_payload(pedidos, frecuentes, modo, perfil))
+
+
+async def compute_day_sequence_pooled(chofer_id: int, fecha: date, pedidos, frecuentes, modo: str,
+                                      perfil: Optional[PerfilVehiculo] = None):
+    """
+    Same as compute_day_sequence but in the compute pool, so the event loop stays
+    free. Two refreshes of the same driver with the same inputs share one job.
+    Raises ComputeTimeout.
+    """
+    payload = day_sequence_payload(pedidos, frecuentes, modo, perfil)
+    fingerprint = hashlib.sha1(json.dumps(payload, separators=(",", ":")).encode("utf-8")).hexdigest()
+    return await run_in_pool(("day_sequence", chofer_id, fecha, modo, fingerprint), solve_day_sequence, payload)
+
+
+def apply_plan_order(items, tipo: str, secuencia: list):
+    """Sorts `items` as stored in the plan; anything unknown to the plan goes last by id."""
+    rank = {p["id"]: pos for pos, p in enumerate(secuencia) if p["tipo"] == tipo}
+    return sorted(items, key=lambda i: (rank.get(i.id, len(rank)), i.id))
+
+
+async def get_route_plan(db: AsyncSession, chofer_id: int, fecha: date, modo: str) -> Optional[RoutePlan]:
+    stmt = select(RoutePlan).where(
+        RoutePlan.chofer_id == chofer_id,
+        RoutePlan.fecha == fecha,
+        RoutePlan.modo == modo
+    )
+    return (await db.execute(stmt)).scalar_one_or_none()
+
+
+async def save_route_plan(db: AsyncSession, chofer_id: int, fecha: date, modo: str,
+                          secuencia: list, distancia_km: float, duracion_min: float):
+    """Upsert, so two concurrent refreshes of the same driver don't collide. Commits."""
+    await store_route_plan(db, chofer_id, fecha, modo, secuencia, distancia_km, duracion_min)
+    await db.commit()
+
+
+async def store_route_plan(db: AsyncSession, chofer_id: int, fecha: date, modo: str,
+                           secuencia: list, distancia_km: float, duracion_min: float):
+    """Same upsert as save_route_plan inside the caller's transaction (does not commit)."""
+    values = {
+        "chofer_id": chofer_id,
+        "fecha": fecha,
+        "modo": modo,
+        "secuencia": secuencia,
+        "distancia_km": round(distancia_km, 3),
+        "duracion_min": round(duracion_min, 1),
+        "creado_en": get_now_arg(),
+    }
+    stmt = insert(RoutePlan).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_route_plan_chofer_fecha_modo",
+        set_={k: stmt.excluded[k] for k in ("secuencia", "distancia_km", "duracion_min", "creado_en")}
+    )
+    await db.execute(stmt)
+
+
+async def get_plan_geometry(db: AsyncSession, plan: RoutePlan, items) -> dict:
+    """
+    Road geometry of the plan's pending stops (plus yard returns), in plan order.
+    Cached on the plan and rebuilt only when the stop sequence hash changes
+    (e.g. a stop's coordinates were edited). Commits when it (re)builds.
+    """
+    by_key = {(stop_kind(i), i.id): i for i in items}
+    depot = get_depot()
+    waypoints, windows, service = [], [], []
+    if depot is not None:
+        waypoints.append({"tipo": "B", "id": 0, "lat": depot[0], "lng": depot[1]})
+        windows.append(None)
+        service.append(0)
+    for parada in plan.secuencia:
+        if parada["tipo"] == "B":
+            if depot is not None:
+                waypoints.append({"tipo": "B", "id": 0, "lat": depot[0], "lng": depot[1]})
+                windows.append(None)
+                service.append(0)
+            continue
+        item = by_key.get((parada["tipo"], parada["id"]))
+        if item is None or _is_done(item) or item.lat is None or item.lng is None:
+            continue
+        waypoints.append({"tipo": parada["tipo"], "id": item.id, "lat": item.lat, "lng": item.lng})
+        windows.append(window_for_stop(item))
+        service.append(estimate_service_minutes(item.tipo_servicio, getattr(item, "cantidad", 1)))
+
+    if plan.geometria is not None and plan.geometria_hash == sequence_hash(waypoints):
+        return plan.geometria
+
+    geometria = await build_route_geometry(waypoints, windows, service, _start_minute())
+    plan.geometria = geometria
+    plan.geometria_hash = geometria["hash"]
+    await db.commit()
+    return geometria
+
+
+async def invalidate_route_plans(db: AsyncSession, chofer_ids: Iterable[Optional[int]]):
+    """
+    Drops today's and future plans of the given drivers; they are rebuilt on the
+    next read. Runs inside the caller's transaction (does not commit).
+    """
+    ids = {cid for cid in chofer_ids if cid is not None}
+    if not ids:
+        return
+    await db.execute(
+        delete(RoutePlan).where(
+            RoutePlan.chofer_id.in_(ids),
+            # One day of slack: /chofer/hoy keys plans by server date, not ARG date
+            RoutePlan.fecha >= get_now_arg().date() - timedelta(days=1)
+        )
+    )
@@ -3,8 +3,10 @@ from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from fastapi import Request
 from src.models.audit import AuditLog
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.db import AsyncSessionLocal
-from typing import Optional
+from typing import List, Optional
 
 # 1. Rate Limiting Setup
 limiter = Limiter(key_func=get_remote_address)
@@ -36,3 +38,26 @@ async def log_action(
             await db.commit()
     except Exception as e:
         print(f"AUDIT LOG ERROR: {e}")
+
+
+async def log_actions(
+    db: AsyncSession,
+    user_id: Optional[int],
+    accion: str,
+    recurso: str,
+    entries: List[tuple],
+    request: Optional[Request] = None
+):
+    """
+    Audit rows for a batch operation, (recurso_id, detalles) each, in one INSERT.
+    Runs inside the caller's transaction (does not commit), so the log matches
+    exactly what was applied.
+    """
+    if not entries:
+        return
+    ip = request.client.host if request and request.client else None
+    await db.execute(insert(AuditLog), [
+        {"user_id": user_id, "accion": accion, "recurso": recurso, "recurso_id": recurso_id,
+         "detalles": detalles, "ip_address": ip}
+        for recurso_id, detalles in entries
+    ])
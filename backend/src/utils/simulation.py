@@ -0,0 +1,138 @@
+from datetime import date
+from typing import Dict, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException
+from src.config import settings
+from src.models.business import PedidoIndividual, ServicioFrecuente
+from src.utils.driver_day import load_pending_stops
+from src.utils.optimization import cached_matrices, cheapest_insertion, evaluate_route, sort_manual_then_nearest, stop_load
+from src.utils.route_planner import get_depot, load_vehicle_profiles, stop_kind, vehicle_allows, vehicle_capacity
+from src.utils.time_windows import estimate_service_minutes, format_clock, parse_clock, window_for_stop
+
+StopKey = Tuple[str, int]
+
+
+def _key(item) -> StopKey:
+    return stop_kind(item), item.id
+
+
+def _located(item) -> bool:
+    return item.lat is not None and item.lng is not None
+
+
+async def _load_moved(db: AsyncSession, cambios, known: Dict[StopKey, object]):
+    """Stops named in `cambios` that aren't on anybody's tour yet (e.g. unassigned orders)."""
+    for tipo, model in (("P", PedidoIndividual), ("F", ServicioFrecuente)):
+        ids = {c.id for c in cambios if c.tipo == tipo and (tipo, c.id) not in known}
+        if not ids:
+            continue
+        for item in (await db.execute(select(model).where(model.id.in_(ids)))).scalars().all():
+            known[(tipo, item.id)] = item
+        missing = sorted(ids - {i for t, i in known if t == tipo})
+        if missing:
+            raise HTTPException(status_code=404, detail=f"No encontrados ({tipo}): {missing}")
+
+
+async def simulate_changes(db: AsyncSession, fecha: date, cambios) -> dict:
+    """
+    What-if over the tours of `fecha` (same order /chofer/hoy shows in "cercania"
+    mode). Each change moves a stop to `chofer_id` (None = off every route) at
+    1-based `orden`, or at its cheapest position when `orden` is None.
+    Read-only: nothing is written or flushed. Returns, per affected driver,
+    the before / after metrics and the new sequence.
+    """
+    tours = await load_pending_stops(db, fecha)
+    known: Dict[StopKey, object] = {_key(s): s for stops in tours.values() for s in stops}
+    await _load_moved(db, cambios, known)
+
+    targets = {c.chofer_id for c in cambios if c.chofer_id is not None}
+    perfiles = await load_vehicle_profiles(db, set(tours) | targets)
+    unknown = sorted(targets - set(perfiles))
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Choferes no encontrados: {unknown}")
+
+    def day_order(stops):
+        pedidos = [s for s in stops if isinstance(s, PedidoIndividual)]
+        frecuentes = [s for s in stops if not isinstance(s, PedidoIndividual)]
+        return sort_manual_then_nearest(pedidos) + sort_manual_then_nearest(frecuentes)
+
+    antes = {cid: day_order(stops) for cid, stops in tours.items()}
+    despues = {cid: list(tour) for cid, tour in antes.items()}
+    afectados = set()
+    avisos = []
+
+    # One matrix over every stop of the day (+ yard), cached across simulations
+    depot = get_depot()
+    points, windows, service, loads, index = [], [], [], [], {}
+    origin = None
+    if depot is not None:
+        points.append(depot)
+        windows.append(None)
+        service.append(0)
+        loads.append(None)
+        origin = 0
+    for key, item in sorted(known.items()):
+        if not _located(item):
+            continue
+        index[key] = len(points)
+        points.append((item.lat, item.lng))
+        windows.append(window_for_stop(item))
+        service.append(estimate_service_minutes(item.tipo_servicio, getattr(item, "cantidad", 1)))
+        loads.append(stop_load(item))
+    dist, mins = cached_matrices(points, settings.ROUTE_AVG_SPEED_KMH)
+
+    for cambio in cambios:
+        key = (cambio.tipo, cambio.id)
+        item = known[key]
+        for cid, tour in despues.items():
+            if any(_key(s) == key for s in tour):
+                despues[cid] = [s for s in tour if _key(s) != key]
+                afectados.add(cid)
+        if cambio.chofer_id is None:
+            continue
+        cid = cambio.chofer_id
+        afectados.add(cid)
+        antes.setdefault(cid, [])
+        tour = despues.setdefault(cid, [])
+        if not vehicle_allows(perfiles.get(cid), item.tipo_servicio):
+            avisos.append(f"{key[0]}{key[1]}: el vehículo del chofer {cid} no admite '{item.tipo_servicio}'")
+        if cambio.orden is not None:
+            pos = min(max(cambio.orden - 1, 0), len(tour))
+        elif _located(item):
+            located = [s for s in tour if _located(s)]
+            _, located_pos = cheapest_insertion([(s.lat, s.lng) for s in located], (item.lat, item.lng), depot)
+            pos = tour.index(located[located_pos]) if located_pos < len(located) else len(tour)
+        else:
+            pos = len(tour)
+        tour.insert(pos, item)
+
+    start_minute = parse_clock(settings.ROUTE_DAY_START)
+
+    def metrics(cid: int, tour) -> dict:
+        order = [index[_key(s)] for s in tour if _key(s) in index]
+        ev = evaluate_route(order, dist, mins, windows, service, start_minute, origin,
+                            loads=loads, capacity=vehicle_capacity(perfiles.get(cid)))
+        return {
+            "paradas": len(tour),
+            "distancia_km": round(ev["distancia_km"], 2),
+            "duracion_min": round(ev["duracion_min"], 1),
+            "fin": format_clock(ev["fin"]) if order else None,
+            "minutos_tarde": int(round(sum(ev["tardanzas"]))),
+            "paradas_tarde": sum(1 for t in ev["tardanzas"] if t > 0),
+            "regresos_base": len(ev["regresos"]),
+        }
+
+    choferes = []
+    for cid in sorted(afectados):
+        before, after = metrics(cid, antes[cid]), metrics(cid, despues[cid])
+        choferes.append({
+            "chofer_id": cid,
+            "antes": before,
+            "despues": after,
+            "delta_distancia_km": round(after["distancia_km"] - before["distancia_km"], 2),
+            "delta_duracion_min": round(after["duracion_min"] - before["duracion_min"], 1),
+            "delta_minutos_tarde": after["minutos_tarde"] - before["minutos_tarde"],
+            "secuencia": [{"tipo": t, "id": i} for t, i in map(_key, despues[cid])],
+        })
+    return {"fecha": fecha, "choferes": choferes, "avisos": avisos}
@@ -1,4 +1,5 @@
-from datetime import datetime, timedelta, timezone
+import unicodedata
+from datetime import date, datetime, timedelta, timezone
 
 ARG_OFFSET = timedelta(hours=-3)
 ARG_TZ = timezone(ARG_OFFSET)
@@ -11,3 +12,36 @@ def format_arg(dt: datetime):
         return ""
     # Add offset and return formatted
     return (dt + ARG_OFFSET).strftime("%d/%m/%Y %H:%M")
+
+def day_bounds(desde: date, hasta: date = None):
+    """[desde 00:00, hasta+1 00:00) so date filters can range-scan a datetime index instead of casting it."""
+    hasta = hasta or desde
+    start = datetime.combine(desde, datetime.min.time())
+    return start, datetime.combine(hasta, datetime.min.time()) + timedelta(days=1)
+
+# 0=Monday ... 6=Sunday, as stored in RutaDia.dia_semana and ServicioFrecuente.dias_semana
+DAYS_MAP = {
+    0: "Lunes",
+    1: "Martes",
+    2: "Miércoles",
+    3: "Jueves",
+    4: "Viernes",
+    5: "Sábado",
+    6: "Domingo"
+}
+
+
+def _day_key(name: str) -> str:
+    name = unicodedata.normalize("NFKD", name.strip().lower())
+    return "".join(c for c in name if not unicodedata.combining(c))
+
+# Bit i set = runs on weekday i (0=Monday), see ServicioFrecuente.dias_mask
+DAY_BITS = {_day_key(name): 1 << num for num, name in DAYS_MAP.items()}
+
+def dias_to_mask(dias) -> int:
+    """["Lunes", "Miércoles"] -> 0b0000101. Accents and case don't matter; unknown names are ignored."""
+    mask = 0
+    for dia in dias or []:
+        if isinstance(dia, str):
+            mask |= DAY_BITS.get(_day_key(dia), 0)
+    return mask
@@ -0,0 +1,140 @@
+import re
+import unicodedata
+from datetime import datetime
+from typing import Optional, Tuple
+
+from src.models.enums import TipoServicio
+
+# Windows are expressed as minutes since midnight: (inicio, fin)
+Window = Tuple[int, int]
+
+NAMED_WINDOWS = {
+    "manana": (8 * 60, 13 * 60),
+    "mediodia": (12 * 60, 15 * 60),
+    "siesta": (13 * 60, 16 * 60),
+    "tarde": (14 * 60, 19 * 60),
+    "noche": (19 * 60, 22 * 60),
+    "todo el dia": (8 * 60, 19 * 60),
+}
+
+# Hours below this are assumed to be PM when written as "2 a 6"
+EARLIEST_WORK_HOUR = 7
+
+# Tolerance around an exact execution time (e.g. "10:30" or fecha_hora_ejecucion)
+EXACT_TIME_TOLERANCE = 30
+
+# Average time on site, in minutes, per service type
+SERVICE_DURATION_MIN = {
+    TipoServicio.DESAGOTE_DESTAPE.value: 60,
+    TipoServicio.MOVIMIENTO_SUELO.value: 120,
+    TipoServicio.EVENTA_ARIDOS.value: 25,
+    TipoServicio.VOLQUETES_CONTENEDORES.value: 20,
+    TipoServicio.ALQUILER_OBRADORES.value: 45,
+    TipoServicio.BANOS_QUIMICOS.value: 20,
+    TipoServicio.OTROS.value: 30,
+}
+DEFAULT_SERVICE_DURATION = 30
+# Extra minutes per additional unit (e.g. each extra chemical toilet to clean)
+EXTRA_UNIT_DURATION = 10
+
+_TIME_RE = r"(\d{1,2})(?:\s*[:.h]\s*(\d{2}))?\s*(?:hs?|horas)?"
+_RANGE_RE = re.compile(_TIME_RE + r"\s*(?:-|a|al|hasta|/)\s*" + _TIME_RE)
+_BEFORE_RE = re.compile(r"(?:antes\s+de(?:\s+las?)?|hasta(?:\s+las?)?)\s*" + _TIME_RE)
+_AFTER_RE = re.compile(r"(?:despues\s+de(?:\s+las?)?|desde(?:\s+las?)?)\s*" + _TIME_RE)
+_SINGLE_RE = re.compile(r"^(?:a\s+las?\s+)?" + _TIME_RE + r"$")
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.strip().lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.split())
+
+
+def _to_minutes(hour: str, minute: Optional[str]) -> Optional[int]:
+    h = int(hour)
+    m = int(minute) if minute else 0
+    if h > 24 or m > 59:
+        return None
+    return min(h * 60 + m, 24 * 60)
+
+
+def parse_rango_horario(rango: Optional[str]) -> Optional[Window]:
+    """
+    Parses the free-text rango_horario ("MAÑANA", "TARDE", "8 a 12", "14:00-18:00",
+    "antes de las 10", ...) into a (inicio, fin) window in minutes since midnight.
+    Returns None when the text can't be interpreted.
+    """
+    if not rango:
+        return None
+    text = _normalize(rango)
+    if not text:
+        return None
+
+    match = _RANGE_RE.search(text)
+    if match:
+        start = _to_minutes(match.group(1), match.group(2))
+        end = _to_minutes(match.group(3), match.group(4))
+        if start is not None and end is not None:
+            # "2 a 6" / "11 a 3" written without 24h format: nobody works at 2 AM
+            if start < EARLIEST_WORK_HOUR * 60:
+                start += 12 * 60
+            if end <= start and end < 12 * 60:
+                end += 12 * 60
+            if end > start:
+                return start, end
+
+    match = _BEFORE_RE.search(text)
+    if match:
+        end = _to_minutes(match.group(1), match.group(2))
+        if end is not None:
+            return 0, end
+
+    match = _AFTER_RE.search(text)
+    if match:
+        start = _to_minutes(match.group(1), match.group(2))
+        if start is not None:
+            return start, 24 * 60
+
+    for name, window in NAMED_WINDOWS.items():
+        if name in text:
+            return window
+
+    match = _SINGLE_RE.match(text)
+    if match:
+        exact = _to_minutes(match.group(1), match.group(2))
+        if exact is not None:
+            return max(exact - EXACT_TIME_TOLERANCE, 0), exact + EXACT_TIME_TOLERANCE
+
+    return None
+
+
+def window_for_stop(item) -> Optional[Window]:
+    """
+    Time window for a PedidoIndividual / ServicioFrecuente. The free-text range
+    wins; otherwise an explicit execution time (not midnight) is used.
+    """
+    window = parse_rango_horario(getattr(item, "rango_horario", None))
+    if window:
+        return window
+    exec_dt: Optional[datetime] = getattr(item, "fecha_hora_ejecucion", None)
+    if exec_dt and (exec_dt.hour or exec_dt.minute):
+        exact = exec_dt.hour * 60 + exec_dt.minute
+        return max(exact - EXACT_TIME_TOLERANCE, 0), exact + EXACT_TIME_TOLERANCE
+    return None
+
+
+def estimate_service_minutes(tipo_servicio: Optional[str], cantidad: Optional[int] = 1) -> int:
+    base = SERVICE_DURATION_MIN.get(tipo_servicio or "", DEFAULT_SERVICE_DURATION)
+    extra_units = max((cantidad or 1) - 1, 0)
+    return base + extra_units * EXTRA_UNIT_DURATION
+
+
+def parse_clock(value: str) -> int:
+    """'08:30' -> 510"""
+    hour, _, minute = value.partition(":")
+    return int(hour) * 60 + int(minute or 0)
+
+
+def format_clock(minutes: float) -> str:
+    minutes = int(round(minutes))
+    return f"{(minutes // 60) % 24:02d}:{minutes % 60:02d}"
@@ -0,0 +1,57 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.models.business import Cliente, PedidoIndividual
+from src.models.enums import EstadoPedido, Rol, TipoServicio
+from src.models.users import Chofer, Usuario
+from src.security import create_access_token
+
+# Rows for the endpoint tests. Everything is flushed, not committed: the test
+# commits once its data is in place.
+
+
+def auth(usuario: Usuario) -> dict:
+    token = create_access_token({"sub": usuario.email, "role": usuario.rol.value, "id": usuario.id})
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def add_usuario(db: AsyncSession, rol: Rol = Rol.ADMIN, nombre: str = "Admin") -> Usuario:
+    usuario = Usuario(nombre=nombre, email=f"{nombre.lower()}@test.local", password_hash="-", rol=rol, activo=True)
+    db.add(usuario)
+    await db.flush()
+    return usuario
+
+
+async def add_chofer(db: AsyncSession, nombre: str = "Chofer") -> Chofer:
+    usuario = await add_usuario(db, Rol.CHOFER, nombre)
+    chofer = Chofer(usuario_id=usuario.id, telefono="3546000000", patente="AB123CD")
+    db.add(chofer)
+    await db.flush()
+    chofer.usuario = usuario
+    return chofer
+
+
+async def add_cliente(db: AsyncSession) -> Cliente:
+    cliente = Cliente(nombre="Cliente", telefono="3546111111", direccion="San Martín 100")
+    db.add(cliente)
+    await db.flush()
+    return cliente
+
+
+async def add_pedido(db: AsyncSession, cliente: Cliente, chofer: Optional[Chofer] = None,
+                     estado: EstadoPedido = EstadoPedido.CREADA, lat: float = -31.98, lng: float = -64.56,
+                     fecha: Optional[datetime] = None) -> PedidoIndividual:
+    pedido = PedidoIndividual(
+        cliente_id=cliente.id,
+        tipo_servicio=TipoServicio.VOLQUETES_CONTENEDORES.value,
+        direccion="Calle 1",
+        lat=lat,
+        lng=lng,
+        costo=1000.0,
+        estado=estado,
+        chofer_id=chofer.id if chofer else None,
+        fecha_hora_ejecucion=fecha or datetime.now().replace(hour=9, minute=0, second=0, microsecond=0),
+    )
+    db.add(pedido)
+    await db.flush()
+    return pedido
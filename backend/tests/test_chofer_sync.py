@@ -0,0 +1,74 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import func, select
+from factories import add_chofer, add_cliente, add_pedido, add_usuario, auth
+from src.models.business import Gasto
+from src.models.enums import EstadoPedido
+
+pytestmark = pytest.mark.anyio
+
+
+def _mutacion(clave, tipo, datos, hora):
+    return {"clave": clave, "tipo": tipo, "datos": datos,
+            "cliente_ts": datetime.now().replace(hour=hora, minute=0, second=0, microsecond=0).isoformat()}
+
+
+async def test_sync_applies_each_change_on_its_own(client, db):
+    chofer = await add_chofer(db)
+    otro = await add_chofer(db, nombre="Otro")
+    cliente = await add_cliente(db)
+    propio = await add_pedido(db, cliente, chofer, EstadoPedido.ASIGNADA)
+    cerrado = await add_pedido(db, cliente, chofer, EstadoPedido.FINALIZADO)
+    ajeno = await add_pedido(db, cliente, otro, EstadoPedido.ASIGNADA)
+    await db.commit()
+
+    mutaciones = [
+        _mutacion("k-gasto", "gasto", {"monto": 5000, "categoria": "Combustible"}, 8),
+        _mutacion("k-propio", "estado_pedido", {"id": propio.id, "estado": EstadoPedido.EN_CAMINO.value}, 7),
+        _mutacion("k-cerrado", "estado_pedido", {"id": cerrado.id, "estado": EstadoPedido.EN_CAMINO.value}, 7),
+        _mutacion("k-ajeno", "estado_pedido", {"id": ajeno.id, "estado": EstadoPedido.EN_CAMINO.value}, 7),
+        _mutacion("k-invalido", "gasto", {"categoria": "Viáticos"}, 7),
+    ]
+    resp = await client.post("/chofer/sync", json={"mutaciones": mutaciones}, headers=auth(chofer.usuario))
+    assert resp.status_code == 200, resp.text
+    resultados = {r["clave"]: r for r in resp.json()["resultados"]}
+    assert [r["clave"] for r in resp.json()["resultados"]] == [m["clave"] for m in mutaciones]
+    assert resultados["k-gasto"]["estado"] == "aplicado"
+    assert resultados["k-propio"]["estado"] == "aplicado"
+    assert (resultados["k-cerrado"]["estado"], resultados["k-cerrado"]["codigo"]) == ("rechazado", 409)
+    assert (resultados["k-ajeno"]["estado"], resultados["k-ajeno"]["codigo"]) == ("rechazado", 403)
+    assert (resultados["k-invalido"]["estado"], resultados["k-invalido"]["codigo"]) == ("rechazado", 422)
+
+    for pedido in (propio, cerrado, ajeno):
+        await db.refresh(pedido)
+    assert propio.estado == EstadoPedido.EN_CAMINO
+    assert cerrado.estado == EstadoPedido.FINALIZADO
+    assert ajeno.estado == EstadoPedido.ASIGNADA
+    assert (await db.execute(select(func.count()).select_from(Gasto))).scalar() == 1
+
+
+async def test_sync_resend_returns_original_results(client, db):
+    chofer = await add_chofer(db)
+    cerrado = await add_pedido(db, await add_cliente(db), chofer, EstadoPedido.FINALIZADO)
+    await db.commit()
+
+    mutaciones = [
+        _mutacion("k-gasto", "gasto", {"monto": 5000, "categoria": "Combustible"}, 8),
+        _mutacion("k-cerrado", "estado_pedido", {"id": cerrado.id, "estado": EstadoPedido.EN_CAMINO.value}, 9),
+    ]
+    primera = await client.post("/chofer/sync", json={"mutaciones": mutaciones}, headers=auth(chofer.usuario))
+    segunda = await client.post("/chofer/sync", json={"mutaciones": mutaciones}, headers=auth(chofer.usuario))
+    assert segunda.status_code == 200, segunda.text
+
+    for antes, despues in zip(primera.json()["resultados"], segunda.json()["resultados"]):
+        assert despues["estado"] == "duplicado"
+        assert despues["codigo"] == antes["codigo"]
+    assert (await db.execute(select(func.count()).select_from(Gasto))).scalar() == 1
+
+
+async def test_sync_only_for_drivers(client, db):
+    admin = await add_usuario(db)
+    await db.commit()
+
+    resp = await client.post("/chofer/sync", json={"mutaciones": []}, headers=auth(admin))
+    assert resp.status_code == 403
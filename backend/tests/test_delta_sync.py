@@ -0,0 +1,14 @@
+from datetime import date, datetime
+import pytest
+from src.utils.delta_sync import make_cursor, parse_cursor
+
+
+def test_cursor_round_trip():
+    dia, ts = date(2024, 5, 1), datetime(2024, 5, 1, 9, 15, 30, 123456)
+    assert parse_cursor(make_cursor(dia, ts)) == (dia, ts)
+
+
+@pytest.mark.parametrize("cursor", ["", "2024-05-01", "2024-05-01~", "ayer~2024-05-01T09:00:00",
+                                    "2024-05-01~las nueve"])
+def test_parse_cursor_malformed(cursor):
+    assert parse_cursor(cursor) is None
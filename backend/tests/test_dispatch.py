@@ -0,0 +1,49 @@
+from src.utils.dispatch import solve_vrp
+
+# Yards at 0 and 5 on a line, stops 1-2 near the first and 3-4 near the second
+POS = [0, 1, 2, 8, 9, 10]
+DIST = [[abs(a - b) * 1.0 for b in POS] for a in POS]
+MINS = DIST
+SERVICE = [0, 10, 10, 10, 10, 0]
+WINDOWS = [None] * len(POS)
+LOADS = [None, {"BANOS": 1}, {"BANOS": 1}, {"BANOS": 1}, {"BANOS": 1}, None]
+
+
+def _vehicle(origin, max_paradas=10, capacidad=None, fixed=()):
+    return {"origin": origin, "max_paradas": max_paradas, "capacidad": capacidad, "fixed": list(fixed)}
+
+
+def test_solve_vrp_assigns_each_stop_to_nearest_truck():
+    vehicles = [_vehicle(0), _vehicle(5)]
+    stops = [(i, [0, 1]) for i in (1, 2, 3, 4)]
+    result = solve_vrp(DIST, MINS, WINDOWS, SERVICE, LOADS, vehicles, stops, start_minute=480)
+    assert sorted(result["rutas"][0]) == [1, 2]
+    assert sorted(result["rutas"][1]) == [3, 4]
+    assert result["sin_asignar"] == []
+
+
+def test_solve_vrp_honours_eligibility_and_max_paradas():
+    vehicles = [_vehicle(0, max_paradas=1), _vehicle(5)]
+    stops = [(1, [0]), (2, [0]), (3, [1])]
+    result = solve_vrp(DIST, MINS, WINDOWS, SERVICE, LOADS, vehicles, stops, start_minute=480)
+    assert len(result["rutas"][0]) == 1
+    assert result["rutas"][1] == [3]
+    assert len(result["sin_asignar"]) == 1
+
+
+def test_solve_vrp_keeps_fixed_stops():
+    # Stop 1 sits next to the first yard but is pinned to the second truck
+    vehicles = [_vehicle(0), _vehicle(5, fixed=[1])]
+    stops = [(4, [0, 1])]
+    result = solve_vrp(DIST, MINS, WINDOWS, SERVICE, LOADS, vehicles, stops, start_minute=480)
+    assert sorted(result["rutas"][1]) == [1, 4]
+    assert result["rutas"][0] == []
+
+
+def test_solve_vrp_leaves_out_what_no_truck_can_carry():
+    loads = LOADS[:1] + [{"BANOS": 5}] + LOADS[2:]
+    vehicles = [_vehicle(None, capacidad={"BANOS": 3})] # No yard to go back to
+    stops = [(1, [0]), (2, [0])]
+    result = solve_vrp(DIST, MINS, WINDOWS, SERVICE, loads, vehicles, stops, start_minute=480)
+    assert result["rutas"][0] == [2]
+    assert result["sin_asignar"] == [1]
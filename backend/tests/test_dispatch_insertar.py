@@ -0,0 +1,70 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import select
+from factories import add_chofer, add_cliente, add_pedido, add_usuario, auth
+from src.models.enums import EstadoPedido
+from src.models.planning import RoutePlan
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_insertar_slots_order_into_tour_without_pinning(client, db):
+    admin = await add_usuario(db)
+    chofer = await add_chofer(db)
+    cliente = await add_cliente(db)
+    a = await add_pedido(db, cliente, chofer, EstadoPedido.ASIGNADA, lat=-31.980, lng=-64.560)
+    b = await add_pedido(db, cliente, chofer, EstadoPedido.ASIGNADA, lat=-31.990, lng=-64.540)
+    nuevo = await add_pedido(db, cliente, lat=-31.985, lng=-64.550) # Halfway between a and b
+    await db.commit()
+
+    resp = await client.post(f"/dispatch/insertar/{nuevo.id}", params={"chofer_id": chofer.id}, headers=auth(admin))
+    assert resp.status_code == 200, resp.text
+    body = resp.json()
+    assert body["chofer_id"] == chofer.id
+    assert body["posicion"] == 2
+    assert body["reoptimizado"] is False
+
+    for pedido in (a, b, nuevo):
+        await db.refresh(pedido)
+        assert pedido.orden_en_ruta is None # The day stays free to be re-planned
+    assert nuevo.chofer_id == chofer.id
+    assert nuevo.estado == EstadoPedido.ASIGNADA
+
+    plan = (await db.execute(select(RoutePlan).where(
+        RoutePlan.chofer_id == chofer.id, RoutePlan.modo == "cercania"
+    ))).scalar_one()
+    assert plan.fecha == datetime.now().date()
+    assert [p["id"] for p in plan.secuencia if p["tipo"] == "P"] == [a.id, nuevo.id, b.id]
+
+
+async def test_insertar_unknown_chofer(client, db):
+    admin = await add_usuario(db)
+    pedido = await add_pedido(db, await add_cliente(db))
+    await db.commit()
+
+    resp = await client.post(f"/dispatch/insertar/{pedido.id}", params={"chofer_id": 999}, headers=auth(admin))
+    assert resp.status_code == 404
+
+
+@pytest.mark.parametrize("estado", [EstadoPedido.CANCELADA, EstadoPedido.FINALIZADO, EstadoPedido.EN_CAMINO])
+async def test_insertar_rejects_orders_no_longer_pending(client, db, estado):
+    admin = await add_usuario(db)
+    chofer = await add_chofer(db)
+    pedido = await add_pedido(db, await add_cliente(db), estado=estado)
+    await db.commit()
+
+    resp = await client.post(f"/dispatch/insertar/{pedido.id}", params={"chofer_id": chofer.id}, headers=auth(admin))
+    assert resp.status_code == 409
+    await db.refresh(pedido)
+    assert pedido.estado == estado
+    assert pedido.chofer_id is None
+
+
+async def test_insertar_requires_staff(client, db):
+    chofer = await add_chofer(db)
+    pedido = await add_pedido(db, await add_cliente(db))
+    await db.commit()
+
+    resp = await client.post(f"/dispatch/insertar/{pedido.id}", params={"chofer_id": chofer.id},
+                             headers=auth(chofer.usuario))
+    assert resp.status_code == 403
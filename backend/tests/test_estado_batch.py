@@ -0,0 +1,49 @@
+import pytest
+from sqlalchemy import select
+from factories import add_chofer, add_cliente, add_pedido, add_usuario, auth
+from src.models.audit import AuditLog
+from src.models.enums import EstadoPedido
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_batch_moves_open_orders_and_reports_the_rest(client, db):
+    admin = await add_usuario(db)
+    chofer = await add_chofer(db)
+    cliente = await add_cliente(db)
+    abierto = await add_pedido(db, cliente, chofer, EstadoPedido.COMPLETADA)
+    listo = await add_pedido(db, cliente, chofer, EstadoPedido.FINALIZADO)
+    cancelado = await add_pedido(db, cliente, chofer, EstadoPedido.CANCELADA)
+    await db.commit()
+
+    ids = [cancelado.id, abierto.id, 999, listo.id, abierto.id]
+    resp = await client.post("/pedidos/estado:batch", json={"ids": ids, "estado": EstadoPedido.FINALIZADO.value},
+                             headers=auth(admin))
+    assert resp.status_code == 200, resp.text
+    # One result per id, in input order, repeats dropped
+    assert [(r["id"], r["resultado"]) for r in resp.json()] == [
+        (cancelado.id, "rechazado"),
+        (abierto.id, "aplicado"),
+        (999, "rechazado"),
+        (listo.id, "sin_cambio"),
+    ]
+
+    for pedido in (abierto, listo, cancelado):
+        await db.refresh(pedido)
+    assert abierto.estado == EstadoPedido.FINALIZADO
+    assert cancelado.estado == EstadoPedido.CANCELADA
+
+    logs = (await db.execute(select(AuditLog).where(AuditLog.recurso == "pedidos"))).scalars().all()
+    assert [(log.recurso_id, log.detalles["anterior"]) for log in logs] == [(abierto.id, EstadoPedido.COMPLETADA.value)]
+
+
+async def test_batch_requires_staff(client, db):
+    chofer = await add_chofer(db)
+    pedido = await add_pedido(db, await add_cliente(db), chofer, EstadoPedido.ASIGNADA)
+    await db.commit()
+
+    resp = await client.post("/pedidos/estado:batch", json={"ids": [pedido.id], "estado": EstadoPedido.CANCELADA.value},
+                             headers=auth(chofer.usuario))
+    assert resp.status_code == 403
+    await db.refresh(pedido)
+    assert pedido.estado == EstadoPedido.ASIGNADA
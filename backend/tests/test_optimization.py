@@ -0,0 +1,58 @@
+from src.utils.optimization import evaluate_route, solve_tsptw
+
+# Four points on a line, 1 km / 1 minute apart; index 0 is the yard
+DIST = [[abs(i - j) * 1.0 for j in range(4)] for i in range(4)]
+MINS = [[abs(i - j) * 1.0 for j in range(4)] for i in range(4)]
+SERVICE = [0, 10, 10, 10]
+
+
+def test_evaluate_route_waits_for_window():
+    windows = [None, None, (100, 200), None]
+    ev = evaluate_route([1, 2, 3], DIST, MINS, windows, SERVICE, start_minute=0, origin=0)
+    assert ev["llegadas"] == [1.0, 100.0, 111.0]
+    assert ev["tardanzas"] == [0.0, 0.0, 0.0]
+    assert ev["distancia_km"] == 3.0
+    assert ev["fin"] == 121.0
+
+
+def test_evaluate_route_counts_lateness():
+    windows = [None, (0, 5), None, (0, 20)]
+    ev = evaluate_route([3, 2, 1], DIST, MINS, windows, SERVICE, start_minute=0, origin=0)
+    assert ev["llegadas"] == [3.0, 14.0, 25.0]
+    assert ev["tardanzas"] == [0.0, 0.0, 20.0]
+
+
+def test_evaluate_route_returns_to_yard_when_full():
+    loads = [None, {"BANOS": 2}, {"BANOS": 2}, {"BANOS": 1}]
+    ev = evaluate_route([1, 2, 3], DIST, MINS, [None] * 4, SERVICE, start_minute=0, origin=0,
+                        loads=loads, capacity={"BANOS": 3})
+    assert ev["regresos"] == [1]
+    assert ev["sobrecargas"] == 0
+    assert ev["distancia_km"] == 1 + 1 + 2 + 1
+
+
+def test_evaluate_route_counts_overloads_without_yard():
+    loads = [None, {"BANOS": 5}, None, None]
+    ev = evaluate_route([1], DIST, MINS, [None] * 4, SERVICE, start_minute=0,
+                        loads=loads, capacity={"BANOS": 3})
+    assert ev["sobrecargas"] == 1
+
+
+def test_solve_tsptw_visits_every_stop_in_line():
+    ev = solve_tsptw(DIST, MINS, [None] * 4, SERVICE, start_minute=0, origin=0)
+    assert ev["orden"] == [1, 2, 3]
+    assert ev["distancia_km"] == 3.0
+
+
+def test_solve_tsptw_respects_windows():
+    # The far stop closes early, so it has to go first despite the detour
+    windows = [None, None, None, (0, 10)]
+    ev = solve_tsptw(DIST, MINS, windows, SERVICE, start_minute=0, origin=0)
+    assert ev["orden"][0] == 3
+    assert sorted(ev["orden"]) == [1, 2, 3]
+    assert sum(ev["tardanzas"]) == 0
+
+
+def test_solve_tsptw_subset_and_empty():
+    assert solve_tsptw(DIST, MINS, [None] * 4, SERVICE, 0, origin=0, stops=[2])["orden"] == [2]
+    assert solve_tsptw(DIST, MINS, [None] * 4, SERVICE, 0, origin=0, stops=[])["orden"] == []
@@ -0,0 +1,38 @@
+from datetime import datetime
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, select
+from sqlalchemy.dialects import postgresql
+from src.utils.pagination import after_keyset, make_keyset, parse_keyset
+
+pedidos = Table("pedidos", MetaData(), Column("id", Integer), Column("fecha", DateTime))
+
+
+def _sql(cursor):
+    stmt = select(pedidos.c.id).where(after_keyset(pedidos.c.fecha, pedidos.c.id, cursor))
+    return str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_keyset_round_trip():
+    fecha = datetime(2024, 5, 1, 10, 30)
+    assert parse_keyset(make_keyset(fecha, 42)) == (fecha, 42)
+    assert parse_keyset(make_keyset(None, 7)) == (None, 7)
+
+
+@pytest.mark.parametrize("cursor", ["", "sin-separador", "2024-05-01~x", "no-es-fecha~3"])
+def test_parse_keyset_rejects_malformed(cursor):
+    with pytest.raises(HTTPException) as exc:
+        parse_keyset(cursor)
+    assert exc.value.status_code == 400
+
+
+def test_after_keyset_with_date_is_a_row_comparison():
+    sql = _sql(make_keyset(datetime(2024, 5, 1, 10, 30), 42))
+    assert "(pedidos.fecha, pedidos.id) < ('2024-05-01 10:30:00', 42)" in sql
+
+
+def test_after_keyset_null_date_continues_into_dated_rows():
+    # NULL dates come first in DESC order: the rest of the NULLs, then every dated row
+    sql = _sql(make_keyset(None, 7))
+    assert "pedidos.fecha IS NULL AND pedidos.id < 7" in sql
+    assert "OR pedidos.fecha IS NOT NULL" in sql
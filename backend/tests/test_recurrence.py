@@ -0,0 +1,30 @@
+from datetime import date, datetime
+from src.models.business import ServicioFrecuente
+from src.models.enums import EstadoFrecuente
+from src.utils.recurrence import occurrence_dates
+
+
+def _frecuente(dias, inicio=datetime(2024, 1, 1), fin=None, estado=EstadoFrecuente.ACTIVO):
+    return ServicioFrecuente(dias_semana=dias, fecha_inicio=inicio, fecha_fin=fin, estado=estado)
+
+
+def test_occurrence_dates_follow_weekdays():
+    # 2024-05-06 is a Monday
+    frecuente = _frecuente(["Lunes", "Miércoles"])
+    assert occurrence_dates(frecuente, date(2024, 5, 6), date(2024, 5, 15)) == [
+        date(2024, 5, 6), date(2024, 5, 8), date(2024, 5, 13), date(2024, 5, 15)
+    ]
+
+
+def test_occurrence_dates_clipped_to_validity():
+    frecuente = _frecuente(["Viernes"], inicio=datetime(2024, 5, 8), fin=datetime(2024, 5, 20))
+    assert occurrence_dates(frecuente, date(2024, 5, 1), date(2024, 5, 31)) == [
+        date(2024, 5, 10), date(2024, 5, 17)
+    ]
+
+
+def test_occurrence_dates_empty_when_stopped_or_no_days():
+    desde, hasta = date(2024, 5, 6), date(2024, 5, 12)
+    assert occurrence_dates(_frecuente(["Lunes"], estado=EstadoFrecuente.PAUSADO), desde, hasta) == []
+    assert occurrence_dates(_frecuente(["Lunes"], estado=EstadoFrecuente.FINALIZADO), desde, hasta) == []
+    assert occurrence_dates(_frecuente([]), desde, hasta) == []
@@ -0,0 +1,54 @@
+import pytest
+from factories import add_chofer, add_cliente, add_pedido, add_usuario, auth
+from src.models.enums import EstadoPedido
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_staff_reorders_several_routes_at_once(client, db):
+    admin = await add_usuario(db)
+    uno = await add_chofer(db, nombre="Uno")
+    dos = await add_chofer(db, nombre="Dos")
+    cliente = await add_cliente(db)
+    a = await add_pedido(db, cliente, uno, EstadoPedido.ASIGNADA)
+    b = await add_pedido(db, cliente, uno, EstadoPedido.ASIGNADA)
+    c = await add_pedido(db, cliente, dos, EstadoPedido.ASIGNADA)
+    await db.commit()
+
+    orden = [{"tipo": "P", "id": b.id, "orden": 1}, {"tipo": "P", "id": a.id, "orden": 2},
+             {"tipo": "P", "id": c.id, "orden": 1}]
+    resp = await client.post("/rutas/reordenar", json=orden, headers=auth(admin))
+    assert resp.status_code == 200, resp.text
+
+    for pedido in (a, b, c):
+        await db.refresh(pedido)
+    assert (a.orden_en_ruta, b.orden_en_ruta, c.orden_en_ruta) == (2, 1, 1)
+
+
+async def test_driver_cannot_touch_other_routes(client, db):
+    uno = await add_chofer(db, nombre="Uno")
+    dos = await add_chofer(db, nombre="Dos")
+    cliente = await add_cliente(db)
+    propio = await add_pedido(db, cliente, uno, EstadoPedido.ASIGNADA)
+    ajeno = await add_pedido(db, cliente, dos, EstadoPedido.ASIGNADA)
+    await db.commit()
+
+    orden = [{"tipo": "P", "id": propio.id, "orden": 1}, {"tipo": "P", "id": ajeno.id, "orden": 2}]
+    resp = await client.post("/rutas/reordenar", json=orden, headers=auth(uno.usuario))
+    assert resp.status_code == 404
+    assert f"P{ajeno.id}" in resp.json()["detail"]
+
+    # All or nothing: the driver's own stop isn't changed either
+    for pedido in (propio, ajeno):
+        await db.refresh(pedido)
+        assert pedido.orden_en_ruta is None
+
+
+async def test_reordenar_rejects_repeated_stops(client, db):
+    admin = await add_usuario(db)
+    pedido = await add_pedido(db, await add_cliente(db), await add_chofer(db), EstadoPedido.ASIGNADA)
+    await db.commit()
+
+    orden = [{"tipo": "P", "id": pedido.id, "orden": 1}, {"tipo": "P", "id": pedido.id, "orden": 2}]
+    resp = await client.post("/rutas/reordenar", json=orden, headers=auth(admin))
+    assert resp.status_code == 400
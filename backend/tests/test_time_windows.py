@@ -0,0 +1,28 @@
+import pytest
+from src.utils.time_windows import EXACT_TIME_TOLERANCE, parse_rango_horario
+
+
+@pytest.mark.parametrize("rango, esperado", [
+    ("8 a 12", (8 * 60, 12 * 60)),
+    ("14:00-18:00", (14 * 60, 18 * 60)),
+    ("9.30 hasta 11hs", (9 * 60 + 30, 11 * 60)),
+    ("2 a 6", (14 * 60, 18 * 60)), # Afternoon written without 24h format
+    ("11 a 3", (11 * 60, 15 * 60)),
+    ("antes de las 10", (0, 10 * 60)),
+    ("después de las 15", (15 * 60, 24 * 60)),
+    ("MAÑANA", (8 * 60, 13 * 60)),
+    ("Por la tarde", (14 * 60, 19 * 60)),
+    ("todo el día", (8 * 60, 19 * 60)),
+])
+def test_parse_rango_horario(rango, esperado):
+    assert parse_rango_horario(rango) == esperado
+
+
+def test_parse_rango_horario_exact_time():
+    assert parse_rango_horario("a las 10:30") == (10 * 60 + 30 - EXACT_TIME_TOLERANCE,
+                                                  10 * 60 + 30 + EXACT_TIME_TOLERANCE)
+
+
+@pytest.mark.parametrize("rango", [None, "", "   ", "cuando pueda", "25 a 30"])
+def test_parse_rango_horario_unparseable(rango):
+    assert parse_rango_horario(rango) is None
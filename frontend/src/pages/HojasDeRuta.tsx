@@ -36,7 +36,7 @@ export const HojasDeRuta: React.FC = () => {
             // For now, I'll fetch ALL individual and frequent and filter by chofer.
 
             const [pedRes, freqRes] = await Promise.all([
-                api.get('/pedidos/'),
+                api.get('/pedidos/', { params: { chofer_id: selectedChoferId } }),
                 api.get('/frecuentes/')
             ]);
 
@@ -28,11 +28,12 @@ export const PortalCliente: React.FC = () => {
         if (!phoneSearch) return;
         setIsTracking(true);
         try {
-            const res = await api.get(`/public/track/${phoneSearch}`);
+            const res = await api.get(`/public/track/${encodeURIComponent(phoneSearch)}`);
             setTrackingResults(res.data);
             setHasSearched(true);
-        } catch (err) {
+        } catch (err: any) {
             console.error(err);
+            alert(err?.response?.data?.detail || "No se pudo consultar el seguimiento");
         } finally {
             setIsTracking(false);
         }